@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : asset_manifest.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 静态资源清单解析（模板中的 asset_url）与预压缩静态文件服务
+
+import json
+import mimetypes
+import os
+from typing import Dict, List, Sequence, Tuple
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(PROJECT_ROOT, "static")
+# 构建产物目录（相对 static/），文件名带内容哈希，可永久缓存
+BUILD_DIR_NAME = "build"
+MANIFEST_PATH = os.path.join(STATIC_DIR, BUILD_DIR_NAME, "manifest.json")
+STATIC_URL = "/static/"
+
+# 带哈希文件的缓存头：内容变化文件名就变，浏览器无需再验证
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# 按优先级排列的预压缩格式：(Accept-Encoding 名称, 文件后缀)
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> Dict[str, dict]:
+    """
+    读取构建清单：{"css/styles.css": {"file": "build/css/styles.<hash>.css", "encodings": ["br", "gzip"]}}
+    清单不存在时返回空字典（开发环境直接使用源文件）
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"静态资源清单不存在，使用未构建的源文件: {path}")
+    except Exception as err:
+        logger.error(f"读取静态资源清单失败: {err}")
+    return {}
+
+
+manifest = load_manifest()
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """解析 Accept-Encoding 为 {编码名（小写）: q 值}；未写 q 的为 1，q 值无法解析的按 0（不接受）处理"""
+    accepted: Dict[str, float] = {}
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value.strip())
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+def acceptable_encodings(header: str, available: Sequence[str]) -> List[Tuple[str, str]]:
+    """
+    按客户端 q 值从高到低（相同时按 PRECOMPRESSED_ENCODINGS 的优先级）返回可用的 (编码, 文件后缀)；
+    q=0 表示明确拒绝，未列出的编码按 * 的 q 值处理，没有 * 时不接受
+    """
+    accepted = parse_accept_encoding(header)
+    candidates = []
+    for rank, (encoding, suffix) in enumerate(PRECOMPRESSED_ENCODINGS):
+        if encoding not in available:
+            continue
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            candidates.append((-quality, rank, encoding, suffix))
+    return [(encoding, suffix) for _, _, encoding, suffix in sorted(candidates)]
+
+
+def asset_url(name: str) -> str:
+    """模板辅助函数：{{ asset_url('css/styles.css') }} -> /static/build/css/styles.<hash>.css"""
+    entry = manifest.get(name)
+    return STATIC_URL + (entry["file"] if entry else name)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    与 StaticFiles 相同，但对构建清单中的哈希文件：
+    - 根据 Accept-Encoding（解析 q 值，q=0 视为拒绝）直接返回构建时生成的 .br / .gz，不在请求时压缩
+    - 附加 immutable 缓存头
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # 哈希文件路径 -> (可用的预压缩格式, 原文件内容类型)
+        self.hashed_files = {
+            entry["file"]: (tuple(entry.get("encodings", ())), self._content_type(entry["file"]))
+            for entry in manifest.values()
+        }
+
+    @staticmethod
+    def _content_type(path: str) -> str:
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type == "application/javascript":
+            content_type += "; charset=utf-8"
+        return content_type
+
+    async def get_response(self, path: str, scope: Scope):
+        hashed = self.hashed_files.get(path)
+        if hashed is None:
+            return await super().get_response(path, scope)
+
+        encodings, content_type = hashed
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        response = None
+        for encoding, suffix in acceptable_encodings(accept_encoding, encodings):
+            try:
+                response = await super().get_response(path + suffix, scope)
+            except HTTPException:
+                # 预压缩文件缺失时回退到下一种格式或原文件
+                continue
+            # 内容类型按原文件，而不是 .br/.gz
+            response.headers["content-type"] = content_type
+            response.headers["content-encoding"] = encoding
+            break
+
+        if response is None:
+            response = await super().get_response(path, scope)
+        response.headers["vary"] = "Accept-Encoding"
+        response.headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+        return response
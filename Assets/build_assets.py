@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : build_assets.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 静态资源构建：内容哈希 + gzip/brotli 预压缩 + 清单 + Nginx 配置生成
+#
+# 用法（部署时 git pull 之后执行）：
+#   python3 -m Assets.build_assets
+#   python3 -m Assets.build_assets --clean --nginx-brotli
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+from typing import Dict
+
+from Assets.asset_manifest import (BUILD_DIR_NAME, IMMUTABLE_CACHE_CONTROL, MANIFEST_PATH, PROJECT_ROOT,
+                                   STATIC_DIR, STATIC_URL)
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+try:
+    import brotli  # pip install brotli（可选）
+except ImportError:
+    brotli = None
+
+# 只对文本类资源做预压缩，图片/字体本身已压缩
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".mjs", ".json", ".map", ".svg", ".txt", ".html", ".xml"}
+
+# 小于该字节数的文件压缩收益不大
+MIN_COMPRESS_SIZE = 256
+
+HASH_LENGTH = 10
+
+NGINX_CONFIG_PATH = os.path.join(PROJECT_ROOT, "Nginx", "static-assets.conf")
+NGINX_STATIC_ROOT = "/data/FastAPI-Main/static/"
+
+
+def hashed_name(relative_path: str, data: bytes) -> str:
+    """css/styles.css -> css/styles.<hash>.css"""
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    root, ext = os.path.splitext(relative_path)
+    return f"{root}.{digest}{ext}"
+
+
+def _write_if_smaller(path: str, original_size: int, data: bytes) -> bool:
+    """预压缩结果只有比原文件小才保留"""
+    if len(data) >= original_size:
+        return False
+    with open(path, "wb") as f:
+        f.write(data)
+    return True
+
+
+def build(static_dir: str = STATIC_DIR, clean: bool = False) -> Dict[str, dict]:
+    """
+    遍历 static/（跳过 build/），为每个文件生成带哈希的副本和预压缩版本，写入清单。
+    旧的哈希文件默认保留，滚动发布期间仍在使用旧页面的浏览器不会 404；--clean 时清理未引用文件。
+    """
+    build_dir = os.path.join(static_dir, BUILD_DIR_NAME)
+    os.makedirs(build_dir, exist_ok=True)
+    manifest: Dict[str, dict] = {}
+
+    for root, dirs, files in os.walk(static_dir):
+        if os.path.abspath(root) == os.path.abspath(static_dir):
+            dirs[:] = [d for d in dirs if d != BUILD_DIR_NAME]
+        for filename in sorted(files):
+            source = os.path.join(root, filename)
+            relative = os.path.relpath(source, static_dir).replace(os.sep, "/")
+            with open(source, "rb") as f:
+                data = f.read()
+
+            target_relative = f"{BUILD_DIR_NAME}/{hashed_name(relative, data)}"
+            target = os.path.join(static_dir, *target_relative.split("/"))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as f:
+                f.write(data)
+
+            encodings = []
+            if os.path.splitext(filename)[1].lower() in COMPRESSIBLE_EXTENSIONS and len(data) >= MIN_COMPRESS_SIZE:
+                if brotli is not None and _write_if_smaller(target + ".br", len(data),
+                                                             brotli.compress(data, quality=11)):
+                    encodings.append("br")
+                if _write_if_smaller(target + ".gz", len(data), gzip.compress(data, compresslevel=9, mtime=0)):
+                    encodings.append("gzip")
+
+            manifest[relative] = {"file": target_relative, "encodings": encodings}
+            logger.info(f"构建静态资源: {relative} -> {target_relative} {encodings}")
+
+    # 先写临时文件再替换，运行中的 worker 不会读到半个清单
+    temp_path = MANIFEST_PATH + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(temp_path, MANIFEST_PATH)
+
+    if clean:
+        _clean(build_dir, manifest)
+    return manifest
+
+
+def _clean(build_dir: str, manifest: Dict[str, dict]):
+    """删除清单中未引用的旧哈希文件"""
+    keep = set()
+    for entry in manifest.values():
+        path = os.path.normpath(os.path.join(os.path.dirname(build_dir), entry["file"]))
+        keep.update({path, path + ".br", path + ".gz"})
+    keep.add(os.path.normpath(MANIFEST_PATH))
+
+    for root, dirs, files in os.walk(build_dir):
+        for filename in files:
+            path = os.path.normpath(os.path.join(root, filename))
+            if path not in keep:
+                os.remove(path)
+                logger.info(f"删除旧静态资源: {path}")
+
+
+def render_nginx_config(static_root: str = NGINX_STATIC_ROOT, enable_brotli: bool = False) -> str:
+    """生成 Nginx 静态资源 location 片段，在各 server 块中 include"""
+    brotli_line = "brotli_static on;" if enable_brotli else "# brotli_static on;  # 需要安装 ngx_brotli 模块"
+    return f"""# 由 python3 -m Assets.build_assets 生成，请勿手动修改
+# 在 server 块中 include /data/FastAPI-Main/Nginx/static-assets.conf;
+
+# 带内容哈希的构建产物：直接发送预压缩文件，永久缓存
+location {STATIC_URL}{BUILD_DIR_NAME}/ {{
+    alias {static_root}{BUILD_DIR_NAME}/;
+    gzip_static on;
+    {brotli_line}
+    add_header Cache-Control "{IMMUTABLE_CACHE_CONTROL}";
+    add_header Vary Accept-Encoding;
+    access_log off;
+}}
+
+# 未构建的源文件：短期缓存，由 ETag/Last-Modified 再验证
+location {STATIC_URL} {{
+    alias {static_root};
+    add_header Cache-Control "public, no-cache";
+}}
+"""
+
+
+def write_nginx_config(path: str = NGINX_CONFIG_PATH, static_root: str = NGINX_STATIC_ROOT,
+                       enable_brotli: bool = False):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(render_nginx_config(static_root, enable_brotli))
+    logger.info(f"已生成 Nginx 静态资源配置: {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="构建静态资源（内容哈希 + 预压缩 + 清单）")
+    parser.add_argument("--clean", action="store_true", help="删除清单中未引用的旧哈希文件")
+    parser.add_argument("--nginx-out", default=NGINX_CONFIG_PATH, help="生成的 Nginx 配置路径")
+    parser.add_argument("--nginx-static-root", default=NGINX_STATIC_ROOT, help="服务器上 static 目录的绝对路径")
+    parser.add_argument("--nginx-brotli", action="store_true", help="Nginx 已安装 ngx_brotli 时开启 brotli_static")
+    args = parser.parse_args()
+
+    if brotli is None:
+        print("未安装 brotli，仅生成 gzip 预压缩文件（pip install brotli）")
+
+    manifest = build(clean=args.clean)
+    write_nginx_config(args.nginx_out, args.nginx_static_root, args.nginx_brotli)
+    print(f"静态资源构建完成，共 {len(manifest)} 个文件，清单：{MANIFEST_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,24 @@
 #!/bin/bash
 echo "正在更新代码..."
 cd /data/FastAPI-Main
-echo "停止服务..."
-sudo systemctl stop receive-notify.service
-echo "清理日志..."
-sudo rm -rf /data/FastAPI-Main/logs/*.log
 echo "更新代码..."
 git pull
 sleep 3
+echo "构建静态资源..."
+python3 -m Assets.build_assets --clean
 echo "赋予脚本执行权限..."
 chmod +x /data/FastAPI-Main/Bash/*.sh
-echo "重启服务..."
-sudo systemctl restart receive-notify.service
-sleep 3
-clear
+# 不再先 stop 再 start：滚动重载逐个替换 worker，部署期间回调不会被拒绝
+# 服务未运行时 reload 会失败，此时直接启动
+echo "滚动重载服务..."
+sudo systemctl daemon-reload
+if systemctl is-active --quiet receive-notify.service; then
+    sudo systemctl reload receive-notify.service
+else
+    sudo systemctl start receive-notify.service
+fi
+# 等待全部 worker 完成启动预热（预热完成前 worker 不接收请求）
+python3 -m Launcher.serve wait
+python3 -m Launcher.serve status
 echo "查看日志..."
 sudo tail -f /data/FastAPI-Main/logs/ReceiveNotify.log
@@ -177,6 +177,35 @@ def initialize_config():
                 ]
             ],
 
+            [
+                'server', '服务启动配置',
+                [
+                    ['host', '监听地址', '127.0.0.1'],
+                    ['port', '监听端口', 4911],
+                    ['workers', 'worker 进程数（0 表示按逻辑核心数自动计算）', 0],
+                    ['loop', '事件循环（uvloop / asyncio / auto）', 'uvloop'],
+                    ['http', 'HTTP 解析器（httptools / h11 / auto）', 'httptools'],
+                    ['backlog', '监听队列长度', 2048],
+                    ['keepalive', 'Keep-Alive 超时（秒）', 5],
+                    ['timeout', 'worker 心跳超时（秒）', 60],
+                    ['graceful_timeout', 'worker 优雅退出超时（秒）', 30],
+                    ['reuse_port', '监听 socket 是否开启 SO_REUSEPORT', True],
+                    ['pid_file', '主进程 PID 文件', '/data/FastAPI-Main/run/receive-notify.pid'],
+                    ['ready_dir', 'worker 就绪标记目录', '/data/FastAPI-Main/run/workers'],
+                    ['reload_timeout', '滚动重载时等待单个新 worker 就绪的超时（秒）', 60]
+                ]
+            ],
+
+            [
+                'shutdown', '优雅关闭配置',
+                [
+                    # 关闭最长耗时 drain_timeout + 4 * step_timeout（排空超出 1 个 + 3 个清理阶段，阶段内步骤并发），
+                    # 需小于 server.graceful_timeout：默认 15 + 4 * 2 = 23 < 30
+                    ['drain_timeout', '排空在途请求与后台任务的总预算（秒）', 15],
+                    ['step_timeout', '单个清理步骤（关闭连接池等）的超时（秒）', 2]
+                ]
+            ],
+
             [
                 'database', '数据库配置',
                 [
@@ -202,7 +231,8 @@ def initialize_config():
                     ['port', 'Redis端口', 6379],
                     ['password', 'Redis密码', ''],
                     ['db', 'Redis数据库', 0],
-                    ['max_connections', 'Redis最大连接数', 100],
+                    ['max_connections', '每个 worker 的 Redis 连接池上限（所有模块共用）', 100],
+                    ['pool_timeout', '连接池用完时等待空闲连接的最长时间（秒）', 1],
                     ['redis_url', 'Redis连接URL', 'redis://127.0.0.1:6379/0'],
                     ['cache_expire', '缓存过期时间', 600]
                 ]
@@ -215,27 +245,199 @@ def initialize_config():
                 ]
             ],
 
+            [
+                'page_cache', '页面缓存配置',
+                [
+                    ['ttl', '整页缓存有效期（秒）', 60],
+                    ['max_entries', '整页缓存最大条目数', 256],
+                    ['bytecode_cache_dir', 'Jinja2 字节码缓存目录', '/data/FastAPI-Main/cache/jinja2']
+                ]
+            ],
+
+            [
+                'forward', '下游商户回调转发配置',
+                [
+                    ['enable', '是否转发回调给下游商户', True],
+                    ['states', '需要转发的订单状态（逗号分隔）', '2,3'],
+                    ['retry_schedule', '失败重试间隔（秒，逗号分隔，用完即放弃）', '15,60,300,1800,3600,7200,21600'],
+                    ['host_concurrency', '每个商户主机的并发推送上限', 4],
+                    ['max_in_flight', '每个 worker 同时推送的最大数量', 64],
+                    ['batch_size', '每次从队列领取的记录数', 50],
+                    ['lease_seconds', '领取租约时长（秒，需大于单次推送耗时）', 120],
+                    ['poll_interval', '队列轮询间隔（秒）', 2],
+                    ['connect_timeout', '连接超时（秒）', 3],
+                    ['read_timeout', '读取超时（秒）', 10],
+                    ['success_body', '商户成功响应内容', 'success'],
+                    ['sign_upper', '签名是否使用大写 MD5', True],
+                    ['max_hosts', '保留连接池的商户主机数上限', 256],
+                    ['host_busy_delay', '主机并发已满时延后推送的秒数', 2]
+                ]
+            ],
+
+            [
+                'resilience', '外部依赖熔断与并发隔离配置',
+                [
+                    ['error_rate', '滚动窗口内失败率达到该值时熔断', 0.5],
+                    ['min_calls', '滚动窗口内最少调用次数，低于该值不熔断', 20],
+                    ['window', '失败率统计窗口（秒）', 10],
+                    ['open_seconds', '熔断持续时间（秒），之后放行探测请求', 5],
+                    ['mysql_max_concurrent', 'MySQL 并发连接上限（与连接池 maxsize 保持一致）', 20],
+                    ['mysql_max_wait', 'MySQL 并发已满时最长等待（秒）', 2],
+                    ['mysql_timeout', '从连接池获取连接的超时（秒，不限制查询本身）', 3],
+                    ['redis_max_concurrent', 'Redis 并发请求上限', 100],
+                    ['redis_max_wait', 'Redis 并发已满时最长等待（秒）', 0.2],
+                    ['redis_timeout', '单次 Redis 命令超时（秒）', 0.5],
+                    ['telegram_max_concurrent', 'Telegram 并发发送上限', 4],
+                    ['telegram_max_wait', 'Telegram 并发已满时排队等待的秒数（不小于发送超时，管理员多于并发上限时排队发送）', 10],
+                    ['telegram_timeout', '单次 Telegram 发送超时（秒）', 10],
+                    ['telegram_deferred_max', 'Telegram 不可用时每个管理员暂存的告警条数上限', 200]
+                ]
+            ],
+
+            [
+                'deadline', '请求截止时间配置',
+                [
+                    ['default_budget', '未单独配置的路由的处理时限（秒）', 10],
+                    ['routes', '按路由的处理时限（path=秒，逗号分隔，/ 结尾按前缀匹配，0 表示不限时）',
+                     '/global_pay_in_notify=8,/global_pay_out_notify=8,/global_refund_notify=8,/live/stream=0,/admin/=0'],
+                    ['grace', '超过时限后强制取消请求前的宽限（秒）', 0.5]
+                ]
+            ],
+
+            [
+                'loop_monitor', '事件循环延迟监控配置',
+                [
+                    ['enable', '是否启用事件循环监控', True],
+                    ['interval', '心跳间隔（秒）', 0.05],
+                    ['threshold', '事件循环卡住超过该时长（秒）视为阻塞并抓取调用栈', 0.1],
+                    ['cooldown', '同一阻塞位置重复打印调用栈的间隔（秒）', 60]
+                ]
+            ],
+
+            [
+                'tracing', '链路追踪配置',
+                [
+                    ['enable', '是否启用链路追踪', True],
+                    ['sample_ratio', '采样比例（上游 traceparent 带采样标记时以上游为准）', 0.01],
+                    ['exporter', '导出方式（file / otlp / none）', 'file'],
+                    ['file_dir', 'file 导出目录（每行一个 OTLP JSON）', '/data/FastAPI-Main/logs/traces'],
+                    ['otlp_endpoint', 'otlp 导出地址（OTLP/HTTP JSON）', 'http://127.0.0.1:4318/v1/traces'],
+                    ['service_name', '服务名', 'receive-notify'],
+                    ['batch_size', '单次导出的 span 数', 512],
+                    ['flush_interval', '导出间隔（秒）', 2]
+                ]
+            ],
+
+            [
+                'password', '密码哈希进程池配置',
+                [
+                    ['processes', '每个 worker 的 bcrypt 进程数', 1],
+                    ['max_concurrent', '同时提交到进程池的任务数上限', 2],
+                    ['max_queue', '排队等待的任务数上限，超过直接拒绝', 100],
+                    ['rounds', 'bcrypt 轮数（cost）', 12]
+                ]
+            ],
+
+            [
+                'auth', 'JWT 鉴权配置',
+                [
+                    ['secret_key', 'JWT 签名密钥（环境变量 NOTIFY_JWT_SECRET 优先）', 'your-secret-key'],
+                    ['algorithm', '签名算法', 'HS256'],
+                    ['cache_size', '已验签 token 缓存条数（每个 worker）', 10000],
+                    ['revocation_refresh', '吊销名单同步间隔（秒）', 5]
+                ]
+            ],
+
+            [
+                'country', '国家/地区索引配置',
+                [
+                    ['refresh_interval', '检查其他 worker 是否已重新加载 country_info 的间隔（秒）', 60]
+                ]
+            ],
+
+            [
+                'snowflake', '订单号生成配置',
+                [
+                    ['lease_ttl', 'worker id 租约时长（秒），每 1/3 租期续租一次', 60],
+                    ['max_backward_ms', '允许的时钟回拨（毫秒），超过则停止发号', 1000],
+                    ['lease_margin_ms', '本地租约比 Redis 租约提前到期的毫秒数（抵消往返延迟与时钟漂移）', 1000]
+                ]
+            ],
+
+            [
+                'health', '依赖健康探测配置',
+                [
+                    ['interval', '后台探测间隔（秒），健康检查接口返回最近一次结果', 5],
+                    ['probe_timeout', '单项探测超时（秒）', 2],
+                    ['failure_threshold', '关键探测连续失败多少次才判定为 down（之前为 degraded）', 3],
+                    ['redis_critical', 'Redis 故障时健康检查是否返回 503（Redis 仅作缓存，默认否）', False]
+                ]
+            ],
+
+            [
+                'warmup', '启动预热配置（完成后 worker 才接收流量）',
+                [
+                    ['enable', '是否启用启动预热', True],
+                    ['timeout', '预热总预算（秒），超时的步骤放弃，按冷缓存启动', 10],
+                    ['redis_connections', '预建的 Redis 连接数', 10],
+                    ['users_pages', '预加载的用户列表页数', 3],
+                    ['users_per_page', '预加载的用户列表每页条数（与页面默认值一致）', 10]
+                ]
+            ],
+
+            [
+                'seed', '压测数据灌入配置（python3 -m Models.seed）',
+                [
+                    ['database', '灌数目标库（不能与 database.database 相同，不存在时自动创建）', 'fastapi_seed'],
+                    ['host', '灌数目标主机，留空沿用 database.host', ''],
+                    ['port', '灌数目标端口，0 沿用 database.port', 0],
+                    ['user', '灌数目标用户名，留空沿用 database.user', ''],
+                    ['password', '灌数目标密码，留空沿用 database.password', ''],
+                    ['users_rows', 'users 表默认灌入行数', 1000000],
+                    ['notify_rows', 'pay_notify_record 表默认灌入行数', 1000000],
+                    ['batch_size', '每批行数（一个事务）', 5000],
+                    ['concurrency', '并行写入连接数', 4],
+                    ['method', '写入方式：insert（多行 INSERT）/ load_data（LOAD DATA LOCAL INFILE）', 'insert'],
+                    ['drop_indexes', '灌入前删除非唯一二级索引，结束后重建（UNIQUE 索引始终保留）', False],
+                    ['days', 'created_at 分布在最近多少天内', 30]
+                ]
+            ],
+
+            [
+                'report', '报表配置',
+                [
+                    ['timezone', '报表统计时区（按此时区划分自然日）', 'America/Sao_Paulo'],
+                    ['flush_interval', '统计计数写入 Redis 的间隔（秒）', 5],
+                    ['retention_days', '统计数据保留天数', 40]
+                ]
+            ],
+
             [
                 'task', '自动任务配置',
                 [
                     ['interval', '检查未处理支付通知的时间间隔（秒）', 1800],
 
+                    # 选主租约：同一时刻只有持有租约的 worker/节点执行定时任务
+                    ['leader.enable', '是否启用 Redis 选主', True],
+                    ['leader.key', '选主租约 Redis 键', 'scheduler:leader'],
+                    ['leader.ttl', '选主租约有效期（秒）', 30],
+                    ['leader.renew_interval', '选主租约续期间隔（秒）', 10],
+
+                    # 未处理支付通知检查：按主键 keyset 增量扫描，高水位保存在 Redis
+                    ['check.batch_size', '每批扫描行数', 1000],
+                    ['check.concurrency', '回查并发数', 4],
+                    ['check.stuck_seconds', '超过多少秒仍为 0/1 状态视为未处理', 1800],
+                    ['check.max_age', '待确认订单最长跟踪时间（秒）', 86400],
+                    ['check.commit_lag', '高水位只越过写入超过多少秒的行（等待晚提交的小 ID 可见）', 5],
+                    ['check.report_limit', '告警中最多列出的订单数', 10],
+
+                    # ---------------- job1: 支付检查 ----------------
                     ['job1.enable', '定时任务开关', True],
+                    ['job1.id', '定时任务ID', 'check_job'],
                     ['job1.name', '定时任务名称', '工作日早上九点开始晚上8点结束，每隔半小时检查一次未处理支付通知'],
-                    ['job1.trigger', '定时任务触发器', 'interval'],  # interval, cron, date
-
-                    ['job1.year', '间隔年份', 1],
-                    ['job1.month', '间隔月份', 1],
-                    ['job1.weeks', '间隔周数', 1],
-                    ['job1.days', '间隔天数', 1],
-                    ['job1.hours', '间隔小时数', 1],
-                    ['job1.minutes', '间隔分钟数', 30],
-                    ['job1.seconds', '间隔秒数', 0],
-
-                    ['job1.start_date', '定时任务开始时间', '2024-01-01 09:00:00'],
-                    ['job1.end_date', '定时任务结束时间', '2030-12-31 23:59:59'],
-
-                    ['job1.timezone', '定时任务时区', 'Asia/Shanghai'],
+                    ['job1.func', '定时任务函数（任务注册表中的名称）', 'check_unprocessed_payment_notify'],
+                    ['job1.message', '定时任务消息', '每隔半小时检查一次未处理支付任务'],
+                    ['job1.trigger', '定时任务触发器', 'cron'],  # interval, cron, date
 
                     # day_of_week 完整名称：sunday, monday, tuesday, wednesday, thursday, friday, saturday
                     # day_of_week 简写名称：sun, mon, tue, wed, thu, fri, sat
@@ -279,17 +481,65 @@ def initialize_config():
                     # day_of_week = '*' 或者忽略掉这个参数
 
                     ['job1.day_of_week', '定时任务星期几执行', 'mon-fri'],
-                    ['job1.month', '定时任务月份', '*'],
-                    ['job1.day', '定时任务日期', '*'],
-                    ['job1.func', '定时任务函数', 'app.tasks.check_unprocessed_payment_notify'],
-                    ['job1.args', '定时任务参数', ''],
-                    ['job1.kwargs', '定时任务关键字参数', ''],
-                    ['job1.trigger', '定时任务触发器', 'cron'],
+                    ['job1.hour', '定时任务小时', '9-20'],
+                    ['job1.minute', '定时任务分钟', '*/30'],
+                    ['job1.start_date', '定时任务开始时间', '2024-01-01 00:00:00'],
+                    ['job1.end_date', '定时任务结束时间', '2030-12-31 23:59:59'],
                     ['job1.timezone', '定时任务时区', 'Asia/Shanghai'],
                     ['job1.misfire_grace_time', '定时任务容错时间', 300],
                     ['job1.coalesce', '定时任务合并任务', True],
                     ['job1.max_instances', '定时任务最大实例数', 1],
-                    ['job1.replace_existing', '定时任务替换已存在任务', True]
+
+                    # ---------------- job2: 午饭提醒（12:49） ----------------
+                    ['job2.enable', '定时任务开关', True],
+                    ['job2.id', '定时任务ID', 'lunch_one'],
+                    ['job2.name', '定时任务名称', '吃午饭提醒'],
+                    ['job2.func', '定时任务函数（任务注册表中的名称）', 'send_reminder'],
+                    ['job2.message', '定时任务消息', '12:49 提醒吃午饭'],
+                    ['job2.trigger', '定时任务触发器', 'cron'],
+                    ['job2.day_of_week', '定时任务星期几执行', 'mon-fri'],
+                    ['job2.hour', '定时任务小时', 12],
+                    ['job2.minute', '定时任务分钟', 49],
+                    ['job2.start_date', '定时任务开始时间', '2024-01-01 00:00:00'],
+                    ['job2.end_date', '定时任务结束时间', '2030-12-31 23:59:59'],
+                    ['job2.timezone', '定时任务时区', 'Asia/Shanghai'],
+                    ['job2.misfire_grace_time', '定时任务容错时间', 60],
+                    ['job2.coalesce', '定时任务合并任务', True],
+                    ['job2.max_instances', '定时任务最大实例数', 1],
+
+                    # ---------------- job3: 午饭提醒（12:50） ----------------
+                    ['job3.enable', '定时任务开关', True],
+                    ['job3.id', '定时任务ID', 'lunch_two'],
+                    ['job3.name', '定时任务名称', '吃午饭提醒'],
+                    ['job3.func', '定时任务函数（任务注册表中的名称）', 'send_reminder'],
+                    ['job3.message', '定时任务消息', '12:50 提醒吃午饭'],
+                    ['job3.trigger', '定时任务触发器', 'cron'],
+                    ['job3.day_of_week', '定时任务星期几执行', 'mon-fri'],
+                    ['job3.hour', '定时任务小时', 12],
+                    ['job3.minute', '定时任务分钟', 50],
+                    ['job3.start_date', '定时任务开始时间', '2024-01-01 00:00:00'],
+                    ['job3.end_date', '定时任务结束时间', '2030-12-31 23:59:59'],
+                    ['job3.timezone', '定时任务时区', 'Asia/Shanghai'],
+                    ['job3.misfire_grace_time', '定时任务容错时间', 60],
+                    ['job3.coalesce', '定时任务合并任务', True],
+                    ['job3.max_instances', '定时任务最大实例数', 1],
+
+                    # ---------------- job4: 每日巴西支付报表（11:05） ----------------
+                    ['job4.enable', '定时任务开关', True],
+                    ['job4.id', '定时任务ID', 'report'],
+                    ['job4.name', '定时任务名称', '巴西支付日统计报表提醒'],
+                    ['job4.func', '定时任务函数（任务注册表中的名称）', 'brazil_daily_report'],
+                    ['job4.message', '定时任务消息', '巴西支付日统计报表'],
+                    ['job4.trigger', '定时任务触发器', 'cron'],
+                    ['job4.day_of_week', '定时任务星期几执行', 'mon-fri'],
+                    ['job4.hour', '定时任务小时', 11],
+                    ['job4.minute', '定时任务分钟', 5],
+                    ['job4.start_date', '定时任务开始时间', '2024-01-01 00:00:00'],
+                    ['job4.end_date', '定时任务结束时间', '2030-12-31 23:59:59'],
+                    ['job4.timezone', '定时任务时区', 'Asia/Shanghai'],
+                    ['job4.misfire_grace_time', '定时任务容错时间', 600],
+                    ['job4.coalesce', '定时任务合并任务', True],
+                    ['job4.max_instances', '定时任务最大实例数', 1]
 
                 ]
             ],
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : country_index.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 国家/地区信息进程内索引（country_info 表）：按 ISO 代码 O(1) 查找，电话号码按区号最长前缀匹配
+#
+# 启动时从 MySQL 加载一次（表不存在或为空时解析 SQL/国家代码.sql），之后查找全部在内存完成，不产生 I/O。
+# 索引整体替换（不原地修改），刷新期间读到的要么是旧索引要么是新索引。
+# 刷新：country_index.reload() 重新加载本 worker 并递增 Redis 版本号，其他 worker 定时比较版本号后重新加载。
+
+import asyncio
+import os
+import re
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from Config.config_loader import public_config
+from DataBase.async_database import redis_manager, mysql_manager
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SQL_PATH = os.path.join(PROJECT_ROOT, "SQL", "国家代码.sql")
+VERSION_KEY = "country_info:version"
+
+COLUMNS = ("iso_code_2", "iso_code_3", "iso_code_numeric", "name_en", "name_zh", "sovereignty", "continent",
+           "currency_code", "phone_code", "timezone_iana")
+
+# 多个国家/地区共用同一区号时，号码解析优先返回的国家（其余作为候选）
+PREFERRED_BY_PHONE_CODE = {
+    "1": "US", "7": "RU", "44": "GB", "47": "NO", "61": "AU", "212": "MA", "358": "FI", "500": "FK",
+    "590": "GP", "599": "CW",
+}
+
+_SQL_ROW = re.compile(r"^\((.*)\)[,;]\s*$")
+_SQL_VALUE = re.compile(r"'((?:[^']|'')*)'|NULL")
+_NON_DIGIT = re.compile(r"\D")
+
+
+class Country:
+    __slots__ = COLUMNS
+
+    def __init__(self, **fields):
+        for column in COLUMNS:
+            setattr(self, column, fields.get(column))
+
+    @property
+    def dial_prefix(self) -> str:
+        """区号的纯数字形式："1-684" -> "1684"，无区号为空串"""
+        return _NON_DIGIT.sub("", self.phone_code or "")
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        return {column: getattr(self, column) for column in COLUMNS}
+
+    def __repr__(self):
+        return f"Country({self.iso_code_2}, {self.name_en})"
+
+
+class PhonePrefixTrie:
+    """按数字逐位建树，节点保存以该前缀为区号的国家（优先的排在最前）"""
+
+    __slots__ = ("children", "countries")
+
+    def __init__(self):
+        self.children: Dict[str, "PhonePrefixTrie"] = {}
+        self.countries: Tuple[Country, ...] = ()
+
+    def insert(self, prefix: str, country: Country):
+        node = self
+        for digit in prefix:
+            node = node.children.setdefault(digit, PhonePrefixTrie())
+        if PREFERRED_BY_PHONE_CODE.get(prefix) == country.iso_code_2:
+            node.countries = (country,) + node.countries
+        else:
+            node.countries = node.countries + (country,)
+
+    def longest_match(self, digits: str) -> Tuple[str, Tuple[Country, ...]]:
+        """返回 (匹配到的区号, 国家候选)；没有匹配时返回 ("", ())"""
+        node, matched, result = self, "", ()
+        for index, digit in enumerate(digits):
+            node = node.children.get(digit)
+            if node is None:
+                break
+            if node.countries:
+                matched, result = digits[:index + 1], node.countries
+        return matched, result
+
+
+class CountrySnapshot:
+    """一次加载得到的只读索引"""
+
+    def __init__(self, countries: Iterable[Country], source: str):
+        self.source = source
+        self.countries: Tuple[Country, ...] = tuple(countries)
+        by_iso2, by_iso3, by_numeric = {}, {}, {}
+        by_currency: Dict[str, List[Country]] = {}
+        self.trie = PhonePrefixTrie()
+        for country in self.countries:
+            by_iso2[country.iso_code_2.upper()] = country
+            by_iso3[country.iso_code_3.upper()] = country
+            by_numeric[country.iso_code_numeric] = country
+            if country.currency_code:
+                by_currency.setdefault(country.currency_code.upper(), []).append(country)
+            if country.dial_prefix:
+                self.trie.insert(country.dial_prefix, country)
+        self.by_iso2: Mapping[str, Country] = MappingProxyType(by_iso2)
+        self.by_iso3: Mapping[str, Country] = MappingProxyType(by_iso3)
+        self.by_numeric: Mapping[str, Country] = MappingProxyType(by_numeric)
+        self.by_currency: Mapping[str, Tuple[Country, ...]] = MappingProxyType(
+            {code: tuple(items) for code, items in by_currency.items()})
+
+
+def parse_sql_file(path: str = SQL_PATH) -> List[Country]:
+    """解析 SQL/国家代码.sql 中的 INSERT 数据行"""
+    countries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            match = _SQL_ROW.match(line.strip())
+            if not match:
+                continue
+            values = [None if value.group(0) == "NULL" else value.group(1).replace("''", "'")
+                      for value in _SQL_VALUE.finditer(match.group(1))]
+            if len(values) == len(COLUMNS):
+                countries.append(Country(**dict(zip(COLUMNS, values))))
+    return countries
+
+
+class CountryIndex:
+    def __init__(self, refresh_interval: float = 60):
+        self.refresh_interval = refresh_interval
+        self._snapshot = CountrySnapshot((), "empty")
+        self._version: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------------- 加载 ----------------
+    async def _load_rows(self) -> Tuple[List[Country], str]:
+        try:
+            rows = await mysql_manager.fetchall(f"SELECT {', '.join(COLUMNS)} FROM country_info")
+            if rows:
+                return [Country(**row) for row in rows], "mysql"
+            logger.warning("country_info 表为空，改用 SQL 文件")
+        except Exception as err:
+            logger.warning(f"从 MySQL 加载 country_info 失败，改用 SQL 文件: {err!r}")
+        return await asyncio.to_thread(parse_sql_file), "sql"
+
+    async def load(self):
+        """重新加载本 worker 的索引"""
+        countries, source = await self._load_rows()
+        self._snapshot = CountrySnapshot(countries, source)
+        logger.info(f"国家/地区索引已加载，共 {len(countries)} 条，来源 {source}")
+
+    async def reload(self):
+        """重新加载并通知其他 worker（在 refresh_interval 秒内生效）"""
+        await self.load()
+        try:
+            self._version = await redis_manager.command("incr", VERSION_KEY)
+        except Exception as err:
+            logger.warning(f"递增 country_info 版本号失败，其他 worker 不会重新加载: {err!r}")
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                version = await redis_manager.get(VERSION_KEY)
+                if version is not None and int(version) != self._version:
+                    self._version = int(version)
+                    await self.load()
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                logger.warning(f"检查 country_info 版本失败: {err!r}")
+
+    async def start(self):
+        """启动时加载一次，并开始监听版本号"""
+        try:
+            version = await redis_manager.get(VERSION_KEY)
+            self._version = int(version) if version is not None else None
+        except Exception as err:
+            logger.warning(f"读取 country_info 版本失败: {err!r}")
+        await self.load()
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch(), name="country-index-watch")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    # ---------------- 查找（纯内存） ----------------
+    @property
+    def snapshot(self) -> CountrySnapshot:
+        return self._snapshot
+
+    def __len__(self):
+        return len(self._snapshot.countries)
+
+    def get(self, code) -> Optional[Country]:
+        """按 ISO 二字母 / 三字母 / 数字代码查找"""
+        snapshot = self._snapshot
+        if isinstance(code, int):
+            return snapshot.by_numeric.get(f"{code:03d}")
+        code = code.strip()
+        if code.isdigit():
+            return snapshot.by_numeric.get(code.zfill(3))
+        code = code.upper()
+        return snapshot.by_iso2.get(code) if len(code) == 2 else snapshot.by_iso3.get(code)
+
+    def by_currency(self, currency_code: str) -> Tuple[Country, ...]:
+        return self._snapshot.by_currency.get(currency_code.upper(), ())
+
+    def currency_of(self, code) -> Optional[str]:
+        country = self.get(code)
+        return country.currency_code if country is not None else None
+
+    def resolve_phone(self, phone: str) -> Tuple[str, Tuple[Country, ...]]:
+        """
+        国际格式号码（+55 11 9xxxx / 0055... / 5511...）按区号最长前缀匹配。
+        返回 (区号, 国家候选)，第一个为优先结果；共用区号的（如 +1 美国/加拿大）需要业务侧再区分
+        """
+        digits = _NON_DIGIT.sub("", phone)
+        if phone.lstrip().startswith("00"):
+            digits = digits[2:]
+        return self._snapshot.trie.longest_match(digits)
+
+    def country_of_phone(self, phone: str) -> Optional[Country]:
+        _, countries = self.resolve_phone(phone)
+        return countries[0] if countries else None
+
+
+country_index = CountryIndex(
+    refresh_interval=public_config.get(key="country.refresh_interval", get_type=float, default=60),
+)
@@ -12,17 +12,21 @@ import asyncio
 import time
 import json
 import logging
-from typing import Any, Optional, Callable, Iterable, Coroutine
+from typing import Any, Dict, List, Optional, Callable, Iterable, Coroutine
 import aiomysql
 # 推荐使用 redis.asyncio from `redis` 包
 from aiomysql import Connection
 import redis.asyncio as redis_asyncio
 from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
 from contextlib import asynccontextmanager
 
 # ----------------- 日志配置 -----------------
 import os
 from Logger.logger_config import setup_logger
+from Utils.handle_deadline import DeadlineExceeded, bound_timeout, deadline_exceeded, with_deadline
+from Utils.handle_resilience import DependencyUnavailable, build_dependency
+from Utils.handle_tracing import KIND_CLIENT, span
 log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
 logger = setup_logger(log_name)
 
@@ -34,12 +38,21 @@ except Exception as err1:
         f"模块 Config.config_loader 未找到或 public_config 未定义，将 public_config 设置为 None，错误信息：{err1}")
     public_config = None
 
+# 视为依赖故障（计入熔断）的异常；主键冲突、SQL 语法错误等业务异常不计入
+MYSQL_FAILURES = (aiomysql.OperationalError, aiomysql.InterfaceError, OSError)
+REDIS_FAILURES = (redis_asyncio.ConnectionError, redis_asyncio.TimeoutError, OSError)
+
 
 # ---------- 异步 MySQL 管理 ----------
 class AsyncMySQL:
     def __init__(self):
         self.pool: Optional[aiomysql.Pool] = None
         self._init_lock = asyncio.Lock()
+        # 健康探测专用连接（不占用请求连接池），参数与连接池相同
+        self._connect_kwargs: Dict[str, Any] = {}
+        self._probe_conn: Optional[Connection] = None
+        # 熔断 + 并发隔离：数据库故障时快速失败，不让每个请求都卡在获取连接上
+        self.dependency = build_dependency("mysql", MYSQL_FAILURES, max_concurrent=20, max_wait=2, timeout=3)
 
     async def init_pool(self, **kwargs):
         """
@@ -56,6 +69,8 @@ class AsyncMySQL:
                 "autocommit": True,
             }
             config.update(kwargs)
+            self._connect_kwargs = {key: value for key, value in config.items()
+                                    if key not in ("minsize", "maxsize", "pool_recycle", "loop")}
             logger.info("初始化 MySQL 连接池...")
             # 创建连接池
             self.pool: aiomysql.Pool = await aiomysql.create_pool(**config)
@@ -67,6 +82,7 @@ class AsyncMySQL:
             logger.info("MySQL 连接池就绪 (minsize=%s maxsize=%s)", config.get("minsize"), config.get("maxsize"))
 
     async def close(self):
+        self._close_probe_conn()
         if self.pool is not None:
             logger.info("关闭 MySQL 连接池...")
             self.pool.close()
@@ -78,32 +94,113 @@ class AsyncMySQL:
         if self.pool is None:
             raise RuntimeError("MySQL pool not initialized. Call init_pool first.")
 
+    def _close_probe_conn(self):
+        conn, self._probe_conn = self._probe_conn, None
+        if conn is not None:
+            conn.close()
+
+    async def ping(self) -> Dict[str, Any]:
+        """
+        健康探测：在专用连接上执行 SELECT 1（不经过熔断统计），返回连接池状态。
+        不从请求连接池借连接：高峰期连接池被占满时探测不会排队超时，把繁忙误判为数据库故障
+        """
+        self.ensure_inited()
+        try:
+            if self._probe_conn is None or self._probe_conn.closed:
+                self._probe_conn = await aiomysql.connect(**self._connect_kwargs)
+            async with self._probe_conn.cursor() as cur:
+                await cur.execute("SELECT 1")
+                await cur.fetchone()
+        except BaseException:
+            # 失败或探测超时被取消时连接状态未知，下次重新建立
+            self._close_probe_conn()
+            raise
+        return {"pool_size": self.pool.size, "pool_free": self.pool.freesize,
+                "pool_saturated": self.pool.size >= self.pool.maxsize and self.pool.freesize == 0,
+                "breaker_open": not self.available}
+
+    async def prefill(self, count: int) -> int:
+        """
+        预热：同时借出 count 个连接各执行一次 SELECT 1 后归还，使连接池中至少有 count 个已验证的空闲连接
+        （不超过 maxsize），避免启动后第一波请求同时建连。返回池中连接数
+        """
+        self.ensure_inited()
+        count = min(count, self.pool.maxsize)
+        conns = await asyncio.gather(*[self.pool.acquire() for _ in range(count)], return_exceptions=True)
+        try:
+            for conn in conns:
+                if isinstance(conn, BaseException):
+                    raise conn
+                async with conn.cursor() as cur:
+                    await cur.execute("SELECT 1")
+                    await cur.fetchone()
+        finally:
+            for conn in conns:
+                if not isinstance(conn, BaseException):
+                    self.pool.release(conn)
+        return self.pool.size
+
+    @property
+    def available(self) -> bool:
+        return self.dependency.available
+
+    async def _acquire_conn(self) -> Connection:
+        """从连接池取连接，等待时间取 mysql_timeout 与请求剩余时间中较小者"""
+        timeout, by_deadline = bound_timeout(self.dependency.timeout, "mysql.acquire")
+        if not timeout:
+            return await self.pool.acquire()
+        try:
+            return await asyncio.wait_for(self.pool.acquire(), timeout)
+        except asyncio.TimeoutError:
+            if by_deadline:
+                raise deadline_exceeded("mysql.acquire") from None
+            raise
+
+    def _release_conn(self, conn: Connection, interrupted: bool):
+        # 查询执行中被取消/超时的连接可能残留未读完的结果，直接关闭，不放回连接池复用
+        if interrupted:
+            conn.close()
+        self.pool.release(conn)
+
     @asynccontextmanager
     async def acquire(self):
-        """上下文方式获取连接：async with mysql_manager.acquire() as conn: ..."""
+        """
+        上下文方式获取连接：async with mysql_manager.acquire() as conn: ...
+        熔断中或并发已满时抛出 DependencyUnavailable，超过请求截止时间抛出 DeadlineExceeded
+        """
         self.ensure_inited()
         assert self.pool is not None
-        conn: Connection = await self.pool.acquire()
-        try:
-            yield conn
-        finally:
-            # release 回收连接
-            self.pool.release(conn)
+        async with self.dependency.guard():
+            conn: Connection = await self._acquire_conn()
+            interrupted = False
+            try:
+                yield conn
+            except (asyncio.CancelledError, asyncio.TimeoutError, DeadlineExceeded):
+                interrupted = True
+                raise
+            finally:
+                # release 回收连接
+                self._release_conn(conn, interrupted)
 
     # 便利方法
     async def fetchone(self, sql: str, args: Optional[Iterable] = None, dict_cursor: bool = True):
-        async with self.acquire() as conn:
-            cursor_factory = aiomysql.DictCursor if dict_cursor else None
-            async with conn.cursor(cursor_factory) as cur:
-                await cur.execute(sql, args or ())
-                return await cur.fetchone()
+        with span("mysql.fetchone", KIND_CLIENT, **{"db.system": "mysql", "db.statement": sql[:300]}):
+            async with self.acquire() as conn:
+                cursor_factory = aiomysql.DictCursor if dict_cursor else None
+                async with conn.cursor(cursor_factory) as cur:
+                    await with_deadline(cur.execute(sql, args or ()), "mysql.fetchone")
+                    return await cur.fetchone()
 
     async def fetchall(self, sql: str, args: Optional[Iterable] = None, dict_cursor: bool = True):
-        async with self.acquire() as conn:
-            cursor_factory = aiomysql.DictCursor if dict_cursor else None
-            async with conn.cursor(cursor_factory) as cur:
-                await cur.execute(sql, args or ())
-                return await cur.fetchall()
+        with span("mysql.fetchall", KIND_CLIENT, **{"db.system": "mysql", "db.statement": sql[:300]}) as current:
+            async with self.acquire() as conn:
+                cursor_factory = aiomysql.DictCursor if dict_cursor else None
+                async with conn.cursor(cursor_factory) as cur:
+                    await with_deadline(cur.execute(sql, args or ()), "mysql.fetchall")
+                    rows = await cur.fetchall()
+                    if current is not None:
+                        current.set_attribute("db.rows", len(rows))
+                    return rows
 
     async def execute(self, sql: str, args: Optional[Iterable] = None):
         """
@@ -111,12 +208,15 @@ class AsyncMySQL:
         返回 (rowcount, lastrowid)。如果不需要 lastrowid，可只使用 [0]。
         注意：如果初始化时 autocommit=False，需要外部 commit（transaction() 场景会自动 commit/rollback）。
         """
-        async with self.acquire() as conn:
-            async with conn.cursor() as cur:
-                await cur.execute(sql, args or ())
-                # lastrowid 在某些驱动/语句下为 None
-                lastrowid = getattr(cur, "lastrowid", None)
-                return cur.rowcount, lastrowid
+        with span("mysql.execute", KIND_CLIENT, **{"db.system": "mysql", "db.statement": sql[:300]}) as current:
+            async with self.acquire() as conn:
+                async with conn.cursor() as cur:
+                    await with_deadline(cur.execute(sql, args or ()), "mysql.execute")
+                    # lastrowid 在某些驱动/语句下为 None
+                    lastrowid = getattr(cur, "lastrowid", None)
+                    if current is not None:
+                        current.set_attribute("db.rows", cur.rowcount)
+                    return cur.rowcount, lastrowid
 
     @asynccontextmanager
     async def transaction(self):
@@ -129,87 +229,167 @@ class AsyncMySQL:
         """
         self.ensure_inited()
         assert self.pool is not None
-        conn = await self.pool.acquire()  # type: ignore
-        try:
-            await conn.begin()
+        async with self.dependency.guard():
+            conn = await self._acquire_conn()
+            interrupted = False
             try:
-                yield conn
-                await conn.commit()
-            except Exception as err2:
-                logger.exception(f"事务执行失败，回滚中...，错误信息：{err2}")
-                await conn.rollback()
-                raise
-        finally:
-            self.pool.release(conn)
+                await conn.begin()
+                try:
+                    yield conn
+                    await conn.commit()
+                except (asyncio.CancelledError, asyncio.TimeoutError, DeadlineExceeded):
+                    # 连接状态未知，不回滚，直接关闭连接，服务端会自动回滚未提交的事务
+                    interrupted = True
+                    raise
+                except Exception as err2:
+                    logger.exception(f"事务执行失败，回滚中...，错误信息：{err2}")
+                    await conn.rollback()
+                    raise
+            finally:
+                self._release_conn(conn, interrupted)
 
 
 # ---------- 异步 Redis 管理 ----------
 class AsyncRedis:
+    """
+    每个 worker 唯一的 Redis 连接管理：一个连接池，所有模块（缓存、计数、锁、选主、发布订阅）共用。
+    客户端不做 decode_responses，统一返回 bytes（数字、JSON 可直接解析，需要文本时由调用方 decode）。
+    """
+
     def __init__(self):
         self.client: Optional[Redis] = None
+        self.pool: Optional[redis_asyncio.ConnectionPool] = None
         self._init_lock = asyncio.Lock()
+        # 缓存是可选的：Redis 故障时 get_json/set 直接按未命中/跳过处理，不拖慢请求
+        self.dependency = build_dependency("redis", REDIS_FAILURES, max_concurrent=100, max_wait=0.2, timeout=0.5)
 
     async def init_pool(self, url: Optional[str] = None, **kwargs):
         """
-        初始化 Redis 客户端；
+        初始化连接池与客户端（幂等）；
         - 优先使用 url（比如 redis://:password@host:port/db）
-        - 否则使用 host/port/db/password 等 kwargs 构建 URL
+        - 否则使用 host/port/db/password
+        - max_connections：连接池上限，默认 redis.max_connections；连接用完时最多等待 pool_timeout 秒
         """
         async with self._init_lock:
             if self.client is not None:
                 return
             logger.info("初始化 Redis 客户端...")
-            # 支持传入 redis URL 或 host/port/db/password
+            max_connections = kwargs.pop("max_connections", None) or (
+                public_config.get(key="redis.max_connections", get_type=int, default=100) if public_config else 100)
+            pool_timeout = kwargs.pop("pool_timeout", None) or (
+                public_config.get(key="redis.pool_timeout", get_type=float, default=1) if public_config else 1)
+            # 连接用完时排队等待而不是直接抛 "Too many connections"
+            pool_options = dict(max_connections=max_connections, timeout=pool_timeout)
             try:
                 if url:
-                    # 直接使用传入的 url（并传递其他 redis 参数）
-                    self.client = redis_asyncio.from_url(url, **{k: v for k, v in kwargs.items() if k != "password"})
-                    # 有些版本需要单独传 password
-                    if "password" in kwargs and kwargs["password"] is not None:
-                        # redis.from_url 会根据 URL 解析密码，若需要可在 URL 中放入密码
-                        pass
+                    self.pool = redis_asyncio.BlockingConnectionPool.from_url(url, **pool_options, **kwargs)
                 else:
-                    host = kwargs.get("host", "localhost")
-                    port = kwargs.get("port", 6379)
-                    db = kwargs.get("db", 0)
-                    password = kwargs.get("password", None)
-                    # 构建 redis url（如果有密码，采用 redis://:password@host:port/db）
-                    if password:
-                        redis_url = f"redis://:{password}@{host}:{port}/{db}"
-                    else:
-                        redis_url = f"redis://{host}:{port}/{db}"
-                    self.client = redis_asyncio.from_url(redis_url)
+                    self.pool = redis_asyncio.BlockingConnectionPool(
+                        host=kwargs.get("host", "localhost"),
+                        port=kwargs.get("port", 6379),
+                        db=kwargs.get("db", 0),
+                        password=kwargs.get("password") or None,
+                        **pool_options,
+                    )
+                self.client = Redis(connection_pool=self.pool)
                 # 测试连接
                 await self.client.ping()
             except Exception as e:
                 logger.exception("Redis ping 失败")
+                await self._release()
                 raise RuntimeError("Redis connection failed") from e
-            logger.info("Redis 客户端就绪")
+            logger.info(f"Redis 客户端就绪（连接池上限 {max_connections}）")
+
+    async def init_from_config(self):
+        """按 config.ini [redis] 初始化（幂等），服务启动与命令行工具共用"""
+        await self.init_pool(
+            host=public_config.get(key="redis.host", get_type=str),
+            port=public_config.get(key="redis.port", get_type=int),
+            db=public_config.get(key="redis.db", get_type=int),
+            password=public_config.get(key="redis.password", get_type=str, default=""),
+        )
+
+    async def _release(self):
+        client, pool = self.client, self.pool
+        self.client = self.pool = None
+        if client is not None:
+            try:
+                await client.aclose()  # 取代 await self.client.close()
+            except AttributeError:
+                # 向后兼容旧版本 redis (<5.0)
+                await client.close()
+        if pool is not None:
+            await pool.disconnect()
 
     async def close(self):
         if self.client is not None:
             logger.info("关闭 Redis 客户端...")
-            try:
-                await self.client.aclose()  # 取代 await self.client.close()
-            except AttributeError:
-                # 向后兼容旧版本 redis (<5.0)
-                await self.client.close()
-            self.client = None
+            await self._release()
             logger.info("Redis 客户端已关闭")
 
     def ensure_inited(self):
         if self.client is None:
             raise RuntimeError("Redis client not initialized. Call init_pool first.")
 
-    # 基础操作（原始值：bytes / str）
-    async def get(self, key: str):
+    async def ping(self) -> Dict[str, Any]:
+        """健康探测：PING（不经过熔断统计）"""
+        self.ensure_inited()
+        await self.client.ping()
+        return {"max_connections": self.pool.max_connections, "breaker_open": not self.dependency.available}
+
+    async def prefill(self, count: int) -> int:
+        """预热：同时建立 count 个连接（PING 验证）后放回连接池，返回预建的连接数"""
         self.ensure_inited()
-        return await self.client.get(key)
+        count = min(count, self.pool.max_connections)
+        conns = await asyncio.gather(*[self.pool.get_connection("PING") for _ in range(count)],
+                                     return_exceptions=True)
+        try:
+            for conn in conns:
+                if isinstance(conn, BaseException):
+                    raise conn
+                await conn.send_command("PING")
+                await conn.read_response()
+        finally:
+            for conn in conns:
+                if not isinstance(conn, BaseException):
+                    await self.pool.release(conn)
+        return count
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None and self.dependency.available
+
+    async def _command(self, name: str, func: Callable[..., Coroutine], *args, **kwargs):
+        """所有命令统一经过熔断/超时保护，并记录 span"""
+        with span(f"redis.{name}", KIND_CLIENT, **{"db.system": "redis", "db.operation": name}):
+            return await self.dependency.call(func, *args, **kwargs)
+
+    async def command(self, name: str, *args, **kwargs):
+        """
+        执行任意 Redis 命令（name 为 redis-py 客户端方法名，如 "zrangebyscore"、"eval"），
+        经过熔断/并发隔离/超时保护；其他模块统一通过这里访问 Redis，不直接调用 client。
+        """
+        self.ensure_inited()
+        return await self._command(name, getattr(self.client, name), *args, **kwargs)
+
+    def pipeline(self, transaction: bool = True) -> Pipeline:
+        """创建 pipeline（只缓冲命令，不发起 I/O），组装完成后交给 execute 执行"""
+        self.ensure_inited()
+        return self.client.pipeline(transaction=transaction)
+
+    async def execute(self, pipe: Pipeline) -> List[Any]:
+        """执行 pipeline，作为一次命令经过熔断/超时保护"""
+        return await self._command("pipeline", pipe.execute)
+
+    # 基础操作（原始值：bytes / str），熔断中或并发已满时抛出 DependencyUnavailable
+    async def get(self, key: str):
+        return await self.command("get", key)
 
     async def set(self, key: str, value: Any, ex: Optional[int] = None):
         """
         自动序列化：如果 value 不是 str/bytes，则 JSON 序列化存储。
         ex 为秒级过期时间。
+        作为缓存写入使用：Redis 不可用时跳过并返回 None，不影响主流程。
         """
         self.ensure_inited()
         if not isinstance(value, (str, bytes, bytearray)):
@@ -219,21 +399,30 @@ class AsyncRedis:
                 logger.exception(f"Redis 值 JSON 序列化失败，尝试转为 str 存储，错误信息：{err3}")
                 # fallback: 转为 str
                 value = str(value)
-        return await self.client.set(key, value, ex=ex)
+        try:
+            return await self.command("set", key, value, ex=ex)
+        except (DependencyUnavailable, *REDIS_FAILURES, asyncio.TimeoutError) as err:
+            logger.warning(f"Redis 不可用，跳过缓存写入 key={key}：{err!r}")
+            return None
 
     async def delete(self, key: str):
-        self.ensure_inited()
-        return await self.client.delete(key)
+        return await self.command("delete", key)
 
     async def exists(self, key: str):
-        self.ensure_inited()
-        return await self.client.exists(key)
+        return await self.command("exists", key)
 
     # 更友好的 JSON API
     async def get_json(self, key: str):
-        """尝试从 redis 取值并 json.loads，失败时返回原始字符串/bytes"""
+        """
+        尝试从 redis 取值并 json.loads，失败时返回原始字符串/bytes。
+        作为缓存读取使用：Redis 不可用时按未命中返回 None。
+        """
         self.ensure_inited()
-        raw = await self.get(key)
+        try:
+            raw = await self.get(key)
+        except (DependencyUnavailable, *REDIS_FAILURES, asyncio.TimeoutError) as err:
+            logger.warning(f"Redis 不可用，按缓存未命中处理 key={key}：{err!r}")
+            return None
         if raw is None:
             return None
         if isinstance(raw, (bytes, bytearray)):
@@ -254,13 +443,11 @@ class AsyncRedis:
         尝试获取锁（非阻塞）。返回 True/False。
         基于 SET NX EX。
         """
-        self.ensure_inited()
         # redis-py(set) 采用 set(name, value, nx=True, ex=lock_ttl)
-        return await self.client.set(lock_key, "1", nx=True, ex=lock_ttl)
+        return await self.command("set", lock_key, "1", nx=True, ex=lock_ttl)
 
     async def release_lock(self, lock_key: str):
-        self.ensure_inited()
-        await self.client.delete(lock_key)
+        await self.command("delete", lock_key)
 
 
 # ---------- 缓存装饰器：自动缓存查询结果（支持防穿透锁） ----------
@@ -287,6 +474,9 @@ def cached(key_builder: Callable[..., str], ttl: int = 60, null_ttl: int = 5, lo
                 if redis is None or redis.client is None:
                     logger.debug("Redis 未初始化，跳过缓存逻辑")
                     return await func(*args, **kwargs)
+                if not redis.available:
+                    logger.debug("Redis 熔断中，跳过缓存逻辑")
+                    return await func(*args, **kwargs)
             except Exception as err7:
                 # defensive
                 logger.exception(f"Redis 检查失败，直接回退执行函数，错误信息：{err7}")
@@ -298,8 +488,12 @@ def cached(key_builder: Callable[..., str], ttl: int = 60, null_ttl: int = 5, lo
                 return raw
 
             lock_key = cache_key + ":lock"
-            # 2. 获取分布式锁，防止缓存击穿
-            got = await redis.acquire_lock(lock_key, lock_ttl=lock_ttl)
+            # 2. 获取分布式锁，防止缓存击穿；Redis 不可用时不再加锁，直接执行函数
+            try:
+                got = await redis.acquire_lock(lock_key, lock_ttl=lock_ttl)
+            except (DependencyUnavailable, *REDIS_FAILURES, asyncio.TimeoutError) as err:
+                logger.warning(f"获取缓存锁失败，直接执行函数 lock_key={lock_key}：{err!r}")
+                return await func(*args, **kwargs)
             if not got:
                 # 等待锁释放后再读取缓存（自旋 + 超时）
                 wait_start = time.time()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : serve.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 服务启动入口：按硬件配置计算 worker 数，支持不断流的滚动重载
+#
+# 用法：
+#   python3 -m Launcher.serve start     # 前台启动 Gunicorn 主进程（systemd ExecStart）
+#   python3 -m Launcher.serve reload    # 逐个替换 worker，加载新代码（systemd ExecReload）
+#   python3 -m Launcher.serve status    # 查看主进程与就绪 worker
+#   python3 -m Launcher.serve wait      # 等待全部 worker 完成启动预热并就绪（部署脚本使用）
+#   python3 -m Launcher.serve stop      # 优雅停止
+#
+# 滚动重载原理：监听 socket 由 Gunicorn 主进程持有，worker 只是继承它，
+# 所以替换 worker 期间 socket 一直在 listen，新连接在队列里等待而不会被拒绝。
+# 每一轮：TTIN 多拉起一个新 worker -> 等它写入就绪标记 -> TTOU 让最老的 worker 处理完请求后退出。
+# 注意：Config/、Launcher/ 的改动在主进程里，需要 systemctl restart 才会生效。
+
+import argparse
+import os
+import signal
+import sys
+import time
+from typing import Dict, Optional
+
+from gunicorn.app.base import BaseApplication
+
+from Config.config_loader import initialize_config, public_config
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+APP_MODULE = "ReceiveNotify.receive_notify:notify"
+WORKER_CLASS = "Launcher.worker.NotifyWorker"
+
+
+def worker_count() -> int:
+    """
+    server.workers > 0 时直接使用；否则按 hardware.logical_cores 计算。
+    UvicornWorker 是异步 worker，一个进程就能占满一个核心，
+    同步 worker 的 "核心数 * 2 + 1" 在这里只会多占内存。
+    """
+    workers = public_config.get(key="server.workers", get_type=int, default=0)
+    if workers > 0:
+        return workers
+    cores = public_config.get(key="hardware.logical_cores", get_type=int, default=0) or os.cpu_count() or 1
+    return max(1, cores)
+
+
+def gunicorn_options() -> Dict[str, object]:
+    host = public_config.get(key="server.host", get_type=str, default="127.0.0.1")
+    port = public_config.get(key="server.port", get_type=int, default=4911)
+    return {
+        "bind": f"{host}:{port}",
+        "workers": worker_count(),
+        "worker_class": WORKER_CLASS,
+        "backlog": public_config.get(key="server.backlog", get_type=int, default=2048),
+        "keepalive": public_config.get(key="server.keepalive", get_type=int, default=5),
+        "timeout": public_config.get(key="server.timeout", get_type=int, default=60),
+        "graceful_timeout": public_config.get(key="server.graceful_timeout", get_type=int, default=30),
+        # 主进程重启（USR2）时新旧主进程可以同时绑定端口
+        "reuse_port": public_config.get(key="server.reuse_port", get_type=bool, default=True),
+        "pidfile": pid_file(),
+        # 不预加载：应用在 worker fork 之后导入，滚动重载拉起的新 worker 才会加载新代码
+        "preload_app": False,
+        "proc_name": "receive-notify",
+    }
+
+
+def pid_file() -> str:
+    return public_config.get(key="server.pid_file", get_type=str, default="/data/FastAPI-Main/run/receive-notify.pid")
+
+
+def ready_dir() -> str:
+    return public_config.get(key="server.ready_dir", get_type=str, default="/data/FastAPI-Main/run/workers")
+
+
+class NotifyApplication(BaseApplication):
+    """在进程内运行 Gunicorn，配置全部来自 config.ini 而不是命令行参数"""
+
+    def __init__(self, options: Dict[str, object]):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # 在 worker 进程中执行
+        from ReceiveNotify.receive_notify import notify
+        return notify
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_master_pid() -> Optional[int]:
+    try:
+        with open(pid_file(), "r") as f:
+            pid = int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+    return pid if _alive(pid) else None
+
+
+def ready_workers(master_pid: int) -> Dict[int, float]:
+    """当前主进程下已就绪的 worker：pid -> 就绪时间；顺带清理崩溃 worker 留下的标记"""
+    workers = {}
+    directory = ready_dir()
+    if not os.path.isdir(directory):
+        return workers
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            pid = int(name)
+            with open(path, "r") as f:
+                parent = int(f.read().strip() or 0)
+            ready_at = os.path.getmtime(path)
+        except (ValueError, OSError):
+            continue
+        if not _alive(pid):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        if parent == master_pid:
+            workers[pid] = ready_at
+    return workers
+
+
+def _wait(predicate, timeout: float, interval: float = 0.2) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(interval)
+    return predicate()
+
+
+def start():
+    options = gunicorn_options()
+    os.makedirs(os.path.dirname(pid_file()), exist_ok=True)
+    os.makedirs(ready_dir(), exist_ok=True)
+    logger.info(f"启动服务: bind={options['bind']} workers={options['workers']}")
+    NotifyApplication(options).run()
+
+
+def reload() -> int:
+    """逐个替换 worker；任一新 worker 未能就绪则停止滚动，保留剩余旧 worker 继续服务"""
+    master = read_master_pid()
+    if master is None:
+        print("服务未运行，无法重载")
+        return 1
+
+    reload_timeout = public_config.get(key="server.reload_timeout", get_type=int, default=60)
+    graceful_timeout = public_config.get(key="server.graceful_timeout", get_type=int, default=30)
+
+    old_workers = ready_workers(master)
+    if not old_workers:
+        print("没有就绪的 worker，改为整体重载 (HUP)")
+        os.kill(master, signal.SIGHUP)
+        return 0
+
+    known = set(old_workers)
+    remaining = set(old_workers)
+    print(f"开始滚动重载，共 {len(old_workers)} 个 worker")
+    for index, old_pid in enumerate(sorted(old_workers, key=old_workers.get), start=1):
+        os.kill(master, signal.SIGTTIN)
+        fresh = set()
+
+        def new_worker_ready():
+            fresh.update(set(ready_workers(master)) - known)
+            return bool(fresh)
+
+        if not _wait(new_worker_ready, reload_timeout):
+            # 把多拉起的那个名额收回，主进程会保持原有 worker 数
+            os.kill(master, signal.SIGTTOU)
+            print(f"新 worker 在 {reload_timeout} 秒内未就绪，停止滚动重载，请检查日志")
+            logger.error("滚动重载失败：新 worker 未就绪")
+            return 1
+        known.update(fresh)
+
+        # TTOU：主进程让最老的 worker 优雅退出（处理完在途请求）
+        os.kill(master, signal.SIGTTOU)
+        if not _wait(lambda: any(not _alive(pid) for pid in remaining), graceful_timeout + 5):
+            print("旧 worker 未在优雅退出时间内结束")
+        remaining = {pid for pid in remaining if _alive(pid)}
+        print(f"[{index}/{len(old_workers)}] 新 worker {sorted(fresh)} 已就绪，旧 worker 已退出")
+
+    logger.info("滚动重载完成")
+    print("滚动重载完成")
+    return 0
+
+
+def status() -> int:
+    master = read_master_pid()
+    if master is None:
+        print("服务未运行")
+        return 1
+    workers = ready_workers(master)
+    print(f"主进程: {master}，就绪 worker: {len(workers)} 个 {sorted(workers)}")
+    return 0
+
+
+def wait() -> int:
+    """等待就绪 worker 数达到配置的 worker 数（就绪标记在 lifespan 启动预热完成后写入）"""
+    reload_timeout = public_config.get(key="server.reload_timeout", get_type=int, default=60)
+    expected = worker_count()
+    if not _wait(lambda: read_master_pid() is not None, reload_timeout):
+        print(f"服务未在 {reload_timeout} 秒内启动")
+        return 1
+    master = read_master_pid()
+    if not _wait(lambda: len(ready_workers(master)) >= expected, reload_timeout):
+        print(f"{reload_timeout} 秒内就绪 worker {len(ready_workers(master))}/{expected} 个，请检查日志")
+        return 1
+    print(f"全部 {expected} 个 worker 已就绪")
+    return 0
+
+
+def stop() -> int:
+    master = read_master_pid()
+    if master is None:
+        print("服务未运行")
+        return 1
+    os.kill(master, signal.SIGTERM)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="支付通知服务启动器")
+    parser.add_argument("command", choices=("start", "reload", "status", "wait", "stop"))
+    args = parser.parse_args()
+
+    initialize_config()
+    if args.command == "start":
+        start()
+    else:
+        sys.exit({"reload": reload, "status": status, "wait": wait, "stop": stop}[args.command]())
+
+
+if __name__ == "__main__":
+    main()
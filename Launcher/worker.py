@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : worker.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : Gunicorn 的 Uvicorn worker：选择 uvloop/httptools，启动完成后写就绪标记供滚动重载判断
+
+import asyncio
+import importlib.util
+import os
+import sys
+
+from gunicorn.arbiter import Arbiter
+from uvicorn.server import Server
+from uvicorn.workers import UvicornWorker
+
+from Config.config_loader import public_config
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+
+def _select(name: str, wanted: str, module: str) -> str:
+    """配置的实现未安装时（例如 Windows 上没有 uvloop）退回 auto"""
+    if wanted == module and importlib.util.find_spec(module) is None:
+        logger.warning(f"{name}={wanted} 未安装，改用 auto")
+        return "auto"
+    return wanted
+
+
+def ready_path(pid: int) -> str:
+    ready_dir = public_config.get(key="server.ready_dir", get_type=str, default="/data/FastAPI-Main/run/workers")
+    return os.path.join(ready_dir, str(pid))
+
+
+class NotifyWorker(UvicornWorker):
+    """
+    与 UvicornWorker 相同，区别：
+    - loop / http 从 server 配置读取（默认 uvloop + httptools）
+    - lifespan 启动完成、开始接收请求后写入 ready_dir/<pid>，退出时删除
+      滚动重载依赖这个标记判断新 worker 已可接流量，再让旧 worker 退出
+    """
+
+    CONFIG_KWARGS = {
+        "loop": _select("loop", public_config.get(key="server.loop", get_type=str, default="uvloop"), "uvloop"),
+        "http": _select("http", public_config.get(key="server.http", get_type=str, default="httptools"), "httptools"),
+        # 收到退出信号后等待在途连接的上限，超时的连接任务会被取消，保证能进入 lifespan 清理阶段
+        "timeout_graceful_shutdown": public_config.get(key="shutdown.drain_timeout", get_type=int, default=15),
+    }
+
+    async def _wait_started(self, server: Server):
+        while not server.started:
+            if server.should_exit:
+                return
+            await asyncio.sleep(0.1)
+
+        path = ready_path(os.getpid())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(str(self.ppid))
+        logger.info(f"worker {os.getpid()} 已就绪")
+
+    async def _serve(self) -> None:
+        self.config.app = self.wsgi
+        server = Server(config=self.config)
+        self._install_sigquit_handler()
+        watcher = asyncio.create_task(self._wait_started(server))
+        try:
+            await server.serve(sockets=self.sockets)
+        finally:
+            watcher.cancel()
+            try:
+                os.remove(ready_path(os.getpid()))
+            except FileNotFoundError:
+                pass
+        if not server.started:
+            sys.exit(Arbiter.WORKER_BOOT_ERROR)
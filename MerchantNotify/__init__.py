@@ -0,0 +1,7 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : __init__.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  :
@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : forwarder.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 下游商户回调转发：持久化重试队列 + 按主机复用的 keep-alive 连接池 + 按主机并发上限
+#
+# 流程：
+#   收到 Pay-RX 回调 -> enqueue() 一条 INSERT ... SELECT 写入 merchant_callback（按订单路由到商户）
+#   -> 后台调度循环领取到期记录 -> 按商户主机限流推送 -> 成功标记完成 / 失败按退避表重新排期
+# 回调接口只做一次入库，从不等待商户响应；慢商户只会占用它自己主机的并发名额。
+
+import asyncio
+import os
+import random
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Set
+from urllib.parse import urlsplit
+
+import httpx  # pip install httpx
+
+from Config.config_loader import public_config
+from DataBase.async_database import mysql_manager
+from Logger.logger_config import setup_logger
+from Telegram.auto_bot import send_telegram_message
+from Utils.handle_md5 import generate_post_sign
+from Utils.handle_shutdown import shutdown_coordinator
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+# merchant_callback.status
+STATUS_PENDING = 0
+STATUS_DELIVERED = 1
+STATUS_GAVE_UP = 2
+
+_ENQUEUE_SQL = (
+    "INSERT IGNORE INTO `merchant_callback` "
+    "(`notify_type`, `sys_order_no`, `mch_order_no`, `mch_no`, `notify_url`, `state`, `amount`, `extra_field`) "
+    "SELECT %s, %s, o.`mch_order_no`, o.`mch_no`, COALESCE(NULLIF(o.`notify_url`, ''), m.`notify_url`), %s, %s, %s "
+    "FROM `merchant_order` o JOIN `merchant_info` m ON m.`mch_no` = o.`mch_no` AND m.`status` = 1 "
+    "WHERE o.`mch_order_no` = %s AND COALESCE(NULLIF(o.`notify_url`, ''), m.`notify_url`) <> ''"
+)
+
+_CLAIM_SQL = (
+    "UPDATE `merchant_callback` SET `lease_token` = %s, `lease_until` = NOW() + INTERVAL %s SECOND "
+    "WHERE `status` = 0 AND `next_attempt_at` <= NOW() AND (`lease_until` IS NULL OR `lease_until` < NOW()) "
+    "ORDER BY `next_attempt_at` LIMIT %s"
+)
+
+_CLAIMED_SQL = (
+    "SELECT c.`id`, c.`notify_type`, c.`sys_order_no`, c.`mch_order_no`, c.`mch_no`, c.`notify_url`, "
+    "c.`state`, c.`amount`, c.`extra_field`, c.`attempts`, m.`secret_key`, m.`max_concurrency` "
+    "FROM `merchant_callback` c LEFT JOIN `merchant_info` m ON m.`mch_no` = c.`mch_no` AND m.`status` = 1 "
+    "WHERE c.`lease_token` = %s"
+)
+
+
+def _parse_int_list(value: str) -> List[int]:
+    return [int(item) for item in str(value).split(",") if item.strip()]
+
+
+class HostPool:
+    """单个商户主机：独立的 keep-alive 连接池和并发上限"""
+
+    def __init__(self, concurrency: int, timeout: httpx.Timeout):
+        self.concurrency = concurrency
+        self.active = 0
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency,
+                                keepalive_expiry=30),
+            headers={"User-Agent": "Pay-Notify-Forwarder/1.0"},
+        )
+
+    @property
+    def saturated(self) -> bool:
+        return self.active >= self.concurrency
+
+
+class MerchantForwarder:
+    def __init__(self, enable: bool = True, retry_schedule: Sequence[int] = (15, 60, 300, 1800, 3600, 7200, 21600),
+                 forward_states: Sequence[int] = (2, 3), host_concurrency: int = 4, max_in_flight: int = 64,
+                 batch_size: int = 50, lease_seconds: int = 120, poll_interval: float = 2,
+                 connect_timeout: float = 3, read_timeout: float = 10, success_body: str = "success",
+                 sign_upper: bool = True, max_hosts: int = 256, host_busy_delay: int = 2):
+        self.enable = enable
+        self.retry_schedule = list(retry_schedule)
+        self.forward_states = set(forward_states)
+        self.host_concurrency = host_concurrency
+        self.max_in_flight = max_in_flight
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.success_body = success_body.lower()
+        self.sign_upper = sign_upper
+        self.max_hosts = max_hosts
+        self.host_busy_delay = host_busy_delay
+
+        self._pools: "OrderedDict[str, HostPool]" = OrderedDict()
+        self._in_flight: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {"enqueued": 0, "delivered": 0, "failed_attempts": 0, "gave_up": 0, "deferred": 0}
+
+    # ---------------- 入队（回调接口调用） ----------------
+    async def enqueue(self, notify_type: int, notify_data) -> bool:
+        """按下游订单号路由到商户并写入转发队列；无对应商户或状态无需转发时返回 False"""
+        if not self.enable or notify_data.state not in self.forward_states:
+            return False
+        try:
+            rowcount, _ = await mysql_manager.execute(_ENQUEUE_SQL, (
+                notify_type, notify_data.sysOrderNo, notify_data.state, notify_data.amount,
+                getattr(notify_data, "extraField", None), notify_data.mchOrderNo))
+        except Exception as err:
+            logger.exception(f"商户回调入队失败 {notify_data.mchOrderNo}: {err}")
+            return False
+        if rowcount:
+            self.counters["enqueued"] += 1
+            self._wakeup.set()
+        return bool(rowcount)
+
+    # ---------------- 调度循环 ----------------
+    async def _claim(self, limit: int) -> List[Dict[str, Any]]:
+        token = uuid.uuid4().hex
+        rowcount, _ = await mysql_manager.execute(_CLAIM_SQL, (token, self.lease_seconds, limit))
+        if not rowcount:
+            return []
+        return list(await mysql_manager.fetchall(_CLAIMED_SQL, (token,)))
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            claimed = []
+            free = self.max_in_flight - len(self._in_flight)
+            if free > 0:
+                try:
+                    claimed = await self._claim(min(free, self.batch_size))
+                except Exception as err:
+                    logger.error(f"领取待推送回调失败: {err}")
+            for row in claimed:
+                self._dispatch(row)
+            if claimed and len(claimed) == min(free, self.batch_size):
+                # 还有积压，不等待直接继续领取
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch(self, row: Dict[str, Any]):
+        url = row["notify_url"]
+        parts = urlsplit(url)
+        if not row["secret_key"]:
+            self._track(self._finish(row, None, "商户不存在或已禁用", give_up=True))
+            return
+        if parts.scheme not in ("http", "https") or not parts.netloc:
+            self._track(self._finish(row, None, f"回调地址无效: {url[:100]}", give_up=True))
+            return
+
+        pool = self._pool_for(f"{parts.scheme}://{parts.netloc}", row["max_concurrency"])
+        if pool.saturated:
+            # 该主机已达并发上限：不占用全局名额，稍后重新领取（不计入重试次数）
+            self.counters["deferred"] += 1
+            self._track(self._defer(row))
+            return
+        pool.active += 1
+        self._track(self._deliver(row, pool))
+
+    def _track(self, coro):
+        task = asyncio.create_task(coro)
+        self._in_flight.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        self._in_flight.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"商户回调推送任务异常: {task.exception()}")
+        # 有名额空出，唤醒调度循环
+        self._wakeup.set()
+
+    def _pool_for(self, host: str, max_concurrency: Optional[int]) -> HostPool:
+        pool = self._pools.get(host)
+        if pool is None:
+            pool = HostPool(max_concurrency or self.host_concurrency, self.timeout)
+            self._pools[host] = pool
+            self._evict_idle_pools()
+        self._pools.move_to_end(host)
+        return pool
+
+    def _evict_idle_pools(self):
+        for host in list(self._pools):
+            if len(self._pools) <= self.max_hosts:
+                break
+            if self._pools[host].active == 0:
+                self._track(self._pools.pop(host).client.aclose())
+
+    # ---------------- 推送与结果记录 ----------------
+    def build_payload(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        payload = {
+            "mchNo": row["mch_no"],
+            "mchOrderNo": row["mch_order_no"],
+            "sysOrderNo": row["sys_order_no"],
+            "notifyType": row["notify_type"],
+            "state": row["state"],
+            "amount": row["amount"],
+            "timestamp": int(time.time()),
+        }
+        if row["extra_field"]:
+            payload["extraField"] = row["extra_field"]
+        return generate_post_sign(payload, row["secret_key"], is_upper=self.sign_upper)
+
+    async def _deliver(self, row: Dict[str, Any], pool: HostPool):
+        status, error = None, None
+        try:
+            response = await pool.client.post(row["notify_url"], json=self.build_payload(row))
+            status = response.status_code
+            if status != 200 or response.text.strip().lower() != self.success_body:
+                error = f"HTTP {status}: {response.text[:100]}"
+        except httpx.HTTPError as err:
+            error = f"{type(err).__name__}: {err}"[:255]
+        except Exception as err:
+            # 签名、构造报文、非法 URL、响应解码等非网络错误同样计入重试次数，按退避/放弃流程处理，
+            # 否则记录一直处于租约中，每个租期被重新领取一次且 attempts 不增加
+            logger.exception(f"商户回调推送异常 {row['mch_no']} {row['mch_order_no']}: {err!r}")
+            error = f"{type(err).__name__}: {err}"[:255]
+        finally:
+            pool.active -= 1
+        await self._finish(row, status, error)
+
+    async def _finish(self, row: Dict[str, Any], status: Optional[int], error: Optional[str], give_up: bool = False):
+        attempts = row["attempts"] + 1
+        if error is None:
+            self.counters["delivered"] += 1
+            await mysql_manager.execute(
+                "UPDATE `merchant_callback` SET `status` = %s, `attempts` = %s, `last_http_status` = %s, "
+                "`last_error` = NULL, `delivered_at` = NOW(), `lease_token` = NULL, `lease_until` = NULL "
+                "WHERE `id` = %s", (STATUS_DELIVERED, attempts, status, row["id"]))
+            logger.info(f"商户回调推送成功 {row['mch_no']} {row['mch_order_no']}（第 {attempts} 次）")
+            return
+
+        self.counters["failed_attempts"] += 1
+        if give_up or attempts > len(self.retry_schedule):
+            self.counters["gave_up"] += 1
+            await mysql_manager.execute(
+                "UPDATE `merchant_callback` SET `status` = %s, `attempts` = %s, `last_http_status` = %s, "
+                "`last_error` = %s, `lease_token` = NULL, `lease_until` = NULL WHERE `id` = %s",
+                (STATUS_GAVE_UP, attempts, status, error, row["id"]))
+            logger.error(f"商户回调放弃推送 {row['mch_no']} {row['mch_order_no']}: {error}")
+            if public_config.get(key="telegram.enable", get_type=bool):
+                shutdown_coordinator.spawn(send_telegram_message(
+                    f"⚠️ 商户 {row['mch_no']} 订单 {row['mch_order_no']} 回调推送失败（{attempts} 次），已停止重试：{error}"),
+                    name="telegram-forward-gave-up")
+            return
+
+        # 指数退避，加少量抖动避免同一批失败记录同时重试
+        delay = self.retry_schedule[attempts - 1]
+        delay += int(random.uniform(0, delay * 0.1))
+        await mysql_manager.execute(
+            "UPDATE `merchant_callback` SET `attempts` = %s, `last_http_status` = %s, `last_error` = %s, "
+            "`next_attempt_at` = NOW() + INTERVAL %s SECOND, `lease_token` = NULL, `lease_until` = NULL "
+            "WHERE `id` = %s", (attempts, status, error, delay, row["id"]))
+        logger.warning(f"商户回调推送失败 {row['mch_no']} {row['mch_order_no']}，{delay} 秒后第 {attempts + 1} 次重试: {error}")
+
+    async def _defer(self, row: Dict[str, Any]):
+        await mysql_manager.execute(
+            "UPDATE `merchant_callback` SET `next_attempt_at` = NOW() + INTERVAL %s SECOND, "
+            "`lease_token` = NULL, `lease_until` = NULL WHERE `id` = %s", (self.host_busy_delay, row["id"]))
+
+    # ---------------- 启停 ----------------
+    def start(self):
+        if self.enable and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="merchant-forwarder")
+            logger.info("商户回调转发已启动")
+
+    async def stop(self, timeout: Optional[float] = None):
+        """
+        停止领取新记录，在 timeout 内等待正在推送的请求完成；
+        未完成的记录保留领取状态，租约过期后由其他 worker 或重启后的进程重新推送
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._in_flight:
+            _, pending = await asyncio.wait(set(self._in_flight), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                logger.warning(f"{len(pending)} 个商户回调推送未完成，租约过期后将重新推送")
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        for pool in self._pools.values():
+            await pool.client.aclose()
+        self._pools.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "in_flight": len(self._in_flight),
+            "hosts": {host: pool.active for host, pool in self._pools.items()},
+        }
+
+
+merchant_forwarder = MerchantForwarder(
+    enable=public_config.get(key="forward.enable", get_type=bool, default=True),
+    retry_schedule=_parse_int_list(
+        public_config.get(key="forward.retry_schedule", get_type=str, default="15,60,300,1800,3600,7200,21600")),
+    forward_states=_parse_int_list(public_config.get(key="forward.states", get_type=str, default="2,3")),
+    host_concurrency=public_config.get(key="forward.host_concurrency", get_type=int, default=4),
+    max_in_flight=public_config.get(key="forward.max_in_flight", get_type=int, default=64),
+    batch_size=public_config.get(key="forward.batch_size", get_type=int, default=50),
+    lease_seconds=public_config.get(key="forward.lease_seconds", get_type=int, default=120),
+    poll_interval=public_config.get(key="forward.poll_interval", get_type=float, default=2),
+    connect_timeout=public_config.get(key="forward.connect_timeout", get_type=float, default=3),
+    read_timeout=public_config.get(key="forward.read_timeout", get_type=float, default=10),
+    success_body=public_config.get(key="forward.success_body", get_type=str, default="success"),
+    sign_upper=public_config.get(key="forward.sign_upper", get_type=bool, default=True),
+    max_hosts=public_config.get(key="forward.max_hosts", get_type=int, default=256),
+    host_busy_delay=public_config.get(key="forward.host_busy_delay", get_type=int, default=2),
+)
@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : seed.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 压测数据灌入工具：users / pay_notify_record 表，千万级数据
+#
+# 用法（在项目根目录）：
+#   python3 -m Models.seed users --rows 10000000
+#   python3 -m Models.seed users notify --method load_data --concurrency 8
+# 未指定的参数取 config.ini [seed] 段。
+#
+# 目标库为 seed.database（默认 fastapi_seed，与服务的 database.database 分开），连接参数为空时沿用 [database]；
+# 不存在时自动建库；表不存在时按服务库的表结构建表：同一 MySQL 实例用 CREATE TABLE ... LIKE，
+# 其他实例从服务库读取 SHOW CREATE TABLE 后在目标库执行（只读服务库），读不到则在写入前报错退出。
+# 目标指向服务正在使用的库时拒绝执行：灌数会删除索引、写入大量状态为 0/1 的历史记录，会干扰回调与定时检查。
+# 判断是否同一实例时主机名先解析为 IP，回环地址与本机地址视为同一主机（localhost 与 127.0.0.1 等价）。
+# - 按批整列生成数据（安装了 numpy 时向量化生成随机列，否则用 random）
+# - method=insert：多行 INSERT（executemany 自动合并为不超过 1 MB 的多行语句）
+#   method=load_data：每批写入临时 TSV 文件后 LOAD DATA LOCAL INFILE（需服务端 local_infile=ON），最快
+# - concurrency 个独立连接并行写入，批次通过队列分发；生成数据在线程中进行，与网络写入重叠
+# - drop_indexes（默认关闭）：灌入前删除非唯一二级索引（InnoDB 不支持 DISABLE KEYS），结束后一条 ALTER TABLE 重建
+#   （排序建索引，比逐行维护快得多）；删除前会把重建语句写入日志，中途被强杀时可手动执行恢复。
+#   UNIQUE 索引始终保留：重建时一旦有重复数据就会失败，表会失去唯一约束
+# - 灌数连接关闭 unique_checks，每批一个事务
+# 使用独立连接而不是 mysql_manager：单批写入可能超过服务的 SQL 超时，也不应计入服务的熔断统计。
+
+import argparse
+import asyncio
+import ipaddress
+import os
+import random
+import socket
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, FrozenSet, List, Sequence, Tuple
+
+import aiomysql
+
+from Config.config_loader import public_config
+from Logger.logger_config import setup_logger
+
+try:
+    import numpy as np  # pip install numpy（可选，向量化生成随机列）
+except ImportError:
+    np = None
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+# bcrypt("Test@123456")，所有测试用户共用，长度与真实哈希一致
+TEST_PASSWORD_HASH = "$2b$12$ljGege.GMVCJtwuZPh4lv.9Md.Vb/AEi6nYOifTkZvBoLXay0hpjq"
+
+
+class SeedTable:
+    def __init__(self, table: str, columns: Sequence[str], build: Callable[[str, int, int, int], List[Tuple]]):
+        self.table = table
+        self.columns = tuple(columns)
+        # build(本次运行前缀, 起始序号, 行数, 时间范围天数) -> 行列表（每行为字符串元组）
+        self.build = build
+
+
+def _random_columns(count: int, days: int) -> Dict[str, list]:
+    """公共随机列：created_at（最近 days 天内，UTC）等，返回字符串列表"""
+    now = int(time.time())
+    if np is not None:
+        rng = np.random.default_rng()
+        seconds = rng.integers(now - days * 86400, now, count)
+        # numpy 直接格式化为 ISO 字符串（MySQL 接受 T 分隔），比逐行 strftime 快一个数量级
+        created = np.datetime_as_string(seconds.astype("datetime64[s]"), unit="s").tolist()
+        return {"created_at": created, "rng": rng}
+    return {"created_at": [datetime.fromtimestamp(random.randint(now - days * 86400, now - 1), timezone.utc)
+                           .strftime("%Y-%m-%d %H:%M:%S") for _ in range(count)], "rng": None}
+
+
+def build_users(prefix: str, start: int, count: int, days: int) -> List[Tuple]:
+    common = _random_columns(count, days)
+    rng = common["rng"]
+    if rng is not None:
+        balance = (rng.integers(0, 1000000, count) / 100).astype(str).tolist()
+        active = rng.integers(0, 2, count).astype(str).tolist()
+    else:
+        balance = [f"{random.randint(0, 999999) / 100}" for _ in range(count)]
+        active = [random.choice("01") for _ in range(count)]
+    names = [f"{prefix}{index:011d}" for index in range(start, start + count)]
+    return [(name, f"{name}@example.com", TEST_PASSWORD_HASH, balance[i], active[i], created, created)
+            for i, (name, created) in enumerate(zip(names, common["created_at"]))]
+
+
+def build_notify_records(prefix: str, start: int, count: int, days: int) -> List[Tuple]:
+    common = _random_columns(count, days)
+    rng = common["rng"]
+    if rng is not None:
+        notify_type = rng.choice(["1", "2", "3"], count, p=[0.7, 0.25, 0.05]).tolist()
+        state = rng.choice(["0", "1", "2", "3"], count, p=[0.05, 0.1, 0.75, 0.1]).tolist()
+        amount = rng.integers(1000, 1000001, count).astype(str).tolist()
+        notify_count = rng.integers(1, 4, count).astype(str).tolist()
+    else:
+        notify_type = random.choices("123", weights=[70, 25, 5], k=count)
+        state = random.choices("0123", weights=[5, 10, 75, 10], k=count)
+        amount = [str(random.randint(1000, 1000000)) for _ in range(count)]
+        notify_count = [str(random.randint(1, 3)) for _ in range(count)]
+    return [(notify_type[i], f"P{prefix}{index:014d}", f"M{prefix}{index:014d}", state[i], amount[i],
+             notify_count[i], created, created)
+            for i, (index, created) in enumerate(zip(range(start, start + count), common["created_at"]))]
+
+
+SEED_TABLES = {
+    "users": SeedTable(
+        "users",
+        ("username", "email", "hashed_password", "balance", "is_active", "created_at", "updated_at"),
+        build_users),
+    "notify": SeedTable(
+        "pay_notify_record",
+        ("notify_type", "sys_order_no", "mch_order_no", "state", "amount", "notify_count", "created_at", "updated_at"),
+        build_notify_records),
+}
+
+
+# ---------------- 目标库 ----------------
+class SeedTargetError(RuntimeError):
+    """灌数目标不安全（指向服务正在使用的库）或无法使用（目标库缺表且无法建表）"""
+
+
+def _service_target() -> Dict:
+    return {
+        "host": public_config.get(key="database.host", get_type=str),
+        "port": public_config.get(key="database.port", get_type=int),
+        "user": public_config.get(key="database.user", get_type=str),
+        "password": public_config.get(key="database.password", get_type=str),
+        "db": public_config.get(key="database.database", get_type=str),
+    }
+
+
+def seed_target() -> Dict:
+    """灌数目标连接参数：seed.* 为空的项沿用 [database]，库名默认 fastapi_seed"""
+    service = _service_target()
+    target = {
+        "host": public_config.get(key="seed.host", get_type=str, default="") or service["host"],
+        "port": public_config.get(key="seed.port", get_type=int, default=0) or service["port"],
+        "user": public_config.get(key="seed.user", get_type=str, default="") or service["user"],
+        "password": public_config.get(key="seed.password", get_type=str, default="") or service["password"],
+        "db": public_config.get(key="seed.database", get_type=str, default="fastapi_seed"),
+    }
+    if _same_server(target) and target["db"] == service["db"]:
+        raise SeedTargetError(f"seed.database 指向服务正在使用的库 {service['db']}，拒绝灌数，请配置单独的测试库")
+    return target
+
+
+def _local_addresses() -> FrozenSet[str]:
+    try:
+        return frozenset(info[4][0] for info in socket.getaddrinfo(socket.gethostname(), None))
+    except OSError:
+        return frozenset()
+
+
+def _host_addresses(host: str) -> FrozenSet[str]:
+    """主机名解析为 IP 集合，回环地址与本机地址统一记为 local；解析失败时按小写主机名比较"""
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except OSError:
+        return frozenset({host.lower()})
+    local = _local_addresses()
+    return frozenset("local" if address in local or ipaddress.ip_address(address.split("%")[0]).is_loopback
+                     else address for address in addresses)
+
+
+def _same_server(target: Dict) -> bool:
+    service = _service_target()
+    if int(target["port"]) != int(service["port"]):
+        return False
+    return target["host"] == service["host"] or bool(_host_addresses(target["host"]) & _host_addresses(service["host"]))
+
+
+async def _service_table_ddl(table: str) -> str:
+    """从服务库读取建表语句（只读）"""
+    service = _service_target()
+    conn = await aiomysql.connect(
+        **service, charset=public_config.get(key="database.charset", get_type=str, default="utf8mb4"))
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(f"SHOW CREATE TABLE `{table}`")
+            return (await cur.fetchone())[1]
+    finally:
+        conn.close()
+
+
+async def _prepare_target(target: Dict, table: str):
+    """不存在时建库；表不存在时按服务库的表结构建表，无法建表时抛出 SeedTargetError"""
+    conn = await aiomysql.connect(
+        host=target["host"], port=target["port"], user=target["user"], password=target["password"],
+        charset=public_config.get(key="database.charset", get_type=str, default="utf8mb4"), autocommit=True)
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(f"CREATE DATABASE IF NOT EXISTS `{target['db']}` DEFAULT CHARACTER SET utf8mb4")
+            await cur.execute("SELECT 1 FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s",
+                              (target["db"], table))
+            if await cur.fetchone():
+                return
+            if _same_server(target):
+                await cur.execute(f"CREATE TABLE `{target['db']}`.`{table}` LIKE `{_service_target()['db']}`.`{table}`")
+                return
+            try:
+                ddl = await _service_table_ddl(table)
+            except Exception as err:
+                raise SeedTargetError(
+                    f"目标库 {target['host']}:{target['port']}/{target['db']} 中没有表 {table}，"
+                    f"且无法从服务库读取表结构（{err!r}），请先在目标库建表") from err
+            await cur.execute(f"USE `{target['db']}`")
+            await cur.execute(ddl)
+            logger.info(f"已按服务库的表结构在 {target['host']}:{target['port']}/{target['db']} 创建表 {table}")
+    finally:
+        conn.close()
+
+
+# ---------------- 写入 ----------------
+async def _connect(target: Dict, local_infile: bool) -> aiomysql.Connection:
+    conn = await aiomysql.connect(
+        **target,
+        charset=public_config.get(key="database.charset", get_type=str, default="utf8mb4"),
+        autocommit=False,
+        local_infile=local_infile,
+    )
+    async with conn.cursor() as cur:
+        # 生成的时间是 UTC；关闭唯一性检查减少随机读（数据本身保证唯一）
+        await cur.execute("SET time_zone = '+00:00', unique_checks = 0, foreign_key_checks = 0")
+    return conn
+
+
+async def _write_insert(conn: aiomysql.Connection, spec: SeedTable, rows: List[Tuple]):
+    sql = (f"INSERT INTO `{spec.table}` ({', '.join(f'`{c}`' for c in spec.columns)}) "
+           f"VALUES ({', '.join(['%s'] * len(spec.columns))})")
+    async with conn.cursor() as cur:
+        await cur.executemany(sql, rows)
+    await conn.commit()
+
+
+def _write_tsv(rows: List[Tuple]) -> str:
+    # 生成的值不含制表符/换行/反斜杠，无需转义
+    with tempfile.NamedTemporaryFile("w", suffix=".tsv", prefix="seed-", delete=False, encoding="utf-8") as f:
+        f.write("\n".join(map("\t".join, rows)))
+        f.write("\n")
+        return f.name
+
+
+async def _write_load_data(conn: aiomysql.Connection, spec: SeedTable, rows: List[Tuple]):
+    path = await asyncio.to_thread(_write_tsv, rows)
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE `{spec.table}` CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+                f"({', '.join(f'`{c}`' for c in spec.columns)})", (path,))
+        await conn.commit()
+    finally:
+        os.unlink(path)
+
+
+# ---------------- 二级索引 ----------------
+async def _secondary_indexes(conn: aiomysql.Connection, table: str) -> Dict[str, str]:
+    """返回非唯一二级索引 {索引名: 重建该索引的 ADD INDEX 子句}；PRIMARY 与 UNIQUE 索引不在其中"""
+    async with conn.cursor(aiomysql.DictCursor) as cur:
+        await cur.execute(f"SHOW INDEX FROM `{table}`")
+        rows = await cur.fetchall()
+    indexes: Dict[str, dict] = {}
+    for row in rows:
+        if row["Key_name"] == "PRIMARY" or not row["Non_unique"]:
+            continue
+        index = indexes.setdefault(row["Key_name"], {"columns": []})
+        column = f"`{row['Column_name']}`" + (f"({row['Sub_part']})" if row["Sub_part"] else "")
+        index["columns"].append((row["Seq_in_index"], column))
+    return {name: f"ADD INDEX `{name}` ({', '.join(column for _, column in sorted(index['columns']))})"
+            for name, index in indexes.items()}
+
+
+async def _alter(conn: aiomysql.Connection, table: str, clauses: List[str]):
+    async with conn.cursor() as cur:
+        await cur.execute(f"ALTER TABLE `{table}` {', '.join(clauses)}")
+    await conn.commit()
+
+
+# ---------------- 主流程 ----------------
+async def seed_table(name: str, rows: int, batch_size: int = 5000, concurrency: int = 4, method: str = "insert",
+                     drop_indexes: bool = False, days: int = 30) -> float:
+    """向测试库（seed.database）的指定表灌入 rows 行，返回耗时（秒）；目标为服务库时抛出 SeedTargetError"""
+    spec = SEED_TABLES[name]
+    write = _write_load_data if method == "load_data" else _write_insert
+    prefix = uuid.uuid4().hex[:6]
+    target = seed_target()
+    await _prepare_target(target, spec.table)
+    logger.info(f"灌数目标: {target['host']}:{target['port']}/{target['db']}.{spec.table}")
+    connections = [await _connect(target, method == "load_data") for _ in range(max(1, concurrency))]
+    started = time.perf_counter()
+    recreate: Dict[str, str] = {}
+    try:
+        if drop_indexes:
+            recreate = await _secondary_indexes(connections[0], spec.table)
+            if recreate:
+                logger.info(f"删除 {spec.table} 非唯一二级索引，中断时可手动恢复："
+                            f"ALTER TABLE `{spec.table}` {', '.join(recreate.values())}")
+                await _alter(connections[0], spec.table, [f"DROP INDEX `{name}`" for name in recreate])
+
+        batches: asyncio.Queue = asyncio.Queue()
+        for start in range(0, rows, batch_size):
+            batches.put_nowait((start, min(batch_size, rows - start)))
+        done = 0
+
+        async def worker(conn: aiomysql.Connection):
+            nonlocal done
+            while True:
+                try:
+                    start, count = batches.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                batch = await asyncio.to_thread(spec.build, prefix, start, count, days)
+                await write(conn, spec, batch)
+                done += count
+                if done % (batch_size * 20) < count:
+                    elapsed = time.perf_counter() - started
+                    logger.info(f"{spec.table}: {done}/{rows} 行，{done / elapsed:.0f} 行/秒")
+
+        await asyncio.gather(*[worker(conn) for conn in connections])
+    finally:
+        if recreate:
+            logger.info(f"重建 {spec.table} 二级索引...")
+            await _alter(connections[0], spec.table, list(recreate.values()))
+        for conn in connections:
+            conn.close()
+    elapsed = time.perf_counter() - started
+    logger.info(f"{spec.table}: 完成 {rows} 行，耗时 {elapsed:.1f} 秒（{rows / elapsed:.0f} 行/秒，含重建索引）")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="压测数据灌入（未指定的参数取 config.ini [seed]）")
+    parser.add_argument("tables", nargs="+", choices=sorted(SEED_TABLES))
+    parser.add_argument("--rows", type=int, help="每张表的行数，默认 seed.users_rows / seed.notify_rows")
+    parser.add_argument("--batch-size", type=int,
+                        default=public_config.get(key="seed.batch_size", get_type=int, default=5000))
+    parser.add_argument("--concurrency", type=int,
+                        default=public_config.get(key="seed.concurrency", get_type=int, default=4))
+    parser.add_argument("--method", choices=("insert", "load_data"),
+                        default=public_config.get(key="seed.method", get_type=str, default="insert"))
+    parser.add_argument("--drop-indexes", action="store_true",
+                        default=public_config.get(key="seed.drop_indexes", get_type=bool, default=False),
+                        help="灌入期间删除非唯一二级索引，结束后重建（空表灌入大量数据时更快）")
+    parser.add_argument("--days", type=int, default=public_config.get(key="seed.days", get_type=int, default=30),
+                        help="created_at 分布在最近多少天内")
+    args = parser.parse_args()
+
+    async def run():
+        for name in args.tables:
+            rows = args.rows or public_config.get(key=f"seed.{name}_rows", get_type=int, default=1000000)
+            await seed_table(name, rows, args.batch_size, args.concurrency, args.method, args.drop_indexes,
+                             args.days)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : check_notify.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 增量扫描未处理（state 0/1）的支付通知
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, List
+
+from Config.config_loader import public_config
+from DataBase.async_database import redis_manager, mysql_manager
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+# 已扫描到的最大主键（高水位）
+HIGH_WATER_MARK_KEY = "check_job:high_water_mark"
+# 待确认订单：ZSET member=记录ID score=首次收到时间戳
+PENDING_KEY = "check_job:pending"
+
+# 每次回查的 ID 数量（IN 列表长度）
+LOOKUP_CHUNK = 500
+
+UNPROCESSED_STATES = (0, 1)
+
+
+async def _scan_new_rows(batch_size: int, commit_lag: int) -> int:
+    """
+    从高水位之后按主键顺序分批读取新行，把 state 0/1 的记录放入待确认集合。
+    自增 ID 在插入时分配、提交时才可见，较小 ID 可能晚于较大 ID 提交，直接越过会永久漏掉它：
+    因此遇到写入不足 commit_lag 秒的行即停止（高水位停在它之前），下次再从这里继续。
+    每批结束都持久化高水位，中途失败下次从断点继续。
+    返回本次扫描的行数。
+    """
+    raw = await redis_manager.get(HIGH_WATER_MARK_KEY)
+    high_water_mark = int(raw) if raw else 0
+    scanned = 0
+
+    while True:
+        rows = await mysql_manager.fetchall(
+            "SELECT `id`, `state`, UNIX_TIMESTAMP(`created_at`) AS `created_ts`, "
+            "`created_at` >= NOW() - INTERVAL %s SECOND AS `recent` FROM `pay_notify_record` "
+            "WHERE `id` > %s ORDER BY `id` LIMIT %s",
+            (commit_lag, high_water_mark, batch_size))
+        settled = len(rows)
+        for index, row in enumerate(rows):
+            if row["recent"]:
+                settled = index
+                break
+        reached_recent = settled < len(rows)
+        rows = rows[:settled]
+        if not rows:
+            break
+
+        pending = {str(row["id"]): int(row["created_ts"]) for row in rows if row["state"] in UNPROCESSED_STATES}
+        high_water_mark = rows[-1]["id"]
+
+        pipe = redis_manager.pipeline(transaction=True)
+        if pending:
+            pipe.zadd(PENDING_KEY, pending)
+        pipe.set(HIGH_WATER_MARK_KEY, high_water_mark)
+        await redis_manager.execute(pipe)
+
+        scanned += len(rows)
+        if reached_recent or len(rows) < batch_size:
+            break
+
+    return scanned
+
+
+async def _lookup_pending(ids: List[int], concurrency: int) -> List[Dict[str, Any]]:
+    """按 ID 分块并发回查当前状态（并发数受 semaphore 限制）"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def lookup(chunk: List[int]):
+        placeholders = ",".join(["%s"] * len(chunk))
+        async with semaphore:
+            return await mysql_manager.fetchall(
+                "SELECT `id`, `notify_type`, `sys_order_no`, `mch_order_no`, `state`, `amount`, "
+                "UNIX_TIMESTAMP(`created_at`) AS `created_ts` "
+                f"FROM `pay_notify_record` WHERE `id` IN ({placeholders})",
+                chunk)
+
+    chunks = [ids[i:i + LOOKUP_CHUNK] for i in range(0, len(ids), LOOKUP_CHUNK)]
+    results = await asyncio.gather(*(lookup(chunk) for chunk in chunks))
+    return [row for rows in results for row in rows]
+
+
+async def scan_unprocessed_notify() -> Dict[str, Any]:
+    """
+    检查未处理的支付通知：
+    1. keyset 增量扫描新行（成本与新增行数成正比，与表总行数无关）
+    2. 只回查待确认集合中的订单，已变为 2/3 或已删除的移出集合
+    3. 超过 stuck_seconds 仍为 0/1 的订单视为未处理
+    """
+    batch_size = public_config.get(key="task.check.batch_size", get_type=int, default=1000)
+    concurrency = public_config.get(key="task.check.concurrency", get_type=int, default=4)
+    stuck_seconds = public_config.get(key="task.check.stuck_seconds", get_type=int, default=1800)
+    max_age = public_config.get(key="task.check.max_age", get_type=int, default=86400)
+    commit_lag = public_config.get(key="task.check.commit_lag", get_type=int, default=5)
+
+    redis_manager.ensure_inited()
+    now = int(time.time())
+
+    scanned = await _scan_new_rows(batch_size, commit_lag)
+
+    # 超过最长跟踪时间的订单不再回查，避免待确认集合无限增长
+    expired = await redis_manager.command("zremrangebyscore", PENDING_KEY, "-inf", now - max_age)
+
+    # 只有首次收到时间早于 now - stuck_seconds 的订单才可能是“未处理”
+    members = await redis_manager.command("zrangebyscore", PENDING_KEY, "-inf", now - stuck_seconds)
+    candidate_ids = [int(member) for member in members]
+
+    stuck = []
+    if candidate_ids:
+        rows = await _lookup_pending(candidate_ids, concurrency)
+        found = {row["id"]: row for row in rows}
+        resolved = [row_id for row_id in candidate_ids
+                    if row_id not in found or found[row_id]["state"] not in UNPROCESSED_STATES]
+        if resolved:
+            await redis_manager.command("zrem", PENDING_KEY, *resolved)
+        stuck = sorted((row for row in rows if row["state"] in UNPROCESSED_STATES), key=lambda r: r["id"])
+
+    result = {
+        "scanned": scanned,
+        "expired": expired,
+        "checked": len(candidate_ids),
+        "stuck": stuck,
+    }
+    logger.info(f"未处理支付通知检查完成: 新扫描 {scanned} 行，回查 {len(candidate_ids)} 笔，未处理 {len(stuck)} 笔，"
+                f"过期移除 {expired} 笔")
+    return result
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : leader_election.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 基于 Redis 租约的定时任务选主（多 worker / 多节点只允许一个执行）
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+from typing import Optional
+
+from DataBase.async_database import redis_manager
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+# 仅当租约持有者是自己时才续期（原子操作）
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# 仅当租约持有者是自己时才释放（原子操作）
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class LeaderLease:
+    """
+    Redis 租约选主：
+    - 每个 worker 以唯一 identity 尝试 SET key identity NX PX ttl
+    - 持有者每 renew_interval 秒续期一次，其余 worker 同时尝试抢占
+    - is_leader 只在本地记录的租约未过期时为 True，避免网络分区后双主
+    - Redis 未初始化时退化为本地执行（单 worker 部署）
+    """
+
+    def __init__(self, key: str = "scheduler:leader", ttl: int = 30, renew_interval: int = 10):
+        if renew_interval >= ttl:
+            raise ValueError("renew_interval 必须小于 ttl")
+        self.key = key
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.identity = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._expires_at = 0.0  # 本地视角的租约到期时间（monotonic）
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_leader(self) -> bool:
+        if redis_manager.client is None:
+            return True
+        return time.monotonic() < self._expires_at
+
+    async def _try_acquire_or_renew(self) -> bool:
+        if redis_manager.client is None:
+            return True
+
+        ttl_ms = self.ttl * 1000
+        started = time.monotonic()
+        try:
+            if self._expires_at > started:
+                renewed = await redis_manager.command("eval", _RENEW_SCRIPT, 1, self.key, self.identity, ttl_ms)
+                if renewed:
+                    self._expires_at = started + self.ttl
+                    return True
+                logger.warning(f"选主租约续期失败，已被其他节点持有: {self.key}")
+                self._expires_at = 0.0
+
+            acquired = await redis_manager.command("set", self.key, self.identity, nx=True, px=ttl_ms)
+            if acquired:
+                self._expires_at = started + self.ttl
+                logger.info(f"获得定时任务执行权: {self.identity}")
+                return True
+        except Exception as err:
+            # Redis 异常时不再认为自己是主，等待租约自然过期
+            self._expires_at = 0.0
+            logger.error(f"选主租约操作失败: {err}")
+        return False
+
+    async def _run(self):
+        while True:
+            await self._try_acquire_or_renew()
+            await asyncio.sleep(self.renew_interval)
+
+    async def start(self):
+        """立即尝试一次选主，然后在后台持续续期/抢占"""
+        if self._task is not None:
+            return
+        await self._try_acquire_or_renew()
+        self._task = asyncio.create_task(self._run(), name="scheduler-leader-lease")
+
+    async def stop(self):
+        """停止续期并主动释放租约，让其他 worker 立即接管"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if redis_manager.client is not None and self._expires_at > time.monotonic():
+            try:
+                await redis_manager.command("eval", _RELEASE_SCRIPT, 1, self.key, self.identity)
+                logger.info(f"已释放定时任务执行权: {self.identity}")
+            except Exception as err:
+                logger.error(f"释放选主租约失败: {err}")
+        self._expires_at = 0.0
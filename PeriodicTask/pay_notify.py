@@ -4,19 +4,23 @@
 # @File      : pay_notify.py
 # @Time      : 2025/10/09
 # @IDE       : PyCharm
-# @Function  : 异步定时任务调度器（修正版，支持 Telegram 实时提醒）
+# @Function  : 异步定时任务调度器（任务从配置文件 task.job* 加载，Redis 租约选主，支持 Telegram 实时提醒）
 
+import ast
 import asyncio
 import os
-from datetime import datetime, time
+import time
+from typing import Any, Callable, Coroutine, Dict, Optional, Set
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.interval import IntervalTrigger
-from apscheduler.triggers.cron import CronTrigger
 
 from Config.config_loader import public_config
 from Logger.logger_config import setup_logger
+from PeriodicTask.check_notify import scan_unprocessed_notify
+from PeriodicTask.leader_election import LeaderLease
+from Redis.notify_counter import notify_counter, ROUTE_PAY_IN, ROUTE_PAY_OUT, ROUTE_REFUND
 from Telegram.auto_bot import send_telegram_message
+from Utils.handle_shutdown import shutdown_coordinator
 
 # ============================================================
 # 日志初始化
@@ -25,101 +29,247 @@ log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
 logger = setup_logger(log_name)
 
 scheduler: AsyncIOScheduler | None = None
+leader: LeaderLease | None = None
+
+# 任务注册表：配置文件中 jobN.func 的值 -> 异步任务函数
+TASK_REGISTRY: Dict[str, Callable[..., Coroutine]] = {}
+
+# 每个任务的运行指标：job_id -> 指标字典
+job_metrics: Dict[str, Dict[str, Any]] = {}
+
+# 正在执行的任务，关闭时等待其完成而不是直接取消
+running_jobs: Set[asyncio.Task] = set()
+
+# 传给 APScheduler 的触发器参数（其余配置项如 name/func/message 由本模块自己消费）
+_TRIGGER_KEYS = {
+    "cron": ("year", "month", "day", "week", "day_of_week", "hour", "minute", "second",
+             "start_date", "end_date", "timezone", "jitter"),
+    "interval": ("weeks", "days", "hours", "minutes", "seconds",
+                 "start_date", "end_date", "timezone", "jitter"),
+    "date": ("run_date", "timezone"),
+}
+
+
+def register_task(name: str):
+    """注册定时任务函数，供配置文件 jobN.func 引用"""
+
+    def decorator(func: Callable[..., Coroutine]):
+        TASK_REGISTRY[name] = func
+        return func
+
+    return decorator
 
 
 # ============================================================
-# 工具函数
+# 任务函数
 # ============================================================
-async def run_all_tasks(task_id: str, task_name: str, message: str):
-    """包装器：仅在工作时间执行检查"""
-    logger.info(f"收到参数: {task_id}, {task_name}, {message}")
-    if task_id == "check_job":
-        await send_telegram_message(message)
-    elif task_id == "lunch_one" or task_id == "lunch_two":
-        await send_telegram_message(message)
-    elif task_id == "report":
-        await send_telegram_message(message)
-    else:
-        logger.warning(f"未知任务 ID: {task_id}")
+@register_task("check_unprocessed_payment_notify")
+async def check_unprocessed_payment_notify(message: str = ""):
+    """定时检查未处理支付通知，有未处理订单时才发送提醒"""
+    result = await scan_unprocessed_notify()
+    stuck = result["stuck"]
+    if not stuck:
+        return
+
+    type_names = {1: "代收", 2: "代付", 3: "退款"}
+    limit = public_config.get(key="task.check.report_limit", get_type=int, default=10)
+    lines = [f"⚠️ {message}：发现 {len(stuck)} 笔未处理支付通知"]
+    for row in stuck[:limit]:
+        lines.append(
+            f"{type_names.get(row['notify_type'], row['notify_type'])} 订单号 {row['mch_order_no']} "
+            f"状态 {row['state']}，金额：{row['amount'] / 100:.2f} 元"
+        )
+    if len(stuck) > limit:
+        lines.append(f"... 其余 {len(stuck) - limit} 笔省略")
+    await send_telegram_message("\n".join(lines))
+
+
+@register_task("send_reminder")
+async def send_reminder(message: str = ""):
+    """普通提醒（午饭等）"""
+    await send_telegram_message(message)
+
+
+@register_task("brazil_daily_report")
+async def brazil_daily_report(message: str = ""):
+    """巴西支付日统计报表：直接读取前一自然日（报表时区）的汇总计数"""
+    await notify_counter.flush()
+    day = notify_counter.yesterday()
+    stats = await notify_counter.get_daily_stats(day)
+
+    route_names = {ROUTE_PAY_IN: "代收", ROUTE_PAY_OUT: "代付", ROUTE_REFUND: "退款"}
+    state_names = {0: "订单生成", 1: "处理中", 2: "成功", 3: "失败"}
+    lines = [f"📊 {message}（{day}）"]
+    if not stats:
+        lines.append("当日无支付通知")
+    for route in (ROUTE_PAY_IN, ROUTE_PAY_OUT, ROUTE_REFUND):
+        states = stats.get(route)
+        if not states:
+            continue
+        total_count = sum(item["count"] for item in states.values())
+        lines.append(f"【{route_names[route]}】共 {total_count} 笔")
+        for state in sorted(states):
+            item = states[state]
+            lines.append(f"  {state_names.get(state, state)}：{item['count']} 笔，金额：{item['amount'] / 100:.2f} 元")
+    await send_telegram_message("\n".join(lines))
 
 
 # ============================================================
-# 调度器启动/停止
+# 工具函数
 # ============================================================
+def _new_metrics() -> Dict[str, Any]:
+    return {
+        "runs": 0,
+        "failures": 0,
+        "skipped": 0,
+        "last_run_at": None,
+        "last_duration": None,
+        "max_duration": 0.0,
+        "total_duration": 0.0,
+        "last_error": None,
+    }
 
-def start_check_balance_task():
-    """启动定时任务调度器"""
-    global scheduler
-    logger.info("启动周期性任务调度器（修正版）...")
-    scheduler = AsyncIOScheduler()
 
-    # ===============================
-    # Job1: 支付检查
-    # ===============================
-    scheduler.add_job(
-        id="check_job",
-        name="定时检查未处理支付任务",
-        func=run_all_tasks,
-        args=['check_job', '定时检查未处理支付任务', '每隔半小时检查一次未处理支付任务'],
-        trigger='cron',  # 改为 cron 触发器
-        day_of_week='mon-fri',  # 周一至周五
-        hour='9-20',  # 9点到20点
-        minute='*/30',  # 每30分钟执行一次
-        start_date='2024-01-01 00:00:00',  # 开始时间
-        end_date='2025-12-31 23:59:59',  # 结束时间
-        timezone='Asia/Shanghai'  # 时区
-    )
+def get_job_metrics() -> Dict[str, Dict[str, Any]]:
+    """返回各任务运行指标的快照（含平均耗时）"""
+    snapshot = {}
+    for job_id, metrics in job_metrics.items():
+        item = dict(metrics)
+        item["avg_duration"] = metrics["total_duration"] / metrics["runs"] if metrics["runs"] else None
+        snapshot[job_id] = item
+    return snapshot
 
-    # ===============================
-    # Job2: 午饭提醒（12:49）
-    # ===============================
-    scheduler.add_job(
-        id="lunch_one",
-        name="吃午饭提醒",
-        func=run_all_tasks,
-        args=['lunch_one', '吃午饭提醒', '12:49 提醒吃午饭'],
-        trigger='cron',  # 改为 cron 触发器
-        day_of_week='mon-fri',  # 周一至周五
-        hour=12,
-        minute=49,
-        start_date='2024-01-01 00:00:00',  # 开始时间
-        end_date='2025-12-31 23:59:59',  # 结束时间
-        timezone='Asia/Shanghai'  # 时区
-    )
 
-    # ===============================
-    # Job3: 午饭提醒（12:50）
-    # ===============================
-    scheduler.add_job(
-        id="lunch_two",
-        name="吃午饭提醒",
-        func=run_all_tasks,
-        args=['lunch_two', '吃午饭提醒', '12:50 提醒吃午饭'],
-        trigger='cron',  # 改为 cron 触发器
-        day_of_week='mon-fri',  # 周一至周五
-        hour=12,
-        minute=50,
-        start_date='2024-01-01 00:00:00',  # 开始时间
-        end_date='2025-12-31 23:59:59',  # 结束时间
-        timezone='Asia/Shanghai'  # 时区
-    )
+async def run_job(job_id: str, func_name: str, kwargs: Dict[str, Any]):
+    """包装器：只有持有选主租约的 worker 才执行，并记录运行指标"""
+    metrics = job_metrics.setdefault(job_id, _new_metrics())
+
+    if leader is not None and not leader.is_leader:
+        metrics["skipped"] += 1
+        logger.debug(f"非主节点，跳过任务: {job_id}")
+        return
+
+    func = TASK_REGISTRY.get(func_name)
+    if func is None:
+        logger.warning(f"未知任务函数: {func_name}（任务 ID: {job_id}）")
+        return
+
+    logger.info(f"开始执行任务: {job_id}")
+    metrics["last_run_at"] = time.time()
+    started = time.perf_counter()
+    task = asyncio.current_task()
+    running_jobs.add(task)
+    try:
+        await func(**kwargs)
+    except Exception as err:
+        metrics["failures"] += 1
+        metrics["last_error"] = str(err)
+        logger.exception(f"任务 {job_id} 执行失败: {err}")
+    finally:
+        running_jobs.discard(task)
+        duration = time.perf_counter() - started
+        metrics["runs"] += 1
+        metrics["last_duration"] = duration
+        metrics["total_duration"] += duration
+        metrics["max_duration"] = max(metrics["max_duration"], duration)
+        logger.info(f"任务 {job_id} 执行完成，耗时 {duration * 1000:.2f} ms")
+
+
+def _load_section(value) -> Optional[Dict[str, Any]]:
+    """
+    jobN 配置在内存中是 dict；从 config.ini 重新加载后是其字符串形式，需要还原
+    """
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str):
+        try:
+            parsed = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return None
+        return parsed if isinstance(parsed, dict) else None
+    return None
+
+
+def _as_bool(value, default: bool) -> bool:
+    if value is None:
+        return default
+    return str(value).lower() in ('true', '1', 't', 'y')
+
+
+def load_job_configs() -> Dict[str, Dict[str, Any]]:
+    """从配置文件 task.job* 加载所有任务定义"""
+    task_section = public_config.get(key="task", get_type=None, default={}) or {}
+    jobs = {}
+    for key in sorted(task_section):
+        if not key.startswith("job"):
+            continue
+        job = _load_section(task_section[key])
+        if job is None:
+            logger.warning(f"任务配置 task.{key} 格式错误，已忽略")
+            continue
+        jobs[key] = job
+    return jobs
+
+
+def add_job_from_config(key: str, job: Dict[str, Any]) -> bool:
+    """根据单个 jobN 配置注册到调度器"""
+    if not _as_bool(job.get("enable"), True):
+        logger.info(f"任务 task.{key} 未启用，跳过")
+        return False
+
+    job_id = str(job.get("id") or key)
+    func_name = str(job.get("func") or "")
+    trigger = str(job.get("trigger") or "cron")
+
+    if func_name not in TASK_REGISTRY:
+        logger.warning(f"任务 {job_id} 的函数 {func_name} 未注册，跳过")
+        return False
+    if trigger not in _TRIGGER_KEYS:
+        logger.warning(f"任务 {job_id} 的触发器 {trigger} 不支持，跳过")
+        return False
+
+    trigger_args = {k: job[k] for k in _TRIGGER_KEYS[trigger] if job.get(k) not in (None, "")}
 
-    # ===============================
-    # Job4: 每日巴西支付报表提醒（11:05）
-    # ===============================
     scheduler.add_job(
-        id="report",
-        name="巴西支付日统计报表提醒",
-        func=run_all_tasks,
-        args=['report', '支付报表', '11:05 巴西支付日统计报表提醒'],
-        trigger='cron',  # 改为 cron 触发器
-        day_of_week='mon-fri',  # 周一至周五
-        hour=11,
-        minute=5,
-        start_date='2024-01-01 00:00:00',  # 开始时间
-        end_date='2025-12-31 23:59:59',  # 结束时间
-        timezone='Asia/Shanghai'  # 时区
+        id=job_id,
+        name=str(job.get("name") or job_id),
+        func=run_job,
+        args=[job_id, func_name, {"message": str(job.get("message") or "")}],
+        trigger=trigger,
+        misfire_grace_time=int(job.get("misfire_grace_time") or 60),
+        coalesce=_as_bool(job.get("coalesce"), True),
+        max_instances=int(job.get("max_instances") or 1),
+        replace_existing=True,
+        **trigger_args
     )
+    job_metrics.setdefault(job_id, _new_metrics())
+    logger.info(f"已加载任务 {job_id}（{func_name}，{trigger}: {trigger_args}）")
+    return True
+
+
+# ============================================================
+# 调度器启动/停止
+# ============================================================
+async def start_check_balance_task():
+    """启动定时任务调度器"""
+    global scheduler, leader
+    logger.info("启动周期性任务调度器...")
+    scheduler = AsyncIOScheduler()
+
+    for key, job in load_job_configs().items():
+        try:
+            add_job_from_config(key, job)
+        except Exception as err:
+            logger.exception(f"加载任务 task.{key} 失败: {err}")
+
+    # 选主：每个 worker 都运行调度器，但只有租约持有者真正执行任务
+    if public_config.get(key="task.leader.enable", get_type=bool, default=True):
+        leader = LeaderLease(
+            key=public_config.get(key="task.leader.key", get_type=str, default="scheduler:leader"),
+            ttl=public_config.get(key="task.leader.ttl", get_type=int, default=30),
+            renew_interval=public_config.get(key="task.leader.renew_interval", get_type=int, default=10),
+        )
+        await leader.start()
 
     # ===============================
     # 启动调度器
@@ -128,21 +278,42 @@ def start_check_balance_task():
     logger.info(f"定时任务调度器已启动，共 {len(scheduler.get_jobs())} 个任务")
 
     # 启动后发送 Telegram 测试消息
-    if public_config.get(key="telegram.enable", get_type=bool):
-        asyncio.create_task(send_telegram_message(f"定时任务调度器已启动，共 {len(scheduler.get_jobs())} 个任务"))
+    if public_config.get(key="telegram.enable", get_type=bool) and (leader is None or leader.is_leader):
+        shutdown_coordinator.spawn(send_telegram_message(f"定时任务调度器已启动，共 {len(scheduler.get_jobs())} 个任务"),
+                                   name="telegram-scheduler-started")
 
 
-def start_periodic_task():
+def scheduler_status() -> Dict[str, Any]:
+    """健康检查用：调度器运行状态，未运行时抛出 RuntimeError"""
+    if scheduler is None or not scheduler.running:
+        raise RuntimeError("定时任务调度器未运行")
+    return {"jobs": len(scheduler.get_jobs()), "leader": leader is None or leader.is_leader}
+
+
+async def start_periodic_task():
     """统一启动入口"""
-    start_check_balance_task()
+    await start_check_balance_task()
 
 
-def stop_periodic_task():
-    """停止定时任务调度器"""
-    global scheduler
+async def stop_periodic_task(timeout: Optional[float] = None):
+    """
+    停止定时任务调度器：先暂停（不再触发新任务），在 timeout 内等待正在执行的任务完成，
+    再关闭调度器。AsyncIOExecutor 关闭时会直接取消未完成的任务，所以必须先等。
+    """
+    global scheduler, leader
     if scheduler and scheduler.running:
-        scheduler.shutdown(wait=True)
+        scheduler.pause()
+        if running_jobs:
+            logger.info(f"等待 {len(running_jobs)} 个正在执行的任务完成...")
+            _, pending = await asyncio.wait(set(running_jobs), timeout=timeout)
+            if pending:
+                logger.warning(f"{len(pending)} 个任务未在 {timeout} 秒内完成，将被取消")
+        scheduler.shutdown(wait=False)
         logger.info("定时任务调度器已停止")
-        if public_config.get(key="telegram.enable", get_type=bool):
-            asyncio.create_task(send_telegram_message("定时任务调度器已停止"))
+        if public_config.get(key="telegram.enable", get_type=bool) and (leader is None or leader.is_leader):
+            shutdown_coordinator.spawn(send_telegram_message("定时任务调度器已停止"), name="telegram-scheduler-stopped")
         scheduler = None
+
+    if leader is not None:
+        await leader.stop()
+        leader = None
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : live_hub.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 实时通知广播中心（进程内扇出 + Redis pub/sub 跨 worker 转发）
+
+import asyncio
+import json
+import os
+import uuid
+from collections import deque
+from typing import Any, Dict, Optional, Set
+
+from DataBase.async_database import redis_manager
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+
+class Subscriber:
+    """
+    单个订阅者：固定长度环形缓冲区，满了丢弃最旧的消息，慢客户端不会拖慢发布方
+    """
+
+    def __init__(self, buffer_size: int):
+        self.buffer: deque = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self._event = asyncio.Event()
+
+    def push(self, payload: str):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(payload)
+        self._event.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """等待新消息，超时返回 False（用于发送心跳）"""
+        if self.buffer:
+            return True
+        self._event.clear()
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def drain(self):
+        while self.buffer:
+            yield self.buffer.popleft()
+
+    def wake(self):
+        """唤醒等待中的连接（服务关闭时让 SSE 循环立即检查退出条件）"""
+        self._event.set()
+
+
+class BroadcastHub:
+    """
+    发布时只序列化一次；本进程订阅者直接写入各自缓冲区，
+    同时交给后台任务 PUBLISH 到 Redis，其他 worker 收到后再扇出给自己的订阅者。
+    发布方不等待任何 I/O。
+    """
+
+    def __init__(self, channel: str = "notify:live", buffer_size: int = 100, relay_queue_size: int = 1000):
+        self.channel = channel
+        self.buffer_size = buffer_size
+        self.origin = uuid.uuid4().hex
+        self.subscribers: Set[Subscriber] = set()
+        self._relay_queue: asyncio.Queue = asyncio.Queue(maxsize=relay_queue_size)
+        self._tasks: list = []
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(self.buffer_size)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def wake_all(self):
+        for subscriber in self.subscribers:
+            subscriber.wake()
+
+    def _fan_out(self, payload: str):
+        for subscriber in self.subscribers:
+            subscriber.push(payload)
+
+    def publish(self, event: Dict[str, Any]):
+        """发布事件（同步、无 I/O）"""
+        payload = json.dumps(event, ensure_ascii=False, default=str)
+        self._fan_out(payload)
+        if self._tasks:
+            try:
+                self._relay_queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                logger.warning("实时通知转发队列已满，丢弃一条跨 worker 消息")
+
+    async def _publisher(self):
+        while True:
+            payload = await self._relay_queue.get()
+            try:
+                await redis_manager.command("publish", self.channel, f"{self.origin}|{payload}")
+            except Exception as err:
+                logger.error(f"实时通知转发到 Redis 失败: {err}")
+
+    async def _listener(self):
+        while True:
+            # 订阅是长连接（独占一个连接、无限期阻塞读取），不经过 redis_manager.command 的超时与并发隔离；
+            # 断开后由下方的重连循环处理
+            pubsub = redis_manager.client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    data = message["data"]
+                    data = data.decode() if isinstance(data, bytes) else data
+                    origin, _, payload = data.partition("|")
+                    if origin != self.origin:
+                        self._fan_out(payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                logger.error(f"实时通知 Redis 订阅中断，1 秒后重连: {err}")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    async def start(self):
+        """Redis 可用时启动跨 worker 转发；否则只在本进程内广播"""
+        if self._tasks or redis_manager.client is None:
+            return
+        self._tasks = [
+            asyncio.create_task(self._publisher(), name="live-hub-publisher"),
+            asyncio.create_task(self._listener(), name="live-hub-listener"),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        return {
+            "subscribers": len(self.subscribers),
+            "dropped": sum(s.dropped for s in self.subscribers),
+            "relay_backlog": self._relay_queue.qsize(),
+        }
+
+
+live_hub = BroadcastHub()
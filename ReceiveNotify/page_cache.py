@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : page_cache.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 整页渲染结果缓存（按路由 + 查询参数），支持 ETag / If-None-Match 304
+
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from fastapi.responses import HTMLResponse
+
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+
+class PageCache:
+    """
+    进程内 LRU 缓存渲染好的 HTML：
+    - 命中时不查库、不渲染模板
+    - 浏览器带 If-None-Match 且 ETag 一致时直接返回 304，连响应体都不发
+    - 同一个 key 并发未命中时只渲染一次（single-flight）
+    """
+
+    def __init__(self, max_entries: int = 256, default_ttl: int = 60):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        # key -> (expires_at, body, etag)
+        self._entries: "OrderedDict[str, Tuple[float, bytes, str]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def key_for(request: Request) -> str:
+        """路由 + 排序后的查询参数，参数顺序不同视为同一页面"""
+        query = urlencode(sorted(request.query_params.multi_items()))
+        return f"{request.url.path}?{query}"
+
+    @staticmethod
+    def make_etag(body: bytes) -> str:
+        return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, body, etag = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return body, etag
+
+    def set(self, key: str, body: bytes, ttl: Optional[int] = None) -> Tuple[bytes, str]:
+        etag = self.make_etag(body)
+        self._entries[key] = (time.monotonic() + (ttl or self.default_ttl), body, etag)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return body, etag
+
+    def invalidate(self, prefix: str = ""):
+        """删除以 prefix 开头的缓存（默认全部）"""
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+
+    async def _load(self, key: str, render: Callable[[], Awaitable[bytes]], ttl: Optional[int]):
+        while True:
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    # 本请求自身被取消（截止时间到或客户端断开）
+                    raise
+                # 正在渲染的请求被取消：由本请求接着渲染（或等待新的渲染者）
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            entry = self.set(key, await render(), ttl)
+            future.set_result(entry)
+            return entry
+        except Exception as err:
+            future.set_exception(err)
+            # 等待者会拿到异常；这里标记已读取，避免 "exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            # 被取消（CancelledError 等 BaseException）时同样结束 future，等待者不会一直挂起
+            if not future.done():
+                future.cancel()
+            del self._inflight[key]
+
+    async def respond(self, request: Request, render: Callable[[], Awaitable[bytes]],
+                      ttl: Optional[int] = None) -> Response:
+        key = self.key_for(request)
+        entry = self.get(key)
+        if entry is None:
+            self.misses += 1
+            entry = await self._load(key, render, ttl)
+        else:
+            self.hits += 1
+
+        body, etag = entry
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or
+                              etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return HTMLResponse(content=body, headers=headers)
@@ -7,14 +7,15 @@
 # @Function  : 接收支付通知 + 启动异步调度任务 + Telegram 实时提醒
 
 import os
+import asyncio
 import json
 from datetime import datetime
 from math import ceil
-from fastapi import FastAPI, Request, Response, Depends, Query
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request, Response, Depends, Query, HTTPException
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from contextlib import asynccontextmanager
+from jinja2 import FileSystemBytecodeCache
 import aiomysql
 
 # ----------------- 模块导入 -----------------
@@ -28,16 +29,44 @@ from Data.base import Pay_RX_Notify_In_Data, Pay_RX_Notify_Out_Data, Pay_RX_Noti
 # -------------------------------------------
 
 # ----------------- 定时任务模块导入 -----------------
-from PeriodicTask.pay_notify import start_periodic_task, stop_periodic_task
+from PeriodicTask.pay_notify import scheduler_status, start_periodic_task, stop_periodic_task
 
 # ----------------- Telegram 机器人模块导入 -----------------
-from Telegram.auto_bot import send_telegram_message, start_bot, stop_bot
+from Telegram.auto_bot import bot_running, get_admin_chat_ids, send_telegram_message, start_bot, stop_bot
 
 # ----------------- Mysql Redis 连接池模块导入 -----------------
 from DataBase.async_database import redis_manager, mysql_manager
 
+# ----------------- 支付通知日统计模块导入 -----------------
+from Redis.notify_counter import notify_counter, ROUTE_PAY_IN, ROUTE_PAY_OUT, ROUTE_REFUND
+
+# ----------------- 实时通知广播模块导入 -----------------
+from ReceiveNotify.live_hub import live_hub
+
+# ----------------- 下游商户回调转发模块导入 -----------------
+from MerchantNotify.forwarder import merchant_forwarder
+
+# ----------------- 整页缓存模块导入 -----------------
+from ReceiveNotify.page_cache import PageCache
+
+# ----------------- 静态资源模块导入 -----------------
+from Assets.asset_manifest import PrecompressedStaticFiles, asset_url
+
 # ----------------- 工具模块导入 -----------------
-from Utils.handle_time import get_sec_int_timestamp
+from Utils.handle_time import get_offset_table, get_sec_int_timestamp
+from Utils.handle_shutdown import shutdown_coordinator, DrainMiddleware
+from Utils.handle_deadline import DeadlineMiddleware, parse_route_budgets
+from Utils.handle_profiler import ProfilerBusy, sample
+from Utils.handle_loop_monitor import loop_monitor
+from Utils.handle_deadline import deadline_stats
+from Utils.handle_resilience import dependencies
+from Utils.handle_tracing import TracedRoute, TracingMiddleware, tracer
+from Utils.handle_password import password_service
+from Utils.handle_auth import jwt_auth
+from Data.country_index import country_index
+from Utils.handle_snowflake import order_id_generator
+from Utils.handle_warmup import warmup
+from Utils.handle_health import health_monitor
 
 # ----------------- 日志配置 -----------------
 from Logger.logger_config import setup_logger
@@ -50,6 +79,9 @@ logger = setup_logger(log_name)
 success = Response(content="success", media_type="text/plain")
 ok = Response(content="ok", media_type="text/plain")
 
+# 负载均衡器 / 部署脚本的探测接口
+PROBE_PATHS = ("/Pay-RX_Notify", "/health", "/ready")
+
 
 # ============================================================
 # 应用生命周期管理
@@ -63,6 +95,17 @@ async def lifespan_manager(app: FastAPI):
         logger.info(f"当前操作系统: {public_config.get(key='software.system', get_type=str)}")
         logger.info(f"服务名称: {app.openapi()['info']['title']}")
 
+        # 收到 SIGTERM 立即进入排空状态；SSE 长连接随之结束，不拖住关闭流程
+        shutdown_coordinator.install_signal_handlers()
+        shutdown_coordinator.on_drain(live_hub.wake_all)
+
+        # 事件循环延迟监控：阻塞超过阈值时记录当时的调用栈
+        if public_config.get(key="loop_monitor.enable", get_type=bool, default=True):
+            loop_monitor.start()
+
+        # 链路追踪 span 导出线程
+        tracer.exporter.start()
+
         # 初始化数据库连接池
         logger.info("🗄️ 启动 MySQL 连接池...")
         await mysql_manager.init_pool(
@@ -71,28 +114,55 @@ async def lifespan_manager(app: FastAPI):
             user=public_config.get(key="database.user", get_type=str),
             password=public_config.get(key="database.password", get_type=str),
             db=public_config.get(key="database.database", get_type=str),
-            charset=public_config.get(key="database.charset", get_type=str, default="utf8mb4")
+            charset=public_config.get(key="database.charset", get_type=str, default="utf8mb4"),
+            minsize=public_config.get(key="database.minsize", get_type=int, default=5),
+            maxsize=public_config.get(key="database.maxsize", get_type=int, default=20),
         )
 
         # 初始化 Redis 连接池
         logger.info("🧠 启动 Redis 连接池...")
-        await redis_manager.init_pool(
-            host=public_config.get(key="redis.host", get_type=str),
-            port=public_config.get(key="redis.port", get_type=int),
-            db=public_config.get(key="redis.db", get_type=int)
-        )
+        await redis_manager.init_from_config()
+
+        # 租用订单号 worker id（Redis 不可用时后台重试）
+        await order_id_generator.start()
+
+        # 国家/地区信息索引（之后的国家、币种、区号查找都在内存完成）
+        await country_index.start()
+
+        # JWT 吊销名单定时同步到本地
+        jwt_auth.start()
+
+        # 启动实时通知广播的跨 worker 转发
+        await live_hub.start()
+
+        # 启动支付通知日统计计数器（定时批量写入 Redis）
+        notify_counter.start()
+
+        # 启动下游商户回调转发（后台推送，不占用回调接口）
+        merchant_forwarder.start()
 
         # 启动 Telegram 机器人
         if public_config.get(key='telegram.enable', get_type=bool):
             logger.info("🤖 启动 Telegram 机器人线程...")
-            start_bot()
+            # start_bot 内同步调用 Telegram 接口注册命令，放到线程里执行，不阻塞事件循环
+            await asyncio.to_thread(start_bot)
             await send_telegram_message("✅ Telegram 机器人已启动")
         else:
             logger.warning("⚠️ Telegram 功能未启用，请检查配置文件 telegram.enable")
 
         # 启动定时任务调度器（异步）
         logger.info("⏱ 启动异步定时任务调度器...")
-        start_periodic_task()
+        await start_periodic_task()
+
+        # 启动预热：完成后才开始接收请求（/ready 返回 200）
+        if public_config.get(key="warmup.enable", get_type=bool, default=True):
+            logger.info("🔥 启动预热...")
+            await warmup.run()
+        else:
+            warmup.skip()
+
+        # 依赖健康探测（后台定时执行，健康检查接口只读缓存结果）
+        await health_monitor.start()
 
         # 服务启动通知
         if public_config.get(key='telegram.enable', get_type=bool):
@@ -106,22 +176,53 @@ async def lifespan_manager(app: FastAPI):
             await send_telegram_message(f"❌ 服务启动出错: {e}")
 
     finally:
-        # 停止任务与清理
-        logger.info("🛑 服务关闭中... 停止调度任务与机器人")
-
-        # 停止定时任务调度器
-        stop_periodic_task()
-
-        # 停止 Telegram 机器人线程
-        if public_config.get(key='telegram.enable', get_type=bool):
-            await send_telegram_message(f"🧩 服务 [{app.openapi()['info']['title']}] 已关闭")
+        # 停止任务与清理：排空阶段共用 shutdown.drain_timeout 预算，之后分 3 个清理阶段，
+        # 阶段内互不依赖的步骤并发执行、共用一个 step_timeout（总耗时与步骤数量无关）
+        logger.info("🛑 服务关闭中... 排空在途请求与后台任务")
+        shutdown_coordinator.begin_drain("lifespan 关闭")
+        await shutdown_coordinator.wait_requests()
+
+        # 停止定时任务调度器（等待正在执行的任务）与商户回调转发（等待正在推送的请求，
+        # 未完成的租约过期后会被重新推送），两者并发，共用剩余的排空预算
+        await shutdown_coordinator.run_stage([
+            ("定时任务调度器", lambda: stop_periodic_task(timeout=shutdown_coordinator.remaining())),
+            ("商户回调转发", lambda: merchant_forwarder.stop(timeout=shutdown_coordinator.remaining())),
+        ], timeout=shutdown_coordinator.remaining() + shutdown_coordinator.step_timeout)
+
+        # 等待尚未完成的 Telegram 发送等后台任务
+        await shutdown_coordinator.wait_background()
+
+        # 清理阶段 1：仍需 MySQL/Redis 的收尾（关闭通知、写入剩余统计计数）与各后台循环的停止
+        steps = [
+            ("实时通知广播", live_hub.stop),
+            ("统计计数写入", notify_counter.stop),
+            ("健康探测", health_monitor.stop),
+            ("吊销名单同步", jwt_auth.stop),
+            ("国家/地区索引", country_index.stop),
+            ("事件循环监控", loop_monitor.stop),
+            # 关闭密码进程池（未使用过则不会创建）
+            ("密码进程池", password_service.close),
+        ]
+        telegram_enabled = public_config.get(key='telegram.enable', get_type=bool)
+        if telegram_enabled:
+            steps.append(("Telegram 关闭通知",
+                          lambda: send_telegram_message(f"🧩 服务 [{app.openapi()['info']['title']}] 已关闭")))
+        await shutdown_coordinator.run_stage(steps)
+        if telegram_enabled:
+            # 停止 Telegram 机器人线程
             stop_bot()
 
-        # 关闭数据库连接池与 Redis 连接池
-        await mysql_manager.close()
-
-        # 关闭 Redis 连接池
-        await redis_manager.close()
+        # 清理阶段 2：关闭数据库连接池；释放订单号 worker id（需在关闭 Redis 之前）
+        await shutdown_coordinator.run_stage([
+            ("MySQL 连接池", mysql_manager.close),
+            ("订单号 worker id", order_id_generator.stop),
+        ])
+
+        # 清理阶段 3：关闭 Redis 连接池，导出剩余的 span
+        await shutdown_coordinator.run_stage([
+            ("Redis 连接池", redis_manager.close),
+            ("链路追踪导出", lambda: asyncio.to_thread(tracer.exporter.stop)),
+        ])
         logger.info("✅ 所有资源已安全关闭")
 
 
@@ -137,16 +238,49 @@ notify = FastAPI(
     openapi_url=None,
     lifespan=lifespan_manager,
 )
+# 每个路由处理函数自动生成 span（需在注册路由之前设置）
+notify.router.route_class = TracedRoute
 
 # 静态文件与模板配置
-notify.mount("/static", StaticFiles(directory="static"), name="static")
+# 构建后的哈希文件直接返回预压缩版本（生产环境由 Nginx 处理，这里兜底）
+notify.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["asset_url"] = asset_url
 notify.templates = templates
 
+# Jinja2 字节码缓存：模板编译结果落盘，worker 重启后不再重复编译
+bytecode_cache_dir = public_config.get(key="page_cache.bytecode_cache_dir", get_type=str,
+                                       default="/data/FastAPI-Main/cache/jinja2")
+os.makedirs(bytecode_cache_dir, exist_ok=True)
+templates.env.bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+# 非调试模式下不再每次取模板都检查文件修改时间
+templates.env.auto_reload = public_config.get(key="software.debug", get_type=bool, default=False)
+
+# 整页缓存：命中时不查库、不渲染
+page_cache = PageCache(
+    max_entries=public_config.get(key="page_cache.max_entries", get_type=int, default=256),
+    default_ttl=public_config.get(key="page_cache.ttl", get_type=int, default=60),
+)
+
 
 # 添加中间件（如有需要）
 # notify.add_middleware(AccessMiddleware)
 
+# 请求截止时间：按路由预算限制 MySQL/Redis/Telegram 调用，超时的请求取消并返回 504
+notify.add_middleware(
+    DeadlineMiddleware,
+    default_budget=public_config.get(key="deadline.default_budget", get_type=float, default=10),
+    routes=parse_route_budgets(public_config.get(key="deadline.routes", get_type=str, default="")),
+    grace=public_config.get(key="deadline.grace", get_type=float, default=0.5),
+)
+
+# 链路追踪根 span（按 tracing.sample_ratio 头部采样）；负载均衡器的高频探测不记录
+notify.add_middleware(TracingMiddleware, skip_paths=PROBE_PATHS)
+
+# 在途请求统计；关闭排空期间新的回调返回 503，由上游重试
+# （add_middleware 后添加的在外层，故最后添加，使其位于追踪与截止时间中间件之外，为最外层）
+notify.add_middleware(DrainMiddleware, coordinator=shutdown_coordinator)
+
 # ============================================================
 # 工具函数
 # ============================================================
@@ -158,57 +292,190 @@ def datetime_serializer(obj):
     raise TypeError(f"Type {type(obj)} not serializable")
 
 
+# 支付通知类型（对应 pay_notify_record.notify_type）
+NOTIFY_TYPE_IN = 1  # 代收
+NOTIFY_TYPE_OUT = 2  # 代付
+NOTIFY_TYPE_REFUND = 3  # 退款
+
+
+async def save_notify_record(notify_type: int, notify_data) -> None:
+    """支付通知入库：同一平台订单号的多次回调只更新状态，供定时任务增量检查"""
+    try:
+        await mysql_manager.execute(
+            "INSERT INTO `pay_notify_record` (`notify_type`, `sys_order_no`, `mch_order_no`, `state`, `amount`) "
+            "VALUES (%s, %s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE `state` = VALUES(`state`), `amount` = VALUES(`amount`), "
+            "`notify_count` = `notify_count` + 1",
+            (notify_type, notify_data.sysOrderNo, notify_data.mchOrderNo, notify_data.state, notify_data.amount))
+    except Exception as e:
+        logger.exception(f"保存支付通知记录失败: {e}")
+
+
+def publish_live_event(route: str, notify_data) -> None:
+    """推送到实时通知页面（本进程扇出 + Redis 转发，不阻塞回调）"""
+    live_hub.publish({
+        "route": route,
+        "sysOrderNo": notify_data.sysOrderNo,
+        "mchOrderNo": notify_data.mchOrderNo,
+        "state": notify_data.state,
+        "amount": notify_data.amount,
+        "time": get_sec_int_timestamp(),
+    })
+
+
+async def load_users_page(page: int, per_page: int, refresh: bool = False):
+    """用户列表一页数据与总数（Redis 缓存 60 秒）；refresh=True 时跳过缓存直接查库并回填（启动预热）"""
+    cache_key = f"users_list:page_{page}:per_page_{per_page}"
+
+    cached_data = None if refresh else await redis_manager.get_json(cache_key)
+
+    if isinstance(cached_data, dict):
+        # 总数与当前页数据一起缓存，命中时不再执行 COUNT(*)
+        logger.info(f"命中缓存: {cache_key}")
+        return cached_data["users"], cached_data["total_users"]
+
+    total_result = await mysql_manager.fetchone("SELECT COUNT(*) AS total FROM users")
+    total_users = total_result['total'] if total_result else 0
+    users = await mysql_manager.fetchall(
+        "SELECT id, username, email, created_at FROM users ORDER BY id DESC LIMIT %s OFFSET %s",
+        (per_page, (page - 1) * per_page))
+
+    await redis_manager.set(
+        cache_key,
+        json.dumps({"users": users, "total_users": total_users}, default=datetime_serializer),
+        ex=60)
+    return users, total_users
+
+
+# ============================================================
+# 启动预热步骤（按登记顺序并发执行，见 Utils/handle_warmup.py）
+# ============================================================
+async def _warm_mysql_pool():
+    await mysql_manager.prefill(public_config.get(key="database.minsize", get_type=int, default=5))
+
+
+async def _warm_redis_pool():
+    await redis_manager.prefill(public_config.get(key="warmup.redis_connections", get_type=int, default=10))
+
+
+async def _warm_admin_chat_ids():
+    if public_config.get(key='telegram.enable', get_type=bool):
+        await get_admin_chat_ids()
+
+
+async def _warm_users_pages():
+    per_page = public_config.get(key="warmup.users_per_page", get_type=int, default=10)
+    for page in range(1, public_config.get(key="warmup.users_pages", get_type=int, default=3) + 1):
+        await load_users_page(page, per_page, refresh=True)
+
+
+async def _warm_lookups():
+    # 报表时区的偏移表与常用模板（编译结果来自字节码缓存）
+    get_offset_table(public_config.get(key="report.timezone", get_type=str, default="America/Sao_Paulo"))
+    for name in ("base.html", "users.html", "live.html"):
+        templates.env.get_template(name)
+
+
+warmup.register("MySQL 连接池", _warm_mysql_pool)
+warmup.register("Redis 连接池", _warm_redis_pool)
+warmup.register("Telegram 管理员", _warm_admin_chat_ids)
+warmup.register("用户列表", _warm_users_pages)
+warmup.register("JWT 吊销名单", jwt_auth.sync_revocations)
+warmup.register("时区与模板", _warm_lookups)
+
+
+# ============================================================
+# 依赖健康探测（见 Utils/handle_health.py）
+# ============================================================
+async def _probe_scheduler():
+    return scheduler_status()
+
+
+async def _probe_telegram():
+    if not public_config.get(key='telegram.enable', get_type=bool):
+        return {"enabled": False}
+    if not bot_running():
+        raise RuntimeError("Telegram 轮询线程未运行")
+    return {"enabled": True}
+
+
+health_monitor.register("mysql", mysql_manager.ping)
+# Redis 只作缓存（故障时回调照常处理），默认不作为关键依赖，避免缓存故障让所有 worker 退出负载均衡
+health_monitor.register("redis", redis_manager.ping,
+                        critical=public_config.get(key="health.redis_critical", get_type=bool, default=False))
+health_monitor.register("scheduler", _probe_scheduler, critical=False)
+health_monitor.register("telegram", _probe_telegram, critical=False)
+
+
 # ============================================================
 # 路由部分
 # ============================================================
 # 首页路由
 @notify.get("/", response_class=HTMLResponse)
 async def home(request: Request):
-    return templates.TemplateResponse("base.html", {"request": request})
+    async def render():
+        return templates.TemplateResponse("base.html", {"request": request}).body
 
+    return await page_cache.respond(request, render)
 
-# 用户列表路由（分页 + 缓存）
-@notify.get("/users", response_class=HTMLResponse)
+
+# 用户列表路由（分页 + 缓存），需要登录（Bearer token 或 access_token Cookie）
+@notify.get("/users", response_class=HTMLResponse, dependencies=[Depends(jwt_auth)])
 async def get_users(
         request: Request,
         page: int = Query(1, ge=1),
         per_page: int = Query(10, ge=5, le=100),
 ):
-    offset = (page - 1) * per_page
-
-    cache_key = f"users_list:page_{page}:per_page_{per_page}"
-
-    cached_data = await redis_manager.get_json(cache_key)
-
-    if cached_data:
-        users = cached_data
-        logger.info(f"命中缓存: {cache_key}")
-        total_result = await mysql_manager.fetchone("SELECT COUNT(*) AS total FROM users")
-        total_users = total_result['total'] if total_result else 0
-    else:
-        total_result = await mysql_manager.fetchone("SELECT COUNT(*) AS total FROM users")
-        total_users = total_result['total'] if total_result else 0
-        users = await mysql_manager.fetchall(
-            "SELECT id, username, email, created_at FROM users ORDER BY id DESC LIMIT %s OFFSET %s",
-            (per_page, offset))
-
-        await redis_manager.set(cache_key, json.dumps(users, default=datetime_serializer), ex=60)
-
-    total_pages = int(ceil(total_users / per_page))
-    pagination = {
-        "page": page,
-        "per_page": per_page,
-        "total_users": total_users,
-        "total_pages": total_pages,
-        "has_prev": page > 1,
-        "has_next": page < total_pages,
-        "prev_page": page - 1 if page > 1 else 1,
-        "next_page": page + 1 if page < total_pages else total_pages,
-    }
-
-    return request.app.templates.TemplateResponse(
-        "users.html",
-        {"request": request, "users": users, "pagination": pagination}
+    async def render():
+        users, total_users = await load_users_page(page, per_page)
+        total_pages = int(ceil(total_users / per_page))
+        pagination = {
+            "page": page,
+            "per_page": per_page,
+            "total_users": total_users,
+            "total_pages": total_pages,
+            "has_prev": page > 1,
+            "has_next": page < total_pages,
+            "prev_page": page - 1 if page > 1 else 1,
+            "next_page": page + 1 if page < total_pages else total_pages,
+        }
+
+        return request.app.templates.TemplateResponse(
+            "users.html",
+            {"request": request, "users": users, "pagination": pagination}
+        ).body
+
+    return await page_cache.respond(request, render)
+
+
+# 实时通知页面，需要登录（Bearer token 或 access_token Cookie）
+@notify.get("/live", response_class=HTMLResponse, dependencies=[Depends(jwt_auth)])
+async def live_page(request: Request):
+    return templates.TemplateResponse("live.html", {"request": request})
+
+
+# 实时通知流（Server-Sent Events），含订单号与金额，需要登录；浏览器 EventSource 自动携带 access_token Cookie
+@notify.get("/live/stream", dependencies=[Depends(jwt_auth)])
+async def live_stream(request: Request):
+    subscriber = live_hub.subscribe()
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected() and not shutdown_coordinator.draining:
+                if await subscriber.wait(timeout=15):
+                    for payload in subscriber.drain():
+                        yield f"data: {payload}\n\n"
+                else:
+                    # 心跳，防止代理断开空闲连接
+                    yield ": keep-alive\n\n"
+        finally:
+            live_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -237,6 +504,11 @@ async def handle_global_pay_in_notify(notify_in_data: Pay_RX_Notify_In_Data):
             logger.warning(f"订单号 {notify_in_data.mchOrderNo} 金额异常")
             return {"code": 1, "msg": "amount error"}
 
+        await save_notify_record(NOTIFY_TYPE_IN, notify_in_data)
+        await merchant_forwarder.enqueue(NOTIFY_TYPE_IN, notify_in_data)
+        notify_counter.record(ROUTE_PAY_IN, notify_in_data.state, notify_in_data.amount)
+        publish_live_event(ROUTE_PAY_IN, notify_in_data)
+
         msg = (
             f"💰 订单号 {notify_in_data.mchOrderNo} "
             f"{'支付成功' if notify_in_data.state == 2 else '支付失败'}，"
@@ -257,6 +529,10 @@ async def handle_global_pay_in_notify(notify_in_data: Pay_RX_Notify_In_Data):
 async def handle_global_pay_out_notify(notify_out_data: Pay_RX_Notify_Out_Data):
     """代付通知"""
     logger.info(f"收到【代付】通知: {notify_out_data}")
+    await save_notify_record(NOTIFY_TYPE_OUT, notify_out_data)
+    await merchant_forwarder.enqueue(NOTIFY_TYPE_OUT, notify_out_data)
+    notify_counter.record(ROUTE_PAY_OUT, notify_out_data.state, notify_out_data.amount)
+    publish_live_event(ROUTE_PAY_OUT, notify_out_data)
     msg = (
         f"🏦 代付订单号 {notify_out_data.mchOrderNo} "
         f"{'代付成功' if notify_out_data.state == 2 else '代付失败'}，"
@@ -271,6 +547,10 @@ async def handle_global_pay_out_notify(notify_out_data: Pay_RX_Notify_Out_Data):
 async def handle_global_refund_notify(notify_refund_data: Pay_RX_Notify_Refund_Data):
     """退款通知"""
     logger.info(f"收到【退款】通知: {notify_refund_data}")
+    await save_notify_record(NOTIFY_TYPE_REFUND, notify_refund_data)
+    await merchant_forwarder.enqueue(NOTIFY_TYPE_REFUND, notify_refund_data)
+    notify_counter.record(ROUTE_REFUND, notify_refund_data.state, notify_refund_data.amount)
+    publish_live_event(ROUTE_REFUND, notify_refund_data)
     msg = (
         f"🔁 退款订单号 {notify_refund_data.mchOrderNo} "
         f"{'退款成功' if notify_refund_data.state == 2 else '退款失败'}，"
@@ -280,9 +560,88 @@ async def handle_global_refund_notify(notify_refund_data: Pay_RX_Notify_Refund_D
     return {"code": 0, "msg": "success"}
 
 
+# ============================================================
+# 运维接口
+# ============================================================
+# 运维接口鉴权与 /users 共用 jwt_auth，token 需带 admin 权限（python3 -m Utils.handle_auth issue --sub ops --admin）
+
+
+# 采样分析：对处理本请求的 worker 采样 seconds 秒，返回 collapsed 调用栈（flamegraph.pl / speedscope 可直接渲染）
+# 多 worker 时请求落在哪个 worker 由内核分配，响应头 X-Profile-Pid 标明采样的进程
+@notify.get("/admin/profile", dependencies=[Depends(jwt_auth.admin)])
+async def admin_profile(
+        seconds: float = Query(10, gt=0, le=120),
+        interval_ms: float = Query(10, ge=1, le=1000),
+        threads: str = Query("loop,telegram", pattern=r"^(loop|telegram|all)(,(loop|telegram|all))*$"),
+):
+    try:
+        sampler = await sample(seconds, threads.split(","), interval_ms / 1000)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return Response(
+        content=sampler.collapsed(), media_type="text/plain",
+        headers={"X-Profile-Pid": str(os.getpid()), "X-Profile-Samples": str(sampler.samples)})
+
+
+# 指标：Prometheus 文本格式（事件循环延迟、请求超时、依赖熔断），每个 worker 独立，标签 pid 区分
+@notify.get("/admin/metrics", dependencies=[Depends(jwt_auth.admin)])
+async def admin_metrics():
+    labels = f'pid="{os.getpid()}"'
+    lines = (loop_monitor.prometheus(labels) + password_service.prometheus(labels) + jwt_auth.prometheus(labels)
+             + health_monitor.prometheus(labels))
+    deadline = deadline_stats.snapshot()
+    lines.append("# TYPE notify_deadline_exceeded_total counter")
+    lines += [f'notify_deadline_exceeded_total{{{labels},route="{route}"}} {count}'
+              for route, count in deadline["exceeded"].items()]
+    lines.append("# TYPE notify_deadline_cancelled_total counter")
+    lines += [f'notify_deadline_cancelled_total{{{labels},route="{route}"}} {count}'
+              for route, count in deadline["cancelled"].items()]
+    stats = {name: dependency.stats() for name, dependency in dependencies.items()}
+    lines.append("# TYPE notify_dependency_open gauge")
+    lines += [f'notify_dependency_open{{{labels},dependency="{name}"}} {int(item["state"] == "open")}'
+              for name, item in stats.items()]
+    lines.append("# TYPE notify_dependency_rejected_total counter")
+    lines += [f'notify_dependency_rejected_total{{{labels},dependency="{name}"}} '
+              f'{item["rejected"] + item["bulkhead_rejected"]}' for name, item in stats.items()]
+    return Response(content="\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+
+# 最近的事件循环阻塞记录（含阻塞时的调用栈）
+@notify.get("/admin/stalls", dependencies=[Depends(jwt_auth.admin)])
+async def admin_stalls():
+    return {"pid": os.getpid(), **loop_monitor.snapshot(), "recent": list(loop_monitor.stalls)}
+
+
+# 重新加载国家/地区索引（修改 country_info 表后调用），其他 worker 在 country.refresh_interval 秒内跟进
+@notify.post("/admin/countries/reload", dependencies=[Depends(jwt_auth.admin)])
+async def admin_countries_reload():
+    await country_index.reload()
+    return {"pid": os.getpid(), "countries": len(country_index), "source": country_index.snapshot.source}
+
+
+# 就绪检查：预热完成、未在排空且关键依赖正常时返回 200，部署脚本与上游据此判断是否向本 worker 发送流量
+# 以下三个接口只读取内存中的缓存状态，不查库、不写日志
+@notify.get("/ready")
+async def ready():
+    is_ready = warmup.ready and not shutdown_coordinator.draining and health_monitor.healthy
+    content = json.dumps({"ready": is_ready, "pid": os.getpid(), "warmup": warmup.ready,
+                          "draining": shutdown_coordinator.draining, "health": health_monitor.status})
+    if is_ready:
+        return Response(content=content, media_type="application/json")
+    return Response(content=content, status_code=503, headers={"Retry-After": "1"}, media_type="application/json")
+
+
+# 依赖健康详情（最近一次后台探测结果）
+@notify.get("/health")
+async def health():
+    return Response(content=health_monitor.body(), status_code=200 if health_monitor.healthy else 503,
+                    media_type="application/json")
+
+
 # 健康检查接口
 @notify.get("/Pay-RX_Notify")
 async def pay_rx_health():
-    """健康检查"""
-    logger.info("健康检查成功")
-    return Response(content="health", media_type="text/plain")
+    """健康检查：关键依赖（MySQL，按配置含 Redis）未连续探测失败 health.failure_threshold 次时返回 health，否则 503"""
+    if health_monitor.healthy:
+        return Response(content="health", media_type="text/plain")
+    return Response(content="unhealthy", status_code=503, media_type="text/plain")
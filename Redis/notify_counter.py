@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : notify_counter.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 支付通知日统计计数器（进程内聚合，定时批量 HINCRBY 到 Redis）
+
+import asyncio
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from Config.config_loader import public_config
+from DataBase.async_database import redis_manager
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+# Redis 键：notify_stats:{YYYY-MM-DD}，字段：{route}:{state}:count / {route}:{state}:amount
+STATS_KEY_PREFIX = "notify_stats"
+
+ROUTE_PAY_IN = "pay_in"  # 代收
+ROUTE_PAY_OUT = "pay_out"  # 代付
+ROUTE_REFUND = "refund"  # 退款
+
+
+class NotifyCounter:
+    """
+    按 (报表时区日期, 路由, 状态) 统计回调笔数与金额。
+    回调路径只做一次字典累加；后台任务每 flush_interval 秒用一个 pipeline 写入 Redis，
+    报表任务读取一个 hash 即可得到全天汇总，无需 GROUP BY 全天数据。
+    注意：统计口径为“收到的回调”，同一订单多次回调会分别计数。
+    """
+
+    def __init__(self, timezone: str = "America/Sao_Paulo", flush_interval: int = 5, retention_days: int = 40):
+        self.tz = ZoneInfo(timezone)
+        self.flush_interval = flush_interval
+        self.retention_seconds = retention_days * 86400
+        # (day, route, state) -> [count, amount]
+        self._pending: Dict[Tuple[str, str, int], list] = defaultdict(lambda: [0, 0])
+        self._task: Optional[asyncio.Task] = None
+
+    def day_of(self, when: Optional[datetime] = None) -> str:
+        """返回报表时区下的日期字符串"""
+        return (when or datetime.now(self.tz)).astimezone(self.tz).strftime("%Y-%m-%d")
+
+    def record(self, route: str, state: int, amount: int):
+        """记录一笔回调（同步、无 I/O）"""
+        bucket = self._pending[(self.day_of(), route, state)]
+        bucket[0] += 1
+        bucket[1] += amount
+
+    async def flush(self):
+        """把进程内累计的增量写入 Redis（一次 pipeline）"""
+        if not self._pending or redis_manager.client is None:
+            return
+
+        pending, self._pending = self._pending, defaultdict(lambda: [0, 0])
+        pipe = redis_manager.pipeline(transaction=False)
+        days = set()
+        for (day, route, state), (count, amount) in pending.items():
+            key = f"{STATS_KEY_PREFIX}:{day}"
+            pipe.hincrby(key, f"{route}:{state}:count", count)
+            pipe.hincrby(key, f"{route}:{state}:amount", amount)
+            days.add(key)
+        for key in days:
+            pipe.expire(key, self.retention_seconds)
+
+        try:
+            await redis_manager.execute(pipe)
+        except (Exception, asyncio.CancelledError) as err:
+            # 写入失败（或关闭时被取消）时把增量合并回去，下次重试
+            for bucket_key, (count, amount) in pending.items():
+                bucket = self._pending[bucket_key]
+                bucket[0] += count
+                bucket[1] += amount
+            if isinstance(err, asyncio.CancelledError):
+                raise
+            logger.error(f"写入支付通知统计失败，稍后重试: {err}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="notify-counter-flush")
+
+    async def stop(self):
+        """停止后台任务并做最后一次写入"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def get_daily_stats(self, day: str) -> Dict[str, Dict[int, Dict[str, int]]]:
+        """
+        读取某天的汇总：{route: {state: {"count": n, "amount": 分}}}
+        """
+        raw = await redis_manager.command("hgetall", f"{STATS_KEY_PREFIX}:{day}")
+        stats: Dict[str, Dict[int, Dict[str, int]]] = {}
+        for field, value in raw.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            route, state, metric = field.split(":")
+            stats.setdefault(route, {}).setdefault(int(state), {"count": 0, "amount": 0})[metric] = int(value)
+        return stats
+
+    def yesterday(self) -> str:
+        return self.day_of(datetime.now(self.tz) - timedelta(days=1))
+
+
+notify_counter = NotifyCounter(
+    timezone=public_config.get(key="report.timezone", get_type=str, default="America/Sao_Paulo"),
+    flush_interval=public_config.get(key="report.flush_interval", get_type=int, default=5),
+    retention_days=public_config.get(key="report.retention_days", get_type=int, default=40),
+)
@@ -6,7 +6,7 @@ import os
 import json
 from typing import Optional, Any
 
-from Config.config_loader import public_config
+from DataBase.async_database import redis_manager
 from Logger.logger_config import setup_logger
 
 log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
@@ -21,15 +21,7 @@ logger = setup_logger(log_name)
 #
 # logger.critical("打印严重错误信息")
 
-# 创建 Redis 连接池
-redis_pool = redis.ConnectionPool(
-    host=public_config.get(key="redis.host", get_type=str),
-    port=public_config.get(key="redis.port", get_type=int),
-    db=public_config.get(key="redis.db", get_type=int),
-    password=public_config.get(key="redis.password", get_type=str),
-    decode_responses=True,
-    max_connections=20
-)
+# 与服务其他模块共用 DataBase.async_database 中的连接池（redis.max_connections），不再单独建池
 
 
 # 自定义 JSON 编码器，处理 Decimal 和其他非标准类型
@@ -46,39 +38,45 @@ class CustomJSONEncoder(json.JSONEncoder):
 
 
 async def get_redis() -> redis.Redis:
-    """获取 Redis 连接"""
-    return redis.Redis(connection_pool=redis_pool)
+    """获取共用的 Redis 客户端（返回 bytes）；服务外单独使用时按配置初始化"""
+    if redis_manager.client is None:
+        await redis_manager.init_from_config()
+    return redis_manager.client
+
 
 async def set_cache(key: str, value: Any, expire: int = 3600) -> bool:
     """设置缓存"""
     try:
-        redis_client = await get_redis()
+        await get_redis()
         # 使用自定义编码器序列化数据
         serialized_value = json.dumps(value, cls=CustomJSONEncoder)
-        await redis_client.setex(key, expire, serialized_value)
+        await redis_manager.command("setex", key, expire, serialized_value)
         return True
     except Exception as err:
         logger.error(f"设置缓存失败，错误信息：{err}")
         return False
 
+
 async def get_cache(key: str) -> Optional[Any]:
     """获取缓存"""
     try:
-        redis_client = await get_redis()
-        value = await redis_client.get(key)
+        await get_redis()
+        value = await redis_manager.command("get", key)
         if value:
+            # json.loads 直接接受 UTF-8 bytes
             return json.loads(value)
         return None
     except Exception as err:
         logger.error(f"获取缓存失败，错误信息：{err}")
         return None
 
+
 async def delete_cache(key: str) -> bool:
     """删除缓存"""
     try:
-        redis_client = await get_redis()
-        await redis_client.delete(key)
+        await get_redis()
+        await redis_manager.command("delete", key)
         return True
     except Exception as err:
         logger.error(f"删除缓存失败，错误信息：{err}")
-        return False
\ No newline at end of file
+        return False
@@ -26,4 +26,74 @@ CREATE TABLE IF NOT EXISTS `telegram_users` (
 INSERT INTO `telegram_users` (`username`, `is_admin`, `nature`, `attribute`, `status`, `chat_id`) VALUES ('modaohuohuo', 1, 1, 3, 1, 5312177749);
 
 /* 测试群组 */
-INSERT INTO `telegram_users` (`username`, `is_admin`, `nature`, `attribute`, `status`, `chat_id`) VALUES ('FastAPI服务', 0, 3, 3, 1, -4944286056);
\ No newline at end of file
+INSERT INTO `telegram_users` (`username`, `is_admin`, `nature`, `attribute`, `status`, `chat_id`) VALUES ('FastAPI服务', 0, 3, 3, 1, -4944286056);
+
+/* 创建支付通知记录表（同一平台订单号的多次回调只保留一行，state 原地更新） */
+DROP TABLE IF EXISTS `pay_notify_record`;
+CREATE TABLE IF NOT EXISTS `pay_notify_record` (
+    `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY COMMENT '自增主键ID（定时检查按此列做 keyset 增量扫描）',
+    `notify_type` TINYINT(1) NOT NULL COMMENT '通知类型：1-代收, 2-代付, 3-退款',
+    `sys_order_no` VARCHAR(36) NOT NULL COMMENT '平台订单号',
+    `mch_order_no` VARCHAR(36) NOT NULL COMMENT '下游订单号',
+    `state` TINYINT(1) NOT NULL DEFAULT 0 COMMENT '状态：0-订单生成, 1-处理中, 2-成功, 3-失败',
+    `amount` INT UNSIGNED NOT NULL COMMENT '金额（单位分）',
+    `notify_count` INT UNSIGNED NOT NULL DEFAULT 1 COMMENT '收到回调次数',
+    `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '首次收到时间',
+    `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '最后更新时间',
+    UNIQUE KEY `uniq_type_sys_order` (`notify_type`, `sys_order_no`),
+    KEY `idx_mch_order_no` (`mch_order_no`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci ROW_FORMAT=DYNAMIC COMMENT='Pay-RX 支付通知记录表';
+
+/* 创建下游商户表（回调转发的目标地址与签名密钥） */
+DROP TABLE IF EXISTS `merchant_info`;
+CREATE TABLE IF NOT EXISTS `merchant_info` (
+    `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY COMMENT '自增主键ID',
+    `mch_no` VARCHAR(32) NOT NULL COMMENT '商户号',
+    `mch_name` VARCHAR(64) NOT NULL DEFAULT '' COMMENT '商户名称',
+    `notify_url` VARCHAR(255) NOT NULL DEFAULT '' COMMENT '默认回调地址（订单未指定时使用）',
+    `secret_key` VARCHAR(64) NOT NULL COMMENT '回调签名密钥',
+    `max_concurrency` INT UNSIGNED NOT NULL DEFAULT 0 COMMENT '该商户回调并发上限，0-使用 forward.host_concurrency',
+    `status` TINYINT(1) NOT NULL DEFAULT 1 COMMENT '状态：0-禁用, 1-启用',
+    `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '最后更新时间',
+    UNIQUE KEY `uniq_mch_no` (`mch_no`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci ROW_FORMAT=DYNAMIC COMMENT='下游商户表';
+
+/* 创建下游订单表（由下单服务 pay-order.king-sms.com 在下单时写入，用于把回调路由到对应商户） */
+DROP TABLE IF EXISTS `merchant_order`;
+CREATE TABLE IF NOT EXISTS `merchant_order` (
+    `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY COMMENT '自增主键ID',
+    `mch_no` VARCHAR(32) NOT NULL COMMENT '商户号',
+    `mch_order_no` VARCHAR(36) NOT NULL COMMENT '下游订单号',
+    `notify_url` VARCHAR(255) DEFAULT NULL COMMENT '下单时指定的回调地址，为空时使用商户默认地址',
+    `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '下单时间',
+    UNIQUE KEY `uniq_mch_order_no` (`mch_order_no`),
+    KEY `idx_mch_no` (`mch_no`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci ROW_FORMAT=DYNAMIC COMMENT='下游订单表';
+
+/* 创建商户回调转发队列表（持久化重试队列：每个订单的每个状态只推送一次） */
+DROP TABLE IF EXISTS `merchant_callback`;
+CREATE TABLE IF NOT EXISTS `merchant_callback` (
+    `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY COMMENT '自增主键ID',
+    `notify_type` TINYINT(1) NOT NULL COMMENT '通知类型：1-代收, 2-代付, 3-退款',
+    `sys_order_no` VARCHAR(36) NOT NULL COMMENT '平台订单号',
+    `mch_order_no` VARCHAR(36) NOT NULL COMMENT '下游订单号',
+    `mch_no` VARCHAR(32) NOT NULL COMMENT '商户号',
+    `notify_url` VARCHAR(255) NOT NULL COMMENT '回调地址',
+    `state` TINYINT(1) NOT NULL COMMENT '订单状态：0-订单生成, 1-处理中, 2-成功, 3-失败',
+    `amount` INT UNSIGNED NOT NULL COMMENT '金额（单位分）',
+    `extra_field` VARCHAR(32) DEFAULT NULL COMMENT '扩展字段（原样回传）',
+    `status` TINYINT(1) NOT NULL DEFAULT 0 COMMENT '推送状态：0-待推送, 1-推送成功, 2-重试耗尽',
+    `attempts` INT UNSIGNED NOT NULL DEFAULT 0 COMMENT '已推送次数',
+    `next_attempt_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '下次推送时间',
+    `lease_token` CHAR(32) DEFAULT NULL COMMENT '领取批次标识（多 worker 领取互斥）',
+    `lease_until` DATETIME DEFAULT NULL COMMENT '领取有效期，过期未完成的记录会被重新领取',
+    `last_http_status` SMALLINT DEFAULT NULL COMMENT '最近一次 HTTP 状态码',
+    `last_error` VARCHAR(255) DEFAULT NULL COMMENT '最近一次失败原因',
+    `delivered_at` DATETIME DEFAULT NULL COMMENT '推送成功时间',
+    `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '入队时间',
+    `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '最后更新时间',
+    UNIQUE KEY `uniq_type_order_state` (`notify_type`, `sys_order_no`, `state`),
+    KEY `idx_dispatch` (`status`, `next_attempt_at`),
+    KEY `idx_lease_token` (`lease_token`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci ROW_FORMAT=DYNAMIC COMMENT='商户回调转发队列表';
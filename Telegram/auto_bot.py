@@ -5,12 +5,16 @@
 # @Time      : 2025/9/18 11:58
 # @IDE       : PyCharm
 # @Function  :
+import asyncio
+import collections
 import datetime
+import itertools
 import json
 import os
 
 import re
 
+import requests
 import telebot  # pip3 install --upgrade pyTelegramBotAPI
 from telebot import types
 from telebot.types import BotCommand, InlineKeyboardButton, InlineKeyboardMarkup
@@ -24,12 +28,16 @@ from Config.config_loader import public_config
 
 # 引用日志模块
 from Logger.logger_config import setup_logger
+from Utils.handle_deadline import DeadlineExceeded
+from Utils.handle_resilience import CircuitBreaker, DependencyUnavailable, build_dependency
+from Utils.handle_tracing import KIND_CLIENT, span, traced
 
 log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
 logger = setup_logger(log_name)
 
 bot = None
 bot_initialized = False  # 添加初始化状态标志
+bot_thread = None  # 轮询线程，健康检查据此判断机器人是否仍在运行
 
 try:
     logger.info("正在加载 Telegram token...")
@@ -175,7 +183,9 @@ def start_bot():
         return
 
     # 启动轮询线程
-    threading.Thread(target=run_bot, daemon=True).start()
+    global bot_thread
+    bot_thread = threading.Thread(target=run_bot, name="telegram-bot", daemon=True)
+    bot_thread.start()
 
     # 删除旧命令
     bot.delete_my_commands(scope=None, language_code=None)
@@ -196,6 +206,10 @@ def start_bot():
     bot.set_my_commands(commands=com_set)
 
 
+def bot_running() -> bool:
+    return bot_thread is not None and bot_thread.is_alive()
+
+
 def stop_bot():
     if bot_initialized:
         bot.stop_polling()
@@ -210,33 +224,130 @@ if bot_initialized:
         bot.reply_to(message, f"{message.chat.id}")
 
 
+# Telegram 接口的熔断 + 并发隔离；send_message 是同步请求，放到线程里执行，不阻塞事件循环。
+# 管理员多于并发上限或多条告警同时发送时排队等待名额（max_wait 不小于发送超时），而不是直接失败
+telegram_dependency = build_dependency(
+    "telegram", (requests.RequestException, OSError), max_concurrent=4, max_wait=10, timeout=10)
+# 发送失败暂存的告警，按 chat_id 分别保存（None 表示尚未取得管理员列表、发给全部管理员），
+# 该管理员下一次发送成功后合并成一条补发；每个队列超过上限丢弃最早的
+deferred_max = public_config.get(key="resilience.telegram_deferred_max", get_type=int, default=200)
+deferred_messages = collections.defaultdict(lambda: collections.deque(maxlen=deferred_max))
+# 暂存序号，合并“全部管理员”与单个管理员的暂存时保持先后顺序
+_deferred_seq = itertools.count()
+
+
+@traced("telegram.admin_chat_ids")
+async def get_admin_chat_ids():
+    cache_key = "telegram_admin_chat_ids"
+    cached_data = await redis_manager.get_json(cache_key)
+    if cached_data:
+        logger.info(f"命中缓存: {cache_key}")
+        return cached_data
+    logger.info(f"未命中缓存: {cache_key}，从数据库查询")
+    admin_chat_ids = await mysql_manager.fetchall(
+        "SELECT `chat_id` FROM `telegram_users` WHERE `status` = 1 AND `is_admin` = 1 ORDER BY `chat_id`")
+    await redis_manager.set(cache_key, json.dumps(admin_chat_ids), ex=6000)
+    return admin_chat_ids
+
+
+async def _send_to_chat(chat_id, message: str) -> bool:
+    with span("telegram.send_message", KIND_CLIENT, **{"telegram.chat_id": str(chat_id)}) as current:
+        try:
+            await telegram_dependency.call(asyncio.to_thread, bot.send_message, chat_id=str(chat_id), text=message)
+            logger.info(f"发送消息[{message}]到 chat_id [{chat_id}] 成功")
+            return True
+        except Exception as e:
+            logger.error(f"发送消息到 chat_id {chat_id} 失败: {e!r}")
+            if current is not None:
+                current.set_error(e)
+            return False
+
+
+def _defer(message: str, chat_ids=None):
+    """暂存告警；chat_ids 为空时暂存给全部管理员"""
+    entry = (next(_deferred_seq), f"[{datetime.datetime.now():%H:%M:%S}] {message}")
+    for chat_id in chat_ids or [None]:
+        deferred_messages[chat_id].append(entry)
+    logger.warning(f"Telegram 发送失败，告警已暂存（{'全部管理员' if not chat_ids else chat_ids}，"
+                   f"共 {sum(len(queue) for queue in deferred_messages.values())} 条）")
+
+
+async def _flush_deferred(chat_ids, delivered):
+    """把暂存的告警合并补发给本次发送成功的管理员；补发失败的保留到下次"""
+    shared = deferred_messages.pop(None, None)
+    if shared:
+        # 发给全部管理员的暂存拆到每个管理员的队列里，各自补发成功后各自清除
+        for chat_id in chat_ids:
+            merged = sorted(set(shared) | set(deferred_messages[chat_id]))
+            deferred_messages[chat_id] = collections.deque(merged, maxlen=deferred_max)
+    # 已不是管理员的 chat_id 不再补发
+    for chat_id in [key for key in deferred_messages if key not in chat_ids]:
+        del deferred_messages[chat_id]
+
+    async def flush(chat_id) -> None:
+        queue = deferred_messages.get(chat_id)
+        if not queue:
+            return
+        entries = list(queue)
+        backlog = "\n".join(text for _, text in entries)
+        backlog = f"⚠️ Telegram 恢复前暂存的告警：\n{backlog}"
+        # 单条消息上限 4096 字符，超出的部分只保留最新的
+        if len(backlog) > 4000:
+            backlog = backlog[:200] + "\n...\n" + backlog[-3700:]
+        if await _send_to_chat(chat_id, backlog):
+            for entry in entries:
+                if queue and queue[0] == entry:
+                    queue.popleft()
+            if not queue:
+                deferred_messages.pop(chat_id, None)
+
+    await asyncio.gather(*[flush(chat_id) for chat_id in delivered])
+
+
+@traced("telegram.send")
 async def send_telegram_message(message: str):
+    """
+    并发发送给所有管理员（超过并发上限的排队发送）。Telegram 熔断中时消息直接暂存并立即返回（不占用调用方时间），
+    发送失败的管理员各自暂存；某个管理员下一次发送成功后把其暂存消息合并补发。
+    在回调请求中调用时，发送（含排队）受请求截止时间限制，来不及发送的同样暂存。
+    """
     if not bot_initialized:
         logger.error("Telegram机器人未初始化，无法发送消息")
         return
 
     if bot:
+        if not telegram_dependency.available:
+            _defer(message)
+            return
         try:
-            cache_key = "telegram_admin_chat_ids"
-            cached_data = await redis_manager.get_json(cache_key)
-            if cached_data:
-                logger.info(f"命中缓存: {cache_key}")
-                admin_chat_ids = cached_data
-            else:
-                logger.info(f"未命中缓存: {cache_key}，从数据库查询")
-                admin_chat_ids = await mysql_manager.fetchall(
-                    "SELECT `chat_id` FROM `telegram_users` WHERE `status` = 1 AND `is_admin` = 1 ORDER BY `chat_id`")
-                await redis_manager.set(cache_key, json.dumps(admin_chat_ids), ex=6000)
-
-            for chat_id in admin_chat_ids:
-                try:
-                    bot.send_message(chat_id=str(chat_id['chat_id']), text=message)
-                    logger.info(f"发送消息[{message}]到 chat_id [{chat_id['chat_id']}] 成功")
-                except Exception as e:
-                    logger.error(f"发送消息到 chat_id {chat_id['chat_id']} 失败: {e}")
-
+            admin_chat_ids = await get_admin_chat_ids()
+        except (DependencyUnavailable, DeadlineExceeded) as e:
+            logger.error(f"查询 Telegram 管理员失败: {e}")
+            _defer(message)
+            return
         except Exception as e:
             logger.error(f"发送Telegram消息失败: {e}")
+            return
+        if not admin_chat_ids:
+            return
+
+        chat_ids = [item['chat_id'] for item in admin_chat_ids]
+        if telegram_dependency.breaker.state != CircuitBreaker.CLOSED:
+            # 半开状态只放行一个探测请求：先发第一个管理员，恢复后再并发发送其余
+            results = [await _send_to_chat(chat_ids[0], message)]
+            if results[0]:
+                results += await asyncio.gather(*[_send_to_chat(chat_id, message) for chat_id in chat_ids[1:]])
+            else:
+                results += [False] * (len(chat_ids) - 1)
+        else:
+            results = await asyncio.gather(*[_send_to_chat(chat_id, message) for chat_id in chat_ids])
+
+        failed = [chat_id for chat_id, ok in zip(chat_ids, results) if not ok]
+        delivered = [chat_id for chat_id, ok in zip(chat_ids, results) if ok]
+        if failed:
+            _defer(message, failed)
+        if delivered and deferred_messages:
+            await _flush_deferred(chat_ids, delivered)
     else:
         logger.error("Telegram机器人未初始化，无法发送消息")
 
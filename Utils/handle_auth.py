@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : handle_auth.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : JWT 鉴权依赖：密钥对象只构建一次，验签结果按 token 哈希缓存到过期，吊销名单从 Redis 镜像到本地
+#
+# 每个请求的鉴权开销：一次 sha256 + 两次字典查找；只有首次出现的 token 才会完整验签。
+# 吊销：revoke() 写入 Redis 有序集合（score 为 token 过期时间）并递增版本号，
+# 各 worker 定时比较版本号，有变化才拉取全量名单替换本地集合。
+#
+# 签发令牌（命令行）：python3 -m Utils.handle_auth issue --sub admin --minutes 60
+# 签发运维令牌（/admin/* 接口，scope 含 admin）：python3 -m Utils.handle_auth issue --sub ops --admin --minutes 60
+# 吊销令牌（命令行）：python3 -m Utils.handle_auth revoke <token>
+
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from jose import JWTError, jwk, jwt
+
+from Config.config_loader import public_config
+from DataBase.async_database import redis_manager
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+REVOKED_KEY = "auth:revoked"
+REVOKED_VERSION_KEY = "auth:revoked:version"
+# 运维接口要求的权限（token 的 scope 声明，空格分隔）
+ADMIN_SCOPE = "admin"
+DEFAULT_SECRET_KEY = "your-secret-key"
+
+
+class TokenAuth:
+    def __init__(self, secret_key: str, algorithm: str = "HS256", cache_size: int = 10000,
+                 revocation_refresh: float = 5, cookie_name: str = "access_token"):
+        self.algorithm = algorithm
+        # 密钥只解析一次，jose 每次传入字符串都会重新构建 Key 对象
+        self.key = jwk.construct(secret_key, algorithm)
+        self.cache_size = cache_size
+        self.revocation_refresh = revocation_refresh
+        self.cookie_name = cookie_name
+        # token sha256 -> (claims, exp)；按最近使用顺序淘汰
+        self._cache: "OrderedDict[bytes, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._revoked: FrozenSet[str] = frozenset()
+        self._revoked_version: Optional[bytes] = None
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    # ---------------- 签发与验签 ----------------
+    def issue(self, data: dict, expires_delta: Optional[timedelta] = None) -> str:
+        """签发 token：自动加入 exp / iat / jti（jti 用于吊销）"""
+        now = datetime.now(timezone.utc)
+        claims = data.copy()
+        claims.setdefault("jti", uuid.uuid4().hex)
+        claims.update({"iat": now, "exp": now + (expires_delta or timedelta(minutes=30))})
+        return jwt.encode(claims, self.key, algorithm=self.algorithm)
+
+    @staticmethod
+    def _revocation_id(claims: Dict[str, Any], digest: bytes) -> str:
+        # 没有 jti 的旧 token 按 token 哈希吊销
+        return claims.get("jti") or digest.hex()
+
+    def verify(self, token: str) -> Optional[Dict[str, Any]]:
+        """校验 token，返回载荷；无效、过期或已吊销返回 None"""
+        digest = hashlib.sha256(token.encode()).digest()
+        cached = self._cache.get(digest)
+        now = time.time()
+        if cached is not None:
+            claims, exp = cached
+            if exp > now:
+                self._cache.move_to_end(digest)
+                self.hits += 1
+                return None if self._revocation_id(claims, digest) in self._revoked else claims
+            del self._cache[digest]
+
+        self.misses += 1
+        try:
+            claims = jwt.decode(token, self.key, algorithms=[self.algorithm])
+        except JWTError:
+            return None
+        exp = float(claims.get("exp") or 0)
+        if exp <= now:
+            # 没有 exp 的 token 不接受
+            return None
+        self._cache[digest] = (claims, exp)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return None if self._revocation_id(claims, digest) in self._revoked else claims
+
+    # ---------------- 吊销名单 ----------------
+    async def revoke(self, token: str) -> bool:
+        """吊销 token（验签通过才吊销），立即对本 worker 生效，其他 worker 在 revocation_refresh 秒内生效"""
+        digest = hashlib.sha256(token.encode()).digest()
+        try:
+            claims = jwt.decode(token, self.key, algorithms=[self.algorithm])
+        except JWTError:
+            return False
+        revocation_id = self._revocation_id(claims, digest)
+        pipe = redis_manager.pipeline(transaction=True)
+        pipe.zadd(REVOKED_KEY, {revocation_id: float(claims.get("exp") or time.time())})
+        pipe.incr(REVOKED_VERSION_KEY)
+        await redis_manager.execute(pipe)
+        self._revoked = self._revoked | {revocation_id}
+        logger.info(f"已吊销 token，sub={claims.get('sub')} jti={revocation_id}")
+        return True
+
+    async def sync_revocations(self):
+        """版本号变化时拉取全量吊销名单；过期的条目顺带清理"""
+        redis_manager.ensure_inited()
+        version = await redis_manager.get(REVOKED_VERSION_KEY)
+        if version == self._revoked_version:
+            return
+        now = time.time()
+        await redis_manager.command("zremrangebyscore", REVOKED_KEY, "-inf", now)
+        members = await redis_manager.command("zrangebyscore", REVOKED_KEY, now, "+inf")
+        self._revoked = frozenset(member.decode() for member in members)
+        self._revoked_version = version
+        logger.info(f"吊销名单已同步，共 {len(self._revoked)} 条")
+
+    async def _sync_loop(self):
+        while True:
+            try:
+                await self.sync_revocations()
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                # Redis 不可用时沿用本地名单
+                logger.warning(f"同步吊销名单失败: {err!r}")
+            await asyncio.sleep(self.revocation_refresh)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._sync_loop(), name="auth-revocation-sync")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def prometheus(self, labels: str = "") -> List[str]:
+        return [
+            "# TYPE notify_auth_cache_hits_total counter",
+            f"notify_auth_cache_hits_total{{{labels}}} {self.hits}",
+            "# TYPE notify_auth_cache_misses_total counter",
+            f"notify_auth_cache_misses_total{{{labels}}} {self.misses}",
+            "# TYPE notify_auth_cache_size gauge",
+            f"notify_auth_cache_size{{{labels}}} {len(self._cache)}",
+            "# TYPE notify_auth_revoked gauge",
+            f"notify_auth_revoked{{{labels}}} {len(self._revoked)}",
+        ]
+
+    # ---------------- FastAPI 依赖 ----------------
+    def _extract(self, request: Request) -> Optional[str]:
+        authorization = request.headers.get("authorization")
+        if authorization:
+            scheme, _, token = authorization.partition(" ")
+            if scheme.lower() == "bearer" and token:
+                return token.strip()
+        # 浏览器访问的页面（/users、/live 及其 SSE 流）从 Cookie 读取
+        return request.cookies.get(self.cookie_name)
+
+    async def __call__(self, request: Request) -> Dict[str, Any]:
+        """用法：Depends(jwt_auth)，返回 token 载荷"""
+        token = self._extract(request)
+        if not token:
+            raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+        claims = self.verify(token)
+        if claims is None:
+            raise HTTPException(status_code=401, detail="Invalid token", headers={"WWW-Authenticate": "Bearer"})
+        return claims
+
+    async def admin(self, request: Request) -> Dict[str, Any]:
+        """用法：Depends(jwt_auth.admin)，运维接口鉴权，要求 token 的 scope 含 admin"""
+        claims = await self(request)
+        if ADMIN_SCOPE not in str(claims.get("scope") or "").split():
+            raise HTTPException(status_code=403, detail="Admin scope required")
+        return claims
+
+
+def _secret_key() -> str:
+    # 密钥优先取环境变量（不写入 config.ini）
+    secret_key = os.environ.get("NOTIFY_JWT_SECRET") or public_config.get(
+        key="auth.secret_key", get_type=str, default=DEFAULT_SECRET_KEY)
+    if secret_key == DEFAULT_SECRET_KEY:
+        logger.warning("JWT 仍在使用默认密钥，请通过环境变量 NOTIFY_JWT_SECRET 设置")
+    return secret_key
+
+
+jwt_auth = TokenAuth(
+    secret_key=_secret_key(),
+    algorithm=public_config.get(key="auth.algorithm", get_type=str, default="HS256"),
+    cache_size=public_config.get(key="auth.cache_size", get_type=int, default=10000),
+    revocation_refresh=public_config.get(key="auth.revocation_refresh", get_type=float, default=5),
+)
+
+
+async def _revoke_cli(token: str) -> bool:
+    await redis_manager.init_from_config()
+    try:
+        return await jwt_auth.revoke(token)
+    finally:
+        await redis_manager.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JWT 令牌签发与吊销")
+    sub_parsers = parser.add_subparsers(dest="command", required=True)
+    issue_parser = sub_parsers.add_parser("issue", help="签发令牌")
+    issue_parser.add_argument("--sub", required=True)
+    issue_parser.add_argument("--minutes", type=int, default=60)
+    issue_parser.add_argument("--admin", action="store_true", help="带 admin 权限（可访问 /admin/* 运维接口）")
+    revoke_parser = sub_parsers.add_parser("revoke", help="吊销令牌")
+    revoke_parser.add_argument("token")
+    args = parser.parse_args()
+
+    if args.command == "issue":
+        claims = {"sub": args.sub, **({"scope": ADMIN_SCOPE} if args.admin else {})}
+        print(jwt_auth.issue(claims, timedelta(minutes=args.minutes)))
+    else:
+        print("已吊销" if asyncio.run(_revoke_cli(args.token)) else "令牌无效")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
-import hashlib
 import os
 
+from Utils.handle_codec import md5_hex
+from Utils.handle_filehash import hash_file, hash_files
+
 
 class MD5Utils:
     """
     MD5加密工具类，提供字符串加密和文件MD5计算功能
+    （bytes 输入与批量计算请直接使用 Utils.handle_codec）
     返回格式: (status, result_or_error)
     status: 操作状态 (SUCCESS, ERROR)
     result_or_error: 成功时返回结果，失败时返回错误信息字典
@@ -19,6 +22,14 @@ class MD5Utils:
         "UNKNOWN_ERROR": 2099
     }
 
+    # FileDigest.error_code -> ERROR_CODES
+    FILE_ERROR_CODES = {
+        "FILE_NOT_FOUND": "FILE_NOT_FOUND",
+        "NOT_A_FILE": "FILE_NOT_FOUND",
+        "PERMISSION_DENIED": "FILE_READ_ERROR",
+        "FILE_READ_ERROR": "FILE_READ_ERROR"
+    }
+
     @staticmethod
     def md5_string(data: str) -> tuple:
         """
@@ -27,6 +38,10 @@ class MD5Utils:
         :return: (status, result) 元组
         """
         try:
+            # 正常输入直接计算，错误字典只在出错时构造
+            if isinstance(data, str) and data:
+                return ("SUCCESS", md5_hex(data.encode('utf-8')))
+
             # 输入验证
             if not isinstance(data, str):
                 return ("ERROR", {
@@ -35,17 +50,11 @@ class MD5Utils:
                     "input": data
                 })
 
-            if not data:
-                return ("ERROR", {
-                    "code": MD5Utils.ERROR_CODES["EMPTY_INPUT"],
-                    "message": "输入不能为空字符串",
-                    "input": data
-                })
-
-            # 计算MD5
-            md5_hash = hashlib.md5()
-            md5_hash.update(data.encode('utf-8'))
-            return ("SUCCESS", md5_hash.hexdigest())
+            return ("ERROR", {
+                "code": MD5Utils.ERROR_CODES["EMPTY_INPUT"],
+                "message": "输入不能为空字符串",
+                "input": data
+            })
 
         except Exception as e:
             return ("ERROR", {
@@ -60,7 +69,7 @@ class MD5Utils:
         """
         计算文件的MD5值
         :param file_path: 文件路径
-        :param chunk_size: 读取块大小(字节)
+        :param chunk_size: 已不再使用（固定 1 MB 缓冲区），保留以兼容旧调用
         :return: (status, result) 元组
         """
         try:
@@ -79,48 +88,40 @@ class MD5Utils:
                     "input": file_path
                 })
 
-            # 检查文件是否存在
-            if not os.path.exists(file_path):
-                return ("ERROR", {
-                    "code": MD5Utils.ERROR_CODES["FILE_NOT_FOUND"],
-                    "message": f"文件不存在: {file_path}",
-                    "input": file_path
-                })
-
-            # 检查是否为文件
-            if not os.path.isfile(file_path):
-                return ("ERROR", {
-                    "code": MD5Utils.ERROR_CODES["FILE_NOT_FOUND"],
-                    "message": f"路径不是文件: {file_path}",
-                    "input": file_path
-                })
-
-            # 计算文件MD5
-            md5_hash = hashlib.md5()
-            with open(file_path, 'rb') as f:
-                while chunk := f.read(chunk_size):
-                    md5_hash.update(chunk)
-            return ("SUCCESS", md5_hash.hexdigest())
-
-        except PermissionError as e:
+            # 计算文件MD5（大缓冲区读取，见 Utils.handle_filehash）
+            result = hash_file(file_path, ("md5",))
+            if result.ok:
+                return ("SUCCESS", result.digests["md5"])
             return ("ERROR", {
-                "code": MD5Utils.ERROR_CODES["FILE_READ_ERROR"],
-                "message": f"文件读取权限不足: {str(e)}",
-                "input": file_path,
-                "exception": str(e)
+                "code": MD5Utils.ERROR_CODES[MD5Utils.FILE_ERROR_CODES[result.error_code]],
+                "message": result.error,
+                "input": file_path
             })
-        except OSError as e:
+
+        except Exception as e:
             return ("ERROR", {
-                "code": MD5Utils.ERROR_CODES["FILE_READ_ERROR"],
-                "message": f"文件读取错误: {str(e)}",
+                "code": MD5Utils.ERROR_CODES["UNKNOWN_ERROR"],
+                "message": f"文件MD5计算失败: {str(e)}",
                 "input": file_path,
                 "exception": str(e)
             })
+
+    @staticmethod
+    def md5_files(file_paths: list, with_sha256: bool = False) -> tuple:
+        """
+        批量计算文件MD5（可同时计算SHA-256，只读一次文件），多文件并行
+        :param file_paths: 文件路径列表
+        :param with_sha256: 是否同时计算 SHA-256
+        :return: ("SUCCESS", [FileDigest, ...])，顺序与输入一致；单个文件的错误见 FileDigest.error_code
+        """
+        try:
+            algorithms = ("md5", "sha256") if with_sha256 else ("md5",)
+            return ("SUCCESS", hash_files(file_paths, algorithms))
         except Exception as e:
             return ("ERROR", {
                 "code": MD5Utils.ERROR_CODES["UNKNOWN_ERROR"],
-                "message": f"文件MD5计算失败: {str(e)}",
-                "input": file_path,
+                "message": f"批量文件哈希失败: {str(e)}",
+                "input": file_paths,
                 "exception": str(e)
             })
 
@@ -177,13 +178,15 @@ if __name__ == '__main__':
 
     # 清理临时文件
     os.unlink(tmp_path)
-import base64
 import binascii
 
+from Utils.handle_codec import b64decode, b64encode
+
 
 class Base64Utils:
     """
     Base64编码解码工具类，提供状态返回和错误码机制
+    （bytes 输入、批量与流式编码解码请直接使用 Utils.handle_codec）
     返回格式: (status, result_or_error)
     status: 操作状态 (SUCCESS, ERROR)
     result_or_error: 成功时返回结果，失败时返回错误信息字典
@@ -207,6 +210,10 @@ class Base64Utils:
         result: 成功时为编码字符串，失败时为错误信息字典
         """
         try:
+            # 正常输入直接编码，错误字典只在出错时构造
+            if isinstance(data, str) and data:
+                return ("SUCCESS", b64encode(data.encode('utf-8')).decode('ascii'))
+
             # 输入验证
             if not isinstance(data, str):
                 return ("ERROR", {
@@ -215,17 +222,11 @@ class Base64Utils:
                     "input": data
                 })
 
-            if not data:
-                return ("ERROR", {
-                    "code": Base64Utils.ERROR_CODES["EMPTY_INPUT"],
-                    "message": "输入不能为空字符串",
-                    "input": data
-                })
-
-            # 执行编码
-            byte_data = data.encode('utf-8')
-            encoded_bytes = base64.b64encode(byte_data)
-            return ("SUCCESS", encoded_bytes.decode('utf-8'))
+            return ("ERROR", {
+                "code": Base64Utils.ERROR_CODES["EMPTY_INPUT"],
+                "message": "输入不能为空字符串",
+                "input": data
+            })
 
         except Exception as e:
             return ("ERROR", {
@@ -244,6 +245,10 @@ class Base64Utils:
         result: 成功时为解码字符串，失败时为错误信息字典
         """
         try:
+            # 正常输入直接解码，错误字典只在出错时构造
+            if isinstance(encoded_data, str) and encoded_data:
+                return ("SUCCESS", b64decode(encoded_data.encode('utf-8')).decode('utf-8'))
+
             # 输入验证
             if not isinstance(encoded_data, str):
                 return ("ERROR", {
@@ -252,17 +257,11 @@ class Base64Utils:
                     "input": encoded_data
                 })
 
-            if not encoded_data:
-                return ("ERROR", {
-                    "code": Base64Utils.ERROR_CODES["EMPTY_INPUT"],
-                    "message": "输入不能为空字符串",
-                    "input": encoded_data
-                })
-
-            # 执行解码
-            byte_data = encoded_data.encode('utf-8')
-            decoded_bytes = base64.b64decode(byte_data, validate=True)
-            return ("SUCCESS", decoded_bytes.decode('utf-8'))
+            return ("ERROR", {
+                "code": Base64Utils.ERROR_CODES["EMPTY_INPUT"],
+                "message": "输入不能为空字符串",
+                "input": encoded_data
+            })
 
         except binascii.Error as e:
             return ("ERROR", {
@@ -332,6 +331,8 @@ import bcrypt
 import re
 from getpass import getpass
 
+from Utils.handle_password import password_service
+
 
 class PasswordUtils:
     """
@@ -407,6 +408,57 @@ class PasswordUtils:
                 "exception": str(e)
             })
 
+    # ---------------- 异步版本：bcrypt 在密码进程池中执行，协程中调用不会阻塞事件循环 ----------------
+    @staticmethod
+    async def hash_password_async(password: str) -> tuple:
+        """与 hash_password 返回格式相同"""
+        if not PasswordUtils._is_valid_password(password):
+            return ("ERROR", {
+                "code": PasswordUtils.ERROR_CODES["INVALID_PASSWORD_FORMAT"],
+                "message": "密码必须包含大小写字母、数字和特殊字符，长度8-64位"
+            })
+        try:
+            return ("SUCCESS", await password_service.hash(password))
+        except Exception as e:
+            return ("ERROR", {
+                "code": PasswordUtils.ERROR_CODES["HASHING_ERROR"],
+                "message": f"密码哈希失败: {str(e)}",
+                "exception": str(e)
+            })
+
+    @staticmethod
+    async def verify_password_async(password: str, hashed_password: str) -> tuple:
+        """与 verify_password 返回格式相同"""
+        if not PasswordUtils._is_valid_password(password):
+            return ("ERROR", {
+                "code": PasswordUtils.ERROR_CODES["INVALID_PASSWORD_FORMAT"],
+                "message": "密码必须包含大小写字母、数字和特殊字符，长度8-64位"
+            })
+        try:
+            return ("SUCCESS", await password_service.verify(password, hashed_password))
+        except Exception as e:
+            return ("ERROR", {
+                "code": PasswordUtils.ERROR_CODES["VERIFICATION_ERROR"],
+                "message": f"密码验证失败: {str(e)}",
+                "exception": str(e)
+            })
+
+    @staticmethod
+    async def verify_passwords_async(pairs: list) -> tuple:
+        """
+        批量验证（批量导入用户等场景）
+        :param pairs: [(原始密码, 哈希密码), ...]
+        :return: ("SUCCESS", [验证结果布尔值, ...]) 或 ("ERROR", 错误信息字典)
+        """
+        try:
+            return ("SUCCESS", await password_service.verify_many(pairs))
+        except Exception as e:
+            return ("ERROR", {
+                "code": PasswordUtils.ERROR_CODES["VERIFICATION_ERROR"],
+                "message": f"批量密码验证失败: {str(e)}",
+                "exception": str(e)
+            })
+
     @staticmethod
     def _is_valid_password(password: str) -> bool:
         """
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : handle_codec.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 以 bytes 为中心的 Base64 / MD5 接口：单个、批量与流式
+#
+# 输入接受 bytes / bytearray / memoryview（str 按 UTF-8 编码），输出 bytes；出错直接抛异常（binascii.Error），
+# 不构造状态元组和错误字典。Base64Utils / MD5Utils 的 (status, result) 接口是在此之上的一层包装。
+# 流式接口按固定大小缓冲区处理大文件/大对象，内存占用与数据大小无关。
+# 每次调用开销对比：python3 -m Utils.handle_codec
+
+import base64
+import binascii
+import hashlib
+from typing import BinaryIO, Iterable, List, Optional, Union
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+# 流式编码每次读取 3 的倍数字节（编码结果不产生中间填充），解码每次处理 4 的倍数个字符
+STREAM_ENCODE_CHUNK = 3 * 64 * 1024
+STREAM_DECODE_CHUNK = 4 * 64 * 1024
+
+# 流式解码时忽略的空白（按行折叠的 Base64 文件）
+_WHITESPACE = b" \t\r\n"
+
+
+def _as_bytes(data) -> BytesLike:
+    return data.encode("utf-8") if isinstance(data, str) else data
+
+
+# ---------------- 单个 ----------------
+def b64encode(data: BytesLike) -> bytes:
+    """标准 Base64 编码（无换行）"""
+    return binascii.b2a_base64(_as_bytes(data), newline=False)
+
+
+def b64decode(data: BytesLike) -> bytes:
+    """严格 Base64 解码（base64.b64decode(validate=True)），非法输入抛出 binascii.Error"""
+    return base64.b64decode(_as_bytes(data), validate=True)
+
+
+def md5_digest(data: BytesLike) -> bytes:
+    return hashlib.md5(_as_bytes(data)).digest()
+
+
+def md5_hex(data: BytesLike) -> str:
+    return hashlib.md5(_as_bytes(data)).hexdigest()
+
+
+# ---------------- 批量 ----------------
+def b64encode_many(payloads: Iterable[BytesLike]) -> List[bytes]:
+    b2a = binascii.b2a_base64
+    return [b2a(_as_bytes(data), newline=False) for data in payloads]
+
+
+def b64decode_many(payloads: Iterable[BytesLike], strict: bool = True) -> List[Optional[bytes]]:
+    """
+    批量解码，结果顺序与输入一致。
+    strict=True 时遇到非法输入抛出 binascii.Error；False 时该位置为 None，其余照常解码
+    """
+    # binascii.a2b_base64 的 strict_mode 需要 3.11+，这里用 validate=True 保持与 3.10 兼容
+    decode = base64.b64decode
+    if strict:
+        return [decode(_as_bytes(data), validate=True) for data in payloads]
+    results = []
+    for data in payloads:
+        try:
+            results.append(decode(_as_bytes(data), validate=True))
+        except binascii.Error:
+            results.append(None)
+    return results
+
+
+def md5_hex_many(payloads: Iterable[BytesLike]) -> List[str]:
+    md5 = hashlib.md5
+    return [md5(_as_bytes(data)).hexdigest() for data in payloads]
+
+
+# ---------------- 流式 ----------------
+def b64encode_stream(src: BinaryIO, dst: BinaryIO, chunk_size: int = STREAM_ENCODE_CHUNK) -> int:
+    """从 src 读取原始字节，Base64 编码后写入 dst（无换行），返回写入的字节数"""
+    chunk_size -= chunk_size % 3
+    buffer = bytearray(chunk_size)
+    written = 0
+    with memoryview(buffer) as view:
+        while True:
+            # 读满一个缓冲区再编码，保证中间块长度是 3 的倍数
+            filled = 0
+            while filled < chunk_size:
+                read = src.readinto(view[filled:])
+                if not read:
+                    break
+                filled += read
+            if not filled:
+                break
+            written += dst.write(binascii.b2a_base64(view[:filled], newline=False))
+            if filled < chunk_size:
+                break
+    return written
+
+
+def b64decode_stream(src: BinaryIO, dst: BinaryIO, chunk_size: int = STREAM_DECODE_CHUNK) -> int:
+    """从 src 读取 Base64 文本（允许换行），解码后写入 dst，返回写入的字节数；非法输入抛出 binascii.Error"""
+    chunk_size -= chunk_size % 4
+    pending = b""
+    written = 0
+    padded = False
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        data = pending + chunk.translate(None, _WHITESPACE)
+        # 填充符只能出现在最后一组：上一块以 = 结尾时后面不能再有数据（与 b64decode 一致）
+        if padded and data:
+            raise binascii.Error("Base64 填充符之后仍有数据")
+        usable = len(data) - len(data) % 4
+        block = data[:usable]
+        written += dst.write(base64.b64decode(block, validate=True))
+        padded = block.endswith(b"=")
+        pending = data[usable:]
+    if pending:
+        raise binascii.Error(f"Base64 数据长度不是 4 的倍数（剩余 {len(pending)} 个字符）")
+    return written
+
+
+if __name__ == '__main__':
+    # 每次调用开销：状态元组接口 vs bytes 接口 vs 批量接口
+    import timeit
+
+    from Utils.handle_base64 import Base64Utils, MD5Utils
+
+    text = "sysOrderNo=P2025102000000001&amount=10000&state=2"
+    raw = text.encode("utf-8")
+    encoded_text = Base64Utils.encode(text)[1]
+    encoded = encoded_text.encode("ascii")
+    batch_raw = [raw] * 1000
+    batch_encoded = [encoded] * 1000
+    number = 200000
+
+    def report(name, statement):
+        seconds = min(timeit.repeat(statement, number=number, repeat=3))
+        print(f"{name:<36}{seconds / number * 1e9:>8.0f} ns/次")
+
+    report("Base64Utils.encode(str)", lambda: Base64Utils.encode(text))
+    report("b64encode(bytes)", lambda: b64encode(raw))
+    report("Base64Utils.decode(str)", lambda: Base64Utils.decode(encoded_text))
+    report("b64decode(bytes)", lambda: b64decode(encoded))
+    report("MD5Utils.md5_string(str)", lambda: MD5Utils.md5_string(text))
+    report("md5_hex(bytes)", lambda: md5_hex(raw))
+
+    batch_number = number // 1000
+    for name, func, payloads in (("b64encode_many", b64encode_many, batch_raw),
+                                 ("b64decode_many", b64decode_many, batch_encoded),
+                                 ("md5_hex_many", md5_hex_many, batch_raw)):
+        seconds = min(timeit.repeat(lambda: func(payloads), number=batch_number, repeat=3))
+        print(f"{name + '（1000 个/批）':<36}{seconds / batch_number / 1000 * 1e9:>8.0f} ns/个")
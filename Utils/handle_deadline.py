@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : handle_deadline.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 请求级截止时间：中间件按路由预算写入 contextvar，MySQL/Redis/Telegram 调用据此限时
+#
+# 上游支付网关等待回调响应有超时，超时后会重试；请求已经超时还继续查库、发消息只会增加负载。
+# 截止时间只在本请求（及其 await 链）内可见，后台任务（shutdown_coordinator.spawn）不继承。
+
+import asyncio
+import contextvars
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+
+class DeadlineExceeded(RuntimeError):
+    """请求截止时间已过，后续依赖调用不再执行"""
+
+
+class Deadline:
+    __slots__ = ("route", "budget", "expires_at")
+
+    def __init__(self, route: str, budget: float):
+        self.route = route
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+
+current_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineStats:
+    """按路由统计超时次数：exceeded 为依赖调用因截止时间被中止，cancelled 为整个请求被强制取消"""
+
+    def __init__(self):
+        self.exceeded: Dict[str, int] = defaultdict(int)
+        self.cancelled: Dict[str, int] = defaultdict(int)
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        return {"exceeded": dict(self.exceeded), "cancelled": dict(self.cancelled)}
+
+
+deadline_stats = DeadlineStats()
+
+
+def remaining() -> Optional[float]:
+    """本请求剩余时间（秒）；不在请求上下文中返回 None"""
+    deadline = current_deadline.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def deadline_exceeded(what: str) -> DeadlineExceeded:
+    deadline = current_deadline.get()
+    route = deadline.route if deadline else "-"
+    deadline_stats.exceeded[route] += 1
+    logger.warning(f"请求 {route} 超过截止时间（{deadline.budget if deadline else '-'} 秒），中止 {what}，"
+                   f"累计 {deadline_stats.exceeded[route]} 次")
+    return DeadlineExceeded(f"{route} deadline exceeded at {what}")
+
+
+def bound_timeout(timeout: float, what: str) -> Tuple[float, bool]:
+    """
+    合并调用自身超时与请求剩余时间，返回 (生效超时, 是否由截止时间决定)。
+    生效超时为 0 表示不限时；截止时间已过直接抛出 DeadlineExceeded。
+    """
+    left = remaining()
+    if left is None:
+        return timeout, False
+    if left <= 0:
+        raise deadline_exceeded(what)
+    if timeout and timeout <= left:
+        return timeout, False
+    return left, True
+
+
+async def with_deadline(awaitable, what: str):
+    """在请求剩余时间内等待 awaitable，超时取消并抛出 DeadlineExceeded；无截止时间时直接等待"""
+    try:
+        timeout, _ = bound_timeout(0, what)
+    except DeadlineExceeded:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise
+    if not timeout:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise deadline_exceeded(what) from None
+
+
+def detached_context() -> contextvars.Context:
+    """复制当前上下文并清除截止时间，供请求内创建的后台任务使用"""
+    context = contextvars.copy_context()
+    context.run(current_deadline.set, None)
+    return context
+
+
+def parse_route_budgets(value: str) -> Dict[str, float]:
+    """'/a=8,/b/=0' -> {'/a': 8.0, '/b/': 0.0}；以 / 结尾的项按前缀匹配"""
+    budgets = {}
+    for item in (value or "").split(","):
+        path, sep, seconds = item.strip().rpartition("=")
+        if sep and path:
+            budgets[path] = float(seconds)
+    return budgets
+
+
+class DeadlineMiddleware:
+    """
+    纯 ASGI 中间件：
+    - 按路由预算设置截止时间（预算为 0 的路由不限时，如 SSE 长连接）
+    - 依赖调用在截止时间内主动中止（DeadlineExceeded）；grace 秒后仍未结束的请求整体取消，
+      尚未开始响应的返回 504
+    """
+
+    def __init__(self, app: ASGIApp, default_budget: float, routes: Dict[str, float], grace: float = 0.5):
+        self.app = app
+        self.default_budget = default_budget
+        self.exact = {path: budget for path, budget in routes.items() if not path.endswith("/")}
+        self.prefixes = sorted(((path, budget) for path, budget in routes.items() if path.endswith("/")),
+                               key=lambda item: len(item[0]), reverse=True)
+        self.grace = grace
+
+    def budget_for(self, path: str) -> float:
+        if path in self.exact:
+            return self.exact[path]
+        for prefix, budget in self.prefixes:
+            if path.startswith(prefix):
+                return budget
+        return self.default_budget
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        budget = self.budget_for(path)
+        if budget <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        # 兜底取消：到期后取消当前任务（兼容 Python 3.10，不使用 asyncio.timeout）
+        task = asyncio.current_task()
+        expired = False
+
+        def expire():
+            nonlocal expired
+            expired = True
+            task.cancel()
+
+        token = current_deadline.set(Deadline(path, budget))
+        backstop = asyncio.get_running_loop().call_later(budget + self.grace, expire)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except asyncio.CancelledError:
+            if not expired:
+                raise
+            # 3.11+ 需要撤销本次取消计数，否则之后的 asyncio.timeout / TaskGroup 会误判
+            if hasattr(task, "uncancel"):
+                task.uncancel()
+            deadline_stats.cancelled[path] += 1
+            logger.error(f"请求 {path} 超过截止时间 {budget} 秒，已取消，累计 {deadline_stats.cancelled[path]} 次")
+            if not response_started:
+                response = PlainTextResponse("deadline exceeded", status_code=504)
+                await response(scope, receive, send)
+        finally:
+            backstop.cancel()
+            current_deadline.reset(token)
+
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : handle_filehash.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 批量文件哈希（日志归档、导出报表指纹）：大缓冲区读取，多个算法一次读完，多文件线程池并行
+#
+# hashlib 对超过 2 KB 的数据计算时会释放 GIL，所以用线程池即可多核并行；
+# 每个线程复用一个 1 MB 缓冲区（readinto，不为每块分配新 bytes），MD5 与 SHA-256 在同一次读取中计算。
+# 只算一种算法时使用 hashlib.file_digest（Python 3.11+）。
+# use_mmap=True 时改为 mmap 映射整个文件，省去一次内核到用户态的拷贝；
+# 但文件在哈希期间被截断会导致进程收到 SIGBUS，只对不会再写入的归档文件使用。
+
+import asyncio
+import hashlib
+import mmap
+import os
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence
+
+BUFFER_SIZE = 1024 * 1024
+
+# 小于该大小的文件不做 mmap（映射的开销大于拷贝）
+MMAP_MIN_SIZE = 4 * 1024 * 1024
+
+
+_local = threading.local()
+
+
+def _thread_buffer() -> bytearray:
+    """每个线程复用一个读取缓冲区"""
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None:
+        buffer = _local.buffer = bytearray(BUFFER_SIZE)
+    return buffer
+
+
+class FileDigest:
+    """
+    单个文件的哈希结果：ok 为 True 时 digests 为 {算法: 十六进制摘要}，
+    否则 error_code（FILE_NOT_FOUND / NOT_A_FILE / PERMISSION_DENIED / FILE_READ_ERROR）与 error 说明原因
+    """
+
+    __slots__ = ("path", "size", "digests", "error_code", "error")
+
+    def __init__(self, path: str, size: int = 0, digests: Optional[Dict[str, str]] = None,
+                 error_code: Optional[str] = None, error: Optional[str] = None):
+        self.path = path
+        self.size = size
+        self.digests = digests or {}
+        self.error_code = error_code
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error_code is None
+
+    def __getitem__(self, algorithm: str) -> str:
+        return self.digests[algorithm]
+
+    def to_dict(self) -> Dict:
+        return {"path": self.path, "size": self.size, "digests": self.digests,
+                "error_code": self.error_code, "error": self.error}
+
+    def __repr__(self):
+        if self.ok:
+            return f"FileDigest({self.path!r}, size={self.size}, {self.digests})"
+        return f"FileDigest({self.path!r}, {self.error_code}: {self.error})"
+
+
+def _update_all(hashers, data):
+    for hasher in hashers:
+        hasher.update(data)
+
+
+def _digest_stream(f, size: int, algorithms: Sequence[str], buffer: bytearray, use_mmap: bool):
+    if use_mmap and size >= MMAP_MIN_SIZE:
+        hashers = [hashlib.new(algorithm) for algorithm in algorithms]
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, "madvise"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            with memoryview(mapped) as view:
+                for offset in range(0, len(mapped), len(buffer)):
+                    with view[offset:offset + len(buffer)] as chunk:
+                        _update_all(hashers, chunk)
+        return hashers
+
+    if len(algorithms) == 1 and hasattr(hashlib, "file_digest"):
+        return [hashlib.file_digest(f, algorithms[0])]
+
+    hashers = [hashlib.new(algorithm) for algorithm in algorithms]
+    with memoryview(buffer) as view:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            with view[:read] as chunk:
+                _update_all(hashers, chunk)
+    return hashers
+
+
+def hash_file(path: str, algorithms: Sequence[str] = ("md5",), use_mmap: bool = False) -> FileDigest:
+    """计算单个文件的一个或多个摘要，出错时返回带 error_code 的结果而不抛异常"""
+    try:
+        with open(path, "rb") as f:
+            info = os.fstat(f.fileno())
+            if not stat.S_ISREG(info.st_mode):
+                return FileDigest(path, error_code="NOT_A_FILE", error=f"'{path}' 不是普通文件")
+            hashers = _digest_stream(f, info.st_size, algorithms, _thread_buffer(), use_mmap)
+        return FileDigest(path, info.st_size, {name: hasher.hexdigest() for name, hasher in zip(algorithms, hashers)})
+    except FileNotFoundError:
+        return FileDigest(path, error_code="FILE_NOT_FOUND", error=f"文件 '{path}' 不存在")
+    except IsADirectoryError:
+        return FileDigest(path, error_code="NOT_A_FILE", error=f"'{path}' 是目录而非文件")
+    except PermissionError:
+        return FileDigest(path, error_code="PERMISSION_DENIED", error=f"没有读取文件 '{path}' 的权限")
+    except OSError as e:
+        return FileDigest(path, error_code="FILE_READ_ERROR", error=f"读取文件时发生I/O错误: {e}")
+
+
+def hash_files(paths: Iterable[str], algorithms: Sequence[str] = ("md5",), max_workers: Optional[int] = None,
+               use_mmap: bool = False) -> List[FileDigest]:
+    """
+    批量计算文件摘要，结果顺序与 paths 一致。
+    :param algorithms: hashlib 支持的算法名，如 ("md5", "sha256")，一次读取同时计算
+    :param max_workers: 线程数，默认 min(文件数, CPU 数)
+    """
+    paths = list(paths)
+    algorithms = tuple(algorithm.lower() for algorithm in algorithms)
+    for algorithm in algorithms:
+        # 算法名错误直接抛 ValueError，不当作单个文件的错误
+        hashlib.new(algorithm)
+    if not paths:
+        return []
+    workers = max(1, min(len(paths), max_workers or os.cpu_count() or 1))
+    if workers == 1:
+        return [hash_file(path, algorithms, use_mmap) for path in paths]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="file-hash") as executor:
+        return list(executor.map(lambda path: hash_file(path, algorithms, use_mmap), paths))
+
+
+async def hash_files_async(paths: Iterable[str], algorithms: Sequence[str] = ("md5",),
+                           max_workers: Optional[int] = None, use_mmap: bool = False) -> List[FileDigest]:
+    """协程中使用：整个批量计算放到线程中执行，不阻塞事件循环"""
+    return await asyncio.to_thread(hash_files, list(paths), algorithms, max_workers, use_mmap)
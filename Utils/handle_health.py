@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : handle_health.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 依赖健康探测：后台定时探测 MySQL / Redis / 调度器 / Telegram 线程，健康检查接口只读缓存结果
+#
+# 负载均衡器的高频探测不再触达数据库：探测由每个 worker 的后台任务每 health.interval 秒执行一次，
+# 结果（含预先序列化好的响应体）缓存在内存，接口直接返回，不查库、不写日志。
+# critical 探测连续失败 health.failure_threshold 次时整体为 down（健康检查返回 503），
+# 之前以及非关键探测失败时为 degraded（仍返回 200），避免一次偶发超时就让 worker 退出负载均衡；
+# 从未成功过的 critical 探测（如启动时数据库不可达）首次失败即为 down。
+# 最近一次探测超过 3 个间隔未完成（探测任务卡住或已退出）同样视为 down。
+
+import asyncio
+import json
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from Config.config_loader import public_config
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+STATUS_OK = "ok"
+STATUS_DEGRADED = "degraded"
+STATUS_DOWN = "down"
+
+
+class HealthMonitor:
+    def __init__(self, interval: float = 5, probe_timeout: float = 2, failure_threshold: int = 3):
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.failure_threshold = max(1, failure_threshold)
+        # (名称, 探测函数, 是否关键)；探测函数返回附加信息字典或 None，失败时抛异常
+        self._probes: List[Tuple[str, Callable[[], Awaitable[Optional[Dict]]], bool]] = []
+        self.results: Dict[str, Dict] = {}
+        self.status = STATUS_DOWN
+        self.checked_at: Optional[float] = None
+        self._checked_monotonic = 0.0
+        self._body = json.dumps({"status": STATUS_DOWN, "checks": {}}).encode()
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, probe: Callable[[], Awaitable[Optional[Dict]]], critical: bool = True):
+        self._probes.append((name, probe, critical))
+
+    async def _probe(self, name: str, probe: Callable[[], Awaitable[Optional[Dict]]], critical: bool) -> Dict:
+        started = time.perf_counter()
+        try:
+            details = await asyncio.wait_for(probe(), self.probe_timeout)
+            result = {"ok": True, **(details or {})}
+        except asyncio.TimeoutError:
+            result = {"ok": False, "error": f"探测超时（{self.probe_timeout} 秒）"}
+        except Exception as err:
+            result = {"ok": False, "error": repr(err)}
+        result["critical"] = critical
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        previous = self.results.get(name)
+        # 连续失败次数；从未探测过的按已达阈值计
+        if result["ok"]:
+            result["failures"] = 0
+        else:
+            result["failures"] = previous["failures"] + 1 if previous is not None else self.failure_threshold
+        # 只在状态变化时记录日志
+        if previous is None or previous["ok"] != result["ok"]:
+            if result["ok"]:
+                logger.info(f"健康探测 {name}: 正常")
+            else:
+                logger.error(f"健康探测 {name}: 异常 {result['error']}")
+        return result
+
+    async def check(self):
+        """执行一轮探测并更新缓存"""
+        results = await asyncio.gather(*[self._probe(name, probe, critical) for name, probe, critical in self._probes])
+        self.results = {name: result for (name, _, _), result in zip(self._probes, results)}
+        if any(result["critical"] and result["failures"] >= self.failure_threshold for result in results):
+            self.status = STATUS_DOWN
+        elif any(not result["ok"] for result in results):
+            self.status = STATUS_DEGRADED
+        else:
+            self.status = STATUS_OK
+        self.checked_at = time.time()
+        self._checked_monotonic = time.monotonic()
+        self._body = json.dumps({"status": self.status, "pid": os.getpid(), "checked_at": round(self.checked_at, 3),
+                                 "checks": self.results}, ensure_ascii=False).encode()
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                logger.exception(f"健康探测执行失败: {err}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        """立即探测一次（启动完成时即有结果），之后后台定时探测"""
+        await self.check()
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(), name="health-monitor")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    # ---------------- 读取（纯内存） ----------------
+    @property
+    def stale(self) -> bool:
+        return time.monotonic() - self._checked_monotonic > self.interval * 3 + self.probe_timeout
+
+    @property
+    def healthy(self) -> bool:
+        """关键依赖正常且结果未过期"""
+        return self.status != STATUS_DOWN and not self.stale
+
+    def body(self) -> bytes:
+        """最近一次探测结果的 JSON（预先序列化）"""
+        return self._body
+
+    def prometheus(self, labels: str = "") -> List[str]:
+        prefix = f"{labels}," if labels else ""
+        lines = ["# TYPE notify_health_check_up gauge"]
+        for name, result in self.results.items():
+            lines.append(f'notify_health_check_up{{{prefix}check="{name}"}} {1 if result["ok"] else 0}')
+        lines.append("# TYPE notify_health_check_latency_seconds gauge")
+        for name, result in self.results.items():
+            lines.append(f'notify_health_check_latency_seconds{{{prefix}check="{name}"}} '
+                         f'{result["latency_ms"] / 1000:.6f}')
+        return lines
+
+
+health_monitor = HealthMonitor(
+    interval=public_config.get(key="health.interval", get_type=float, default=5),
+    probe_timeout=public_config.get(key="health.probe_timeout", get_type=float, default=2),
+    failure_threshold=public_config.get(key="health.failure_threshold", get_type=int, default=3),
+)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : handle_loop_monitor.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 事件循环延迟监控与阻塞调用检测
+#
+# - 心跳协程每 interval 秒 sleep 一次，实际唤醒时间与预期之差即事件循环延迟（lag），记入直方图
+# - 看门狗线程检查心跳，超过 threshold 秒未跳动说明事件循环被同步调用卡住，
+#   此时直接抓取事件循环线程的调用栈与当前 Task，定位到具体的阻塞代码
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from Config.config_loader import public_config
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+# 延迟直方图分桶（秒）
+LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1, cooldown: float = 60, history: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self.lag_sum = 0.0
+        self.lag_count = 0
+        self.bucket_counts = [0] * len(LAG_BUCKETS)
+        self.stall_count = 0
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._beat = time.monotonic()
+        self._beat_seq = 0
+        self._pending: Optional[Dict[str, Any]] = None
+        self._logged_at: Dict[str, float] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ---------------- 心跳（事件循环内） ----------------
+    def _observe(self, lag: float):
+        self.lag_last = lag
+        self.lag_max = max(self.lag_max, lag)
+        self.lag_sum += lag
+        self.lag_count += 1
+        for index, bound in enumerate(LAG_BUCKETS):
+            if lag <= bound:
+                self.bucket_counts[index] += 1
+                break
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            self._beat_seq += 1
+            lag = max(0.0, now - expected)
+            self._observe(lag)
+            stall, self._pending = self._pending, None
+            if stall is not None:
+                stall["lag"] = round(lag, 4)
+                self._report(stall)
+
+    def _report(self, stall: Dict[str, Any]):
+        self.stall_count += 1
+        self.stalls.append(stall)
+        # 同一位置的阻塞在 cooldown 内只打印一次调用栈，避免刷屏
+        signature = stall["stack"][-1] if stall["stack"] else ""
+        now = time.monotonic()
+        if now - self._logged_at.get(signature, -self.cooldown) < self.cooldown:
+            return
+        self._logged_at[signature] = now
+        logger.warning(f"事件循环阻塞 {stall['lag'] * 1000:.0f} ms，Task={stall['task']}，阻塞位置：\n"
+                       + "".join(stall["stack"]))
+
+    # ---------------- 看门狗（独立线程） ----------------
+    def _capture(self) -> Dict[str, Any]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame) if frame is not None else []
+        task = asyncio.current_task(self._loop)
+        return {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "task": task.get_name() if task is not None else None,
+            "coro": getattr(task.get_coro(), "__qualname__", None) if task is not None else None,
+            "stack": stack[-20:],
+        }
+
+    def _watch(self):
+        captured_seq = -1
+        while not self._stop.wait(self.threshold / 2):
+            seq = self._beat_seq
+            if seq == captured_seq:
+                continue
+            if time.monotonic() - self._beat > self.interval + self.threshold:
+                # 事件循环线程此刻正卡在同步调用里，抓到的栈就是阻塞点；心跳恢复后补上实际延迟并上报
+                self._pending = self._capture()
+                captured_seq = seq
+
+    # ---------------- 生命周期 ----------------
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name="loop-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"事件循环监控已启动，间隔 {self.interval}s，阻塞阈值 {self.threshold}s")
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    # ---------------- 指标 ----------------
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "lag_last": round(self.lag_last, 4),
+            "lag_max": round(self.lag_max, 4),
+            "lag_avg": round(self.lag_sum / self.lag_count, 4) if self.lag_count else 0.0,
+            "stalls": self.stall_count,
+        }
+
+    def prometheus(self, labels: str = "") -> List[str]:
+        """Prometheus 文本格式：延迟直方图、最近一次延迟、阻塞次数"""
+        prefix = f"{labels}," if labels else ""
+        lines = ["# TYPE notify_loop_lag_seconds histogram"]
+        cumulative = 0
+        for bound, count in zip(LAG_BUCKETS, self.bucket_counts):
+            cumulative += count
+            lines.append(f'notify_loop_lag_seconds_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines += [
+            f'notify_loop_lag_seconds_bucket{{{prefix}le="+Inf"}} {self.lag_count}',
+            f"notify_loop_lag_seconds_sum{{{labels}}} {self.lag_sum:.6f}",
+            f"notify_loop_lag_seconds_count{{{labels}}} {self.lag_count}",
+            "# TYPE notify_loop_lag_last_seconds gauge",
+            f"notify_loop_lag_last_seconds{{{labels}}} {self.lag_last:.6f}",
+            "# TYPE notify_loop_stalls_total counter",
+            f"notify_loop_stalls_total{{{labels}}} {self.stall_count}",
+        ]
+        return lines
+
+
+loop_monitor = LoopMonitor(
+    interval=public_config.get(key="loop_monitor.interval", get_type=float, default=0.05),
+    threshold=public_config.get(key="loop_monitor.threshold", get_type=float, default=0.1),
+    cooldown=public_config.get(key="loop_monitor.cooldown", get_type=float, default=60),
+)
@@ -7,6 +7,9 @@ from fastapi import Response
 
 from passlib.context import CryptContext  # pip install bcrypt==4.0.1
 
+from Utils.handle_password import password_service
+from Utils.handle_filehash import hash_file
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 success = Response(content="success", media_type="text/plain")
@@ -14,6 +17,7 @@ ok = Response(content="ok", media_type="text/plain")
 
 
 def get_uuid():
+    # 随机值，不递增；需要作为主键/订单号时使用 Utils.handle_snowflake.order_id_generator
     return os.urandom(16).hex()
 
 
@@ -171,46 +175,18 @@ def get_file_md5_str(file: str) -> str:
 
     返回:
         str: 文件的 MD5 哈希值（十六进制字符串）
-        或 None: 如果计算过程中出错
+        或 "错误: ..." 字符串: 如果计算过程中出错
 
     可能出现的错误:
         - 文件不存在
         - 权限不足
         - 路径是目录而非文件
         - 磁盘读取错误
-        - 内存不足（对于极大文件）
-    """
-    # 检查文件是否存在
-    if not os.path.exists(file):
-        return f"错误: 文件 '{file}' 不存在"
-
-    # 检查是否为文件（而非目录）
-    if not os.path.isfile(file):
-        return f"错误: '{file}' 是目录而非文件"
-
-    # 检查是否有读取权限
-    if not os.access(file, os.R_OK):
-        return f"错误: 没有读取文件 '{file}' 的权限"
-
-    try:
-        md5_hash = hashlib.md5()
-        with open(file, "rb") as f:
-            # 分块读取文件，避免大文件内存占用
-            for chunk in iter(lambda: f.read(4096), b""):
-                md5_hash.update(chunk)
-        return md5_hash.hexdigest()
-
-    except PermissionError:
-        return f"错误: 没有读取文件 '{file}' 的权限"
-
-    except IOError as e:
-        return f"错误: 读取文件时发生I/O错误: {e}"
 
-    except MemoryError:
-        return f"错误: 内存不足，无法处理大文件 '{file}'"
-
-    except Exception as e:
-        return f"错误: 计算MD5时发生未知错误: {e}"
+    批量计算、SHA-256 与结构化结果请使用 Utils.handle_filehash.hash_files
+    """
+    result = hash_file(file, ("md5",))
+    return result.digests["md5"] if result.ok else f"错误: {result.error}"
 
 
 def verify_hash_password(plain_password: str, hashed_password: str) -> bool:
@@ -221,6 +197,15 @@ def get_hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 
+# 以上两个同步函数每次调用占用 100~300 ms CPU，只用于脚本；协程中请使用下面的异步版本（在密码进程池中执行）
+async def verify_hash_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_service.verify(plain_password, hashed_password)
+
+
+async def get_hash_password_async(password: str) -> str:
+    return await password_service.hash(password)
+
+
 # 使用示例
 # file_path = "E:\\FastAPI\\fastapi.service"  # 替换为你的文件路径
 # md5_value = get_file_md5_str(file_path)
@@ -270,6 +255,7 @@ def create_signature(data: dict, secret_key: str) -> str:
 
 
 def get_str_current_time_number(test=False):
+    # 多 worker 同一微秒会重复；新订单号请使用 order_id_generator.next_id_str()
     try:
         now_time = datetime.datetime.now()
         temp_str = (str(now_time.year).rjust(4, "0") +
@@ -288,8 +274,9 @@ def get_str_current_time_number(test=False):
         print(f"获取当前时间字符串失败: {err}")
         return None
 
-print(get_hash_password('helong'))
-print(get_str_current_time_number())
+
+# print(get_hash_password('helong'))
+# print(get_str_current_time_number())
 # 密钥
 # my_secret = 'your_secure_secret_key'
 #
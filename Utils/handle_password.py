@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : handle_password.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 异步密码服务：bcrypt 哈希/校验放到独立进程池执行，不占用事件循环与 worker 的 GIL
+#
+# bcrypt 单次 100~300 ms CPU，在协程里直接调用会卡住整个 worker（所有回调一起变慢）；
+# 放到线程池也会和回调处理争抢 GIL。这里使用 spawn 启动的进程池：
+#   - 进程数（password.processes）与并发上限（password.max_concurrent）都有限制，子进程降低调度优先级
+#   - 等待队列超过 password.max_queue 直接拒绝（PasswordServiceBusy），不无限堆积
+#   - 批量校验按进程数切块提交，减少进程间通信次数
+
+import asyncio
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+import bcrypt
+
+from Config.config_loader import public_config
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+
+class PasswordServiceBusy(RuntimeError):
+    """等待中的密码任务过多"""
+
+
+# ---------------- 子进程中执行的函数（模块级，可被 pickle） ----------------
+def _init_process(nice: int):
+    if nice and hasattr(os, "nice"):
+        os.nice(nice)
+
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))
+    except ValueError:
+        # 哈希格式不正确视为校验失败
+        return False
+
+
+def _verify_chunk(pairs: List[Tuple[str, str]]) -> List[bool]:
+    return [_verify(password, hashed_password) for password, hashed_password in pairs]
+
+
+class PasswordService:
+    def __init__(self, processes: int = 1, max_concurrent: int = 2, max_queue: int = 100, rounds: int = 12,
+                 nice: int = 10):
+        self.processes = processes
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self.nice = nice
+        self.waiting = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.seconds_sum = 0.0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # 首次使用时才创建：避免导入时（以及 gunicorn 主进程中）启动子进程
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process,
+                initargs=(self.nice,),
+            )
+            logger.info(f"密码进程池已创建，进程数 {self.processes}，并发上限 {self.max_concurrent}")
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise PasswordServiceBusy(f"密码任务排队已达上限 {self.max_queue}")
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self.seconds_sum += time.perf_counter() - started
+            self._semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password, self.rounds)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(_verify, password, hashed_password)
+
+    async def verify_many(self, pairs: Sequence[Tuple[str, str]]) -> List[bool]:
+        """批量校验 [(明文, 哈希), ...]，结果顺序与输入一致；按进程数切块并行"""
+        if not pairs:
+            return []
+        pairs = list(pairs)
+        size = math.ceil(len(pairs) / self.processes)
+        chunks = [pairs[i:i + size] for i in range(0, len(pairs), size)]
+        results = await asyncio.gather(*[self._run(_verify_chunk, chunk) for chunk in chunks])
+        return [ok for chunk in results for ok in chunk]
+
+    async def close(self):
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+            logger.info("密码进程池已关闭")
+
+    def prometheus(self, labels: str = "") -> List[str]:
+        return [
+            "# TYPE notify_password_queue_depth gauge",
+            f"notify_password_queue_depth{{{labels}}} {self.waiting}",
+            "# TYPE notify_password_in_flight gauge",
+            f"notify_password_in_flight{{{labels}}} {self.in_flight}",
+            "# TYPE notify_password_completed_total counter",
+            f"notify_password_completed_total{{{labels}}} {self.completed}",
+            "# TYPE notify_password_rejected_total counter",
+            f"notify_password_rejected_total{{{labels}}} {self.rejected}",
+            "# TYPE notify_password_seconds_sum counter",
+            f"notify_password_seconds_sum{{{labels}}} {self.seconds_sum:.6f}",
+        ]
+
+
+password_service = PasswordService(
+    processes=public_config.get(key="password.processes", get_type=int, default=1),
+    max_concurrent=public_config.get(key="password.max_concurrent", get_type=int, default=2),
+    max_queue=public_config.get(key="password.max_queue", get_type=int, default=100),
+    rounds=public_config.get(key="password.rounds", get_type=int, default=12),
+)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : handle_profiler.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 运行中 worker 的采样分析器：后台线程定时读取各线程调用栈，输出火焰图可用的 collapsed 格式
+#
+# 不需要重启、不需要 profiler 包装启动，开销只有每个采样周期一次 sys._current_frames()。
+# 输出每行为 "线程;最外层帧;...;最内层帧 次数"，可直接交给 flamegraph.pl / speedscope 渲染。
+# 采样线程需要拿到 GIL 才能采样，事件循环频繁进出 select 时，select 帧的占比会偏高；
+# CPU 密集或阻塞的调用（持有 GIL 超过切换间隔）能正常采到，找热点足够用。
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STDLIB_ROOT = os.path.dirname(os.__file__)
+# pyTelegramBotAPI 的轮询线程与处理线程名称；start_bot 启动的线程名为 telegram-bot
+TELEGRAM_THREAD_PREFIXES = ("telegram-bot", "PollingThread", "WorkerThread")
+
+
+class ProfilerBusy(RuntimeError):
+    """同一 worker 同时只允许一个采样任务"""
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(PROJECT_ROOT):
+        filename = os.path.relpath(filename, PROJECT_ROOT)
+    elif "site-packages" in filename:
+        # 第三方库只保留 site-packages 之后的路径
+        filename = filename.rsplit("site-packages" + os.sep, 1)[-1]
+    elif filename.startswith(STDLIB_ROOT):
+        filename = os.path.relpath(filename, STDLIB_ROOT)
+    return f"{code.co_name} ({filename})"
+
+
+class StackSampler:
+    """
+    在独立线程中按 interval 采样指定线程的调用栈并计数。
+    threads: "loop"（事件循环线程）、"telegram"（机器人线程）、"all"（全部线程）的组合
+    """
+
+    def __init__(self, loop_thread_id: int, threads: Iterable[str] = ("loop", "telegram"), interval: float = 0.01,
+                 max_depth: int = 128):
+        self.loop_thread_id = loop_thread_id
+        self.threads = set(threads)
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _targets(self) -> Dict[int, str]:
+        own = threading.get_ident()
+        targets = {}
+        for thread in threading.enumerate():
+            if thread.ident is None or thread.ident == own:
+                continue
+            if thread.ident == self.loop_thread_id:
+                if "loop" in self.threads or "all" in self.threads:
+                    targets[thread.ident] = "event-loop"
+            elif "all" in self.threads or (
+                    "telegram" in self.threads and thread.name.startswith(TELEGRAM_THREAD_PREFIXES)):
+                targets[thread.ident] = thread.name
+        return targets
+
+    def _sample_once(self, targets: Dict[int, str]):
+        frames = sys._current_frames()
+        for ident, name in targets.items():
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None and len(labels) < self.max_depth:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            labels.append(name)
+            labels.reverse()
+            self.stacks[";".join(labels)] += 1
+        self.samples += 1
+
+    def _run(self):
+        targets = self._targets()
+        refresh_at = time.monotonic() + 1
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= refresh_at:
+                # 线程会新建/退出（例如 to_thread 线程池），每秒刷新一次目标线程
+                targets = self._targets()
+                refresh_at = now + 1
+            self._sample_once(targets)
+            next_at += self.interval
+            self._stop.wait(max(0.0, next_at - time.monotonic()))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        """flamegraph collapsed 格式，按次数降序"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+_profile_lock = threading.Lock()
+
+
+async def sample(seconds: float, threads: Iterable[str] = ("loop", "telegram"), interval: float = 0.01) -> StackSampler:
+    """
+    在事件循环中调用：采样 seconds 秒后返回采样器（collapsed() 取结果）。
+    同一 worker 已有采样在进行时抛出 ProfilerBusy
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("已有采样任务在运行")
+    try:
+        sampler = StackSampler(threading.get_ident(), threads, interval)
+        logger.info(f"开始采样 pid={os.getpid()} 线程={sorted(sampler.threads)} 时长={seconds}s "
+                    f"间隔={interval * 1000:.0f}ms")
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+    finally:
+        _profile_lock.release()
+    logger.info(f"采样结束 pid={os.getpid()} 样本 {sampler.samples} 次，不同调用栈 {len(sampler.stacks)} 个")
+    return sampler
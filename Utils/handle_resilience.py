@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : handle_resilience.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 外部依赖保护：熔断器（滚动窗口错误率）+ 舱壁（并发上限）+ 调用超时
+#
+# 依赖变慢或不可用时：
+#   - 熔断器打开后直接抛出 CircuitOpenError，不再等待驱动超时（微秒级失败）
+#   - 舱壁限制同一依赖的并发数，满了立即（或短暂等待后）抛出 BulkheadFullError，不会把所有请求都拖进去
+#   - 调用方捕获 DependencyUnavailable 走降级逻辑：跳过缓存、延迟告警等
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Tuple, Type
+
+from Config.config_loader import public_config
+from Utils.handle_deadline import DeadlineExceeded, bound_timeout, deadline_exceeded
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+
+class DependencyUnavailable(RuntimeError):
+    """依赖当前不可用（熔断或舱壁已满），调用方应走降级逻辑"""
+
+
+class CircuitOpenError(DependencyUnavailable):
+    pass
+
+
+class BulkheadFullError(DependencyUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    """
+    三态熔断器：
+    - closed：正常放行，按时间分桶统计最近 window 秒的调用数与失败数，
+      调用数达到 min_calls 且失败率达到 error_rate 时打开
+    - open：open_seconds 内全部拒绝
+    - half_open：放行 half_open_calls 个探测请求，成功则关闭，失败则重新打开
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, error_rate: float = 0.5, min_calls: int = 20, window: float = 10,
+                 buckets: int = 10, open_seconds: float = 5, half_open_calls: int = 1):
+        self.name = name
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self._bucket_width = window / buckets
+        self._bucket_ids = [-1] * buckets
+        self._calls = [0] * buckets
+        self._failures = [0] * buckets
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self.rejected = 0
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            return self.HALF_OPEN
+        return self._state
+
+    def _bucket(self, now: float) -> int:
+        bucket_id = int(now / self._bucket_width)
+        index = bucket_id % len(self._bucket_ids)
+        if self._bucket_ids[index] != bucket_id:
+            self._bucket_ids[index] = bucket_id
+            self._calls[index] = 0
+            self._failures[index] = 0
+        return index
+
+    def _totals(self, now: float) -> Tuple[int, int]:
+        oldest = int(now / self._bucket_width) - len(self._bucket_ids) + 1
+        calls = failures = 0
+        for index, bucket_id in enumerate(self._bucket_ids):
+            if bucket_id >= oldest:
+                calls += self._calls[index]
+                failures += self._failures[index]
+        return calls, failures
+
+    def _reset_window(self):
+        self._bucket_ids = [-1] * len(self._bucket_ids)
+
+    def _trip(self, now: float):
+        self._state = self.OPEN
+        self._opened_at = now
+        self._probes = 0
+        self.trips += 1
+        logger.warning(f"依赖 {self.name} 熔断打开，{self.open_seconds} 秒后探测恢复")
+
+    def allow(self) -> bool:
+        """是否放行本次调用（无 I/O）；放行后必须调用 record() 或 cancel()"""
+        if self._state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self._state = self.HALF_OPEN
+            self._probes = 0
+        if self._state == self.HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                self.rejected += 1
+                return False
+            self._probes += 1
+        return True
+
+    def cancel(self):
+        """已放行但最终没有真正调用（舱壁已满、被取消），不计入统计"""
+        if self._state == self.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def record(self, success: bool):
+        now = time.monotonic()
+        if self._state == self.HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+            if success:
+                self._state = self.CLOSED
+                self._reset_window()
+                logger.info(f"依赖 {self.name} 已恢复，熔断关闭")
+            else:
+                self._trip(now)
+            return
+
+        index = self._bucket(now)
+        self._calls[index] += 1
+        if success:
+            return
+        self._failures[index] += 1
+        if self._state == self.CLOSED:
+            calls, failures = self._totals(now)
+            if calls >= self.min_calls and failures >= calls * self.error_rate:
+                self._trip(now)
+
+    def stats(self) -> Dict[str, Any]:
+        calls, failures = self._totals(time.monotonic())
+        return {"state": self.state, "calls": calls, "failures": failures,
+                "rejected": self.rejected, "trips": self.trips}
+
+
+class Bulkhead:
+    """并发上限；满了最多等待 max_wait 秒（不超过请求剩余时间），仍拿不到名额则抛出 BulkheadFullError"""
+
+    def __init__(self, name: str, max_concurrent: int, max_wait: float = 0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self.active = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def acquire(self):
+        if self._semaphore.locked():
+            if self.max_wait <= 0:
+                self.rejected += 1
+                raise BulkheadFullError(f"{self.name} 并发已满（{self.max_concurrent}）")
+            wait, by_deadline = bound_timeout(self.max_wait, self.name)
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), wait)
+            except asyncio.TimeoutError:
+                if by_deadline:
+                    raise deadline_exceeded(self.name) from None
+                self.rejected += 1
+                raise BulkheadFullError(f"{self.name} 并发已满（{self.max_concurrent}），等待 {self.max_wait} 秒超时")
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+
+class Dependency:
+    """
+    熔断器 + 舱壁 + 超时 的组合。
+    只有 failure_types 中的异常（连接错误、超时等）才算依赖故障；
+    业务异常（如主键冲突）说明依赖正常响应了，按成功统计。
+    耗时超过 slow_call 秒的调用也按失败统计，依赖变慢时同样会熔断。
+    """
+
+    def __init__(self, name: str, breaker: CircuitBreaker, bulkhead: Bulkhead,
+                 failure_types: Tuple[Type[BaseException], ...] = (Exception,),
+                 timeout: float = 0, slow_call: float = 0):
+        self.name = name
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+        self.failure_types = failure_types + (asyncio.TimeoutError,)
+        self.timeout = timeout
+        self.slow_call = slow_call
+
+    @property
+    def available(self) -> bool:
+        return self.breaker.state != CircuitBreaker.OPEN
+
+    @asynccontextmanager
+    async def guard(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} 熔断中")
+        try:
+            await self.bulkhead.acquire()
+        except BaseException:
+            self.breaker.cancel()
+            raise
+
+        started = time.perf_counter()
+        outcome = None
+        try:
+            yield
+            outcome = True
+        except self.failure_types:
+            outcome = False
+            raise
+        except (asyncio.CancelledError, DeadlineExceeded):
+            # 请求自身超时不代表依赖故障，不计入统计
+            raise
+        except Exception:
+            outcome = True
+            raise
+        finally:
+            self.bulkhead.release()
+            if outcome is None:
+                self.breaker.cancel()
+            else:
+                if outcome and self.slow_call and time.perf_counter() - started > self.slow_call:
+                    outcome = False
+                self.breaker.record(outcome)
+
+    async def call(self, func: Callable[..., Awaitable], *args, **kwargs):
+        """超时取依赖自身 timeout 与请求剩余时间中较小者；由请求截止时间导致的超时抛出 DeadlineExceeded"""
+        timeout, by_deadline = bound_timeout(self.timeout, self.name)
+        async with self.guard():
+            if not timeout:
+                return await func(*args, **kwargs)
+            try:
+                return await asyncio.wait_for(func(*args, **kwargs), timeout)
+            except asyncio.TimeoutError:
+                if by_deadline:
+                    raise deadline_exceeded(self.name) from None
+                raise
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.breaker.stats(), "active": self.bulkhead.active,
+                "max_concurrent": self.bulkhead.max_concurrent, "bulkhead_rejected": self.bulkhead.rejected}
+
+
+# 已创建的依赖，供健康检查/监控读取
+dependencies: Dict[str, Dependency] = {}
+
+
+def build_dependency(name: str, failure_types: Tuple[Type[BaseException], ...] = (Exception,),
+                     max_concurrent: int = 10, max_wait: float = 0, timeout: float = 0,
+                     slow_call: float = 0) -> Dependency:
+    """按 resilience 配置创建依赖保护；resilience.{name}_* 覆盖传入的默认值"""
+    breaker = CircuitBreaker(
+        name,
+        error_rate=public_config.get(key="resilience.error_rate", get_type=float, default=0.5),
+        min_calls=public_config.get(key="resilience.min_calls", get_type=int, default=20),
+        window=public_config.get(key="resilience.window", get_type=float, default=10),
+        open_seconds=public_config.get(key="resilience.open_seconds", get_type=float, default=5),
+    )
+    bulkhead = Bulkhead(
+        name,
+        max_concurrent=public_config.get(key=f"resilience.{name}_max_concurrent", get_type=int,
+                                         default=max_concurrent),
+        max_wait=public_config.get(key=f"resilience.{name}_max_wait", get_type=float, default=max_wait),
+    )
+    dependency = Dependency(
+        name, breaker, bulkhead, failure_types,
+        timeout=public_config.get(key=f"resilience.{name}_timeout", get_type=float, default=timeout),
+        slow_call=public_config.get(key=f"resilience.{name}_slow_call", get_type=float, default=slow_call),
+    )
+    dependencies[name] = dependency
+    return dependency
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : handle_shutdown.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 优雅关闭协调器：停止接收新回调 -> 在预算内排空在途请求与后台任务 -> 按步骤限时清理资源
+
+import asyncio
+import os
+import signal
+import time
+from typing import Awaitable, Callable, Coroutine, List, Optional, Sequence, Set, Tuple
+
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from Config.config_loader import public_config
+from Utils.handle_deadline import detached_context
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+
+class ShutdownCoordinator:
+    """
+    关闭流程分两段，每段都有时限，保证重启不会卡住：
+    1. 排空（drain_timeout 总预算）：收到 SIGTERM 即进入排空状态，新的回调返回 503 让上游重试；
+       等待在途请求结束、后台任务（spawn 创建的发送任务等）完成，超时的任务取消并记录
+    2. 清理（分阶段，每阶段 step_timeout）：写入缓冲数据、关闭连接池等，阶段内互不依赖的步骤并发执行，
+       单步超时不影响后续步骤；总耗时 drain_timeout + 阶段数 * step_timeout，与步骤数量无关
+    """
+
+    def __init__(self, drain_timeout: float = 15, step_timeout: float = 2):
+        self.drain_timeout = drain_timeout
+        self.step_timeout = step_timeout
+        self.in_flight = 0
+        self._draining = False
+        self._deadline: Optional[float] = None
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._drain_callbacks: List[Callable[[], None]] = []
+
+    @property
+    def draining(self) -> bool:
+        return self._draining
+
+    def remaining(self) -> float:
+        """排空阶段剩余预算（秒）"""
+        if self._deadline is None:
+            return self.drain_timeout
+        return max(0.0, self._deadline - time.monotonic())
+
+    def on_drain(self, callback: Callable[[], None]):
+        """注册进入排空状态时的回调（例如唤醒 SSE 长连接让其结束）"""
+        self._drain_callbacks.append(callback)
+
+    def begin_drain(self, reason: str = ""):
+        if self._draining:
+            return
+        self._draining = True
+        self._deadline = time.monotonic() + self.drain_timeout
+        logger.info(f"进入排空状态{f'（{reason}）' if reason else ''}，在途请求 {self.in_flight} 个，"
+                    f"后台任务 {len(self._tasks)} 个，预算 {self.drain_timeout} 秒")
+        for callback in self._drain_callbacks:
+            try:
+                callback()
+            except Exception as err:
+                logger.error(f"排空回调执行失败: {err}")
+
+    def install_signal_handlers(self):
+        """
+        在 uvicorn 的 SIGTERM/SIGINT 处理函数外再包一层：信号一到就进入排空状态，
+        而不是等 uvicorn 等完所有连接、执行到 lifespan 关闭阶段才开始
+        """
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            previous = signal.getsignal(sig)
+            if not callable(previous):
+                continue
+
+            def handler(signum, frame, previous=previous):
+                loop.call_soon_threadsafe(self.begin_drain, signal.Signals(signum).name)
+                previous(signum, frame)
+
+            signal.signal(sig, handler)
+
+    # ---------------- 在途请求 ----------------
+    def request_started(self):
+        self.in_flight += 1
+        self._idle.clear()
+
+    def request_finished(self):
+        self.in_flight -= 1
+        if self.in_flight <= 0:
+            self.in_flight = 0
+            self._idle.set()
+
+    # ---------------- 后台任务 ----------------
+    def spawn(self, coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+        """
+        替代裸 asyncio.create_task：保留任务引用（避免被垃圾回收），关闭时会等待其完成。
+        任务不继承请求截止时间，请求结束后仍可正常执行
+        """
+        # create_task 的 context 参数需要 3.11+，改为在脱离截止时间的上下文中创建（任务复制该上下文）
+        task = detached_context().run(asyncio.create_task, coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"后台任务 {task.get_name()} 异常: {task.exception()}")
+
+    # ---------------- 关闭流程 ----------------
+    async def wait_requests(self):
+        """等待在途请求结束（占用排空预算）"""
+        if self.in_flight == 0:
+            return
+        try:
+            await asyncio.wait_for(self._idle.wait(), self.remaining())
+            logger.info("在途请求已全部完成")
+        except asyncio.TimeoutError:
+            logger.warning(f"排空超时，仍有 {self.in_flight} 个请求未完成")
+
+    async def wait_background(self):
+        """等待后台任务完成（占用排空预算），超时的任务取消并记录名称"""
+        if not self._tasks:
+            return
+        done, pending = await asyncio.wait(set(self._tasks), timeout=self.remaining())
+        if pending:
+            logger.warning(f"排空超时，取消 {len(pending)} 个后台任务: {[task.get_name() for task in pending]}")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        else:
+            logger.info(f"后台任务已全部完成（{len(done)} 个）")
+
+    async def run_step(self, name: str, func: Callable[[], Awaitable], timeout: Optional[float] = None):
+        """执行一个清理步骤，超时或异常只记录日志，不阻断后续步骤"""
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(func(), timeout or self.step_timeout)
+            logger.info(f"关闭步骤完成: {name}（{(time.perf_counter() - started) * 1000:.0f} ms）")
+        except asyncio.TimeoutError:
+            logger.error(f"关闭步骤超时: {name}（{timeout or self.step_timeout} 秒）")
+        except Exception as err:
+            logger.exception(f"关闭步骤失败: {name}: {err}")
+
+    async def run_stage(self, steps: Sequence[Tuple[str, Callable[[], Awaitable]]], timeout: Optional[float] = None):
+        """并发执行一组互不依赖的清理步骤，共用一个超时（整组最多占用 timeout 或 step_timeout 秒）"""
+        timeout = timeout or self.step_timeout
+        await asyncio.gather(*[self.run_step(name, func, timeout=timeout) for name, func in steps])
+
+
+class DrainMiddleware:
+    """
+    纯 ASGI 中间件（不缓冲响应体，SSE 不受影响）：
+    统计在途请求；排空期间新的 POST 回调直接返回 503 + Retry-After，由上游稍后重试
+    """
+
+    def __init__(self, app: ASGIApp, coordinator: ShutdownCoordinator, retry_after: int = 5):
+        self.app = app
+        self.coordinator = coordinator
+        self.retry_after = retry_after
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.coordinator.draining and scope["method"] == "POST":
+            response = PlainTextResponse(
+                "service restarting", status_code=503,
+                headers={"Retry-After": str(self.retry_after), "Connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        self.coordinator.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.coordinator.request_finished()
+
+
+shutdown_coordinator = ShutdownCoordinator(
+    drain_timeout=public_config.get(key="shutdown.drain_timeout", get_type=float, default=15),
+    step_timeout=public_config.get(key="shutdown.step_timeout", get_type=float, default=2),
+)
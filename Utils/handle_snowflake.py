@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : handle_snowflake.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 集群内唯一、按时间递增的订单号（Snowflake）：41 位毫秒时间 + 10 位 worker id + 12 位序号
+#
+# - 时间递增，作为 InnoDB BIGINT 主键时总是追加到索引末尾，不会产生页分裂
+# - worker id 启动时从 Redis 租用（SET NX PX），后台定时续租；续租失败超过租期后停止发号，
+#   避免租约过期被其他进程拿到同一个 worker id 后重复
+# - 租用与每次续租都把本进程最多可能发到的毫秒（本地租约到期时间）写入 Redis，
+#   下一个租到该 worker id 的进程从此之后开始发号（崩溃或租约丢失后换到时钟较慢的进程也不会重复）
+# - 本地租约从发出 SET/续租命令之前计时，并比 Redis 租约提前 snowflake.lease_margin_ms 到期
+# - 时钟回拨：不超过 snowflake.max_backward_ms 时沿用上次的毫秒继续发号（序号用完后借用下一毫秒），超过则抛出 ClockMovedBackwards
+
+import asyncio
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from Config.config_loader import public_config
+from DataBase.async_database import redis_manager
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+# 起始时间 2025-01-01 00:00:00 UTC（毫秒），41 位时间可用约 69 年
+EPOCH_MS = 1735689600000
+
+WORKER_ID_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_ID_BITS) - 1
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+WORKER_ID_SHIFT = SEQUENCE_BITS
+TIMESTAMP_SHIFT = SEQUENCE_BITS + WORKER_ID_BITS
+
+# 字符串形式补零到 19 位（BIGINT 最大位数），按字符串排序与按数值排序一致
+ID_STR_WIDTH = 19
+
+LEASE_KEY = "snowflake:worker:{worker_id}"
+LAST_MS_KEY = "snowflake:worker:{worker_id}:last_ms"
+
+# 租用：SET NX PX 成功后返回上一个持有者的发号上限，并把本进程的发号上限写入（只增不减）；未租到返回 -1
+_ACQUIRE_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    local last = tonumber(redis.call('GET', KEYS[2]) or '0')
+    if last < tonumber(ARGV[3]) then
+        redis.call('SET', KEYS[2], ARGV[3])
+    end
+    return last
+end
+return -1
+"""
+
+# 持有者一致时续租并记录发号上限
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    redis.call('SET', KEYS[2], ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# 持有者一致时释放
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[2], ARGV[2])
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class SnowflakeError(RuntimeError):
+    """无法发号"""
+
+
+class ClockMovedBackwards(SnowflakeError):
+    """系统时钟回拨超过允许范围"""
+
+
+class WorkerIdUnavailable(SnowflakeError):
+    """没有有效的 worker id 租约"""
+
+
+class SnowflakeGenerator:
+    def __init__(self, lease_ttl: float = 60, max_backward_ms: int = 1000, lease_margin_ms: int = 1000):
+        if lease_margin_ms >= lease_ttl * 1000 / 3:
+            raise ValueError("lease_margin_ms 必须小于 1/3 租期")
+        self.lease_ttl = lease_ttl
+        self.max_backward_ms = max_backward_ms
+        self.lease_margin_ms = lease_margin_ms
+        self.worker_id: Optional[int] = None
+        self._token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._worker_bits = 0
+        self._last_ms = 0
+        self._sequence = 0
+        # 租约有效期（相对 EPOCH 的毫秒，与 _last_ms 同一时间轴）；在此之后停止发号
+        self._lease_deadline_ms = 0
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------------- 发号 ----------------
+    def _set_worker(self, worker_id: int, deadline_ms: int):
+        self.worker_id = worker_id
+        self._worker_bits = worker_id << WORKER_ID_SHIFT
+        self._lease_deadline_ms = deadline_ms
+
+    def _next_ms(self, now: int) -> int:
+        """在锁内调用：返回本次使用的毫秒，必要时处理时钟回拨与序号用完"""
+        last = self._last_ms
+        if now > last:
+            if now >= self._lease_deadline_ms:
+                raise WorkerIdUnavailable("worker id 租约无效或已过期，停止发号")
+            self._sequence = 0
+            self._last_ms = now
+            return now
+        if last - now > self.max_backward_ms:
+            raise ClockMovedBackwards(f"系统时钟回拨 {last - now} ms，超过允许的 {self.max_backward_ms} ms")
+        # 同一毫秒（或小幅回拨）：序号递增，用完后借用下一毫秒
+        self._sequence = (self._sequence + 1) & SEQUENCE_MASK
+        if self._sequence == 0:
+            if last + 1 >= self._lease_deadline_ms:
+                raise WorkerIdUnavailable("worker id 租约无效或已过期，停止发号")
+            self._last_ms = last + 1
+        return self._last_ms
+
+    def next_id(self) -> int:
+        with self._lock:
+            ms = self._next_ms(time.time_ns() // 1_000_000 - EPOCH_MS)
+            return (ms << TIMESTAMP_SHIFT) | self._worker_bits | self._sequence
+
+    def next_ids(self, count: int) -> List[int]:
+        """一次生成 count 个（只加一次锁）"""
+        ids = []
+        append = ids.append
+        with self._lock:
+            worker_bits = self._worker_bits
+            for _ in range(count):
+                ms = self._next_ms(time.time_ns() // 1_000_000 - EPOCH_MS)
+                append((ms << TIMESTAMP_SHIFT) | worker_bits | self._sequence)
+        return ids
+
+    def next_id_str(self, prefix: str = "") -> str:
+        """定长 19 位字符串订单号，可加前缀（如 "Test-"）"""
+        return f"{prefix}{self.next_id():0{ID_STR_WIDTH}d}"
+
+    @staticmethod
+    def parse(snowflake_id: int) -> Tuple[datetime, int, int]:
+        """拆解 ID：(生成时间 UTC, worker id, 序号)"""
+        snowflake_id = int(snowflake_id)
+        ms = (snowflake_id >> TIMESTAMP_SHIFT) + EPOCH_MS
+        return (datetime.fromtimestamp(ms / 1000, tz=timezone.utc),
+                (snowflake_id >> WORKER_ID_SHIFT) & MAX_WORKER_ID,
+                snowflake_id & SEQUENCE_MASK)
+
+    # ---------------- worker id 租约 ----------------
+    @staticmethod
+    def _now_ms() -> int:
+        return time.time_ns() // 1_000_000 - EPOCH_MS
+
+    async def _acquire(self) -> int:
+        ttl_ms = int(self.lease_ttl * 1000)
+        start = random.randint(0, MAX_WORKER_ID)
+        for offset in range(MAX_WORKER_ID + 1):
+            worker_id = (start + offset) & MAX_WORKER_ID
+            # 在发出命令之前计时：本地租约不会比 Redis 中的租约晚到期
+            deadline_ms = self._now_ms() + ttl_ms - self.lease_margin_ms
+            last_ms = await redis_manager.command(
+                "eval", _ACQUIRE_SCRIPT, 2, LEASE_KEY.format(worker_id=worker_id),
+                LAST_MS_KEY.format(worker_id=worker_id), self._token, ttl_ms, max(self._last_ms, deadline_ms))
+            if last_ms < 0:
+                continue
+            with self._lock:
+                # 从上一个持有者的发号上限之后开始，防止换到时钟较慢的进程后重复
+                self._last_ms = max(self._last_ms, int(last_ms))
+                self._sequence = SEQUENCE_MASK
+                self._set_worker(worker_id, deadline_ms)
+            return worker_id
+        raise WorkerIdUnavailable(f"{MAX_WORKER_ID + 1} 个 worker id 已全部被占用")
+
+    async def _renew(self) -> bool:
+        ttl_ms = int(self.lease_ttl * 1000)
+        # 续租成功后本进程最多发到 deadline_ms，先把它写入 Redis 再延长本地租约
+        deadline_ms = self._now_ms() + ttl_ms - self.lease_margin_ms
+        renewed = await redis_manager.command(
+            "eval", _RENEW_SCRIPT, 2, LEASE_KEY.format(worker_id=self.worker_id),
+            LAST_MS_KEY.format(worker_id=self.worker_id), self._token, ttl_ms, max(self._last_ms, deadline_ms))
+        if renewed:
+            self._lease_deadline_ms = deadline_ms
+        return bool(renewed)
+
+    async def _keep_alive(self):
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            try:
+                if self.worker_id is None:
+                    # 启动时未能租用（Redis 不可用等），继续重试
+                    logger.info(f"订单号 worker id 租用成功：{await self._acquire()}")
+                elif not await self._renew():
+                    # 租约已被他人持有（例如长时间失联后过期）：立即停止使用旧 id 并重新租用
+                    self._lease_deadline_ms = 0
+                    logger.error(f"worker id {self.worker_id} 租约丢失，重新租用")
+                    logger.info(f"订单号 worker id 已重新租用：{await self._acquire()}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                # 续租失败时继续发号直到租约到期，到期后 next_id 抛出 WorkerIdUnavailable
+                logger.warning(f"worker id {self.worker_id} 租用/续租失败: {err!r}")
+
+    async def start(self):
+        """租用 worker id 并开始续租（需在 Redis 初始化之后调用）；租用失败不影响启动，后台继续重试"""
+        try:
+            worker_id = await self._acquire()
+            logger.info(f"订单号 worker id 租用成功：{worker_id}（token={self._token}）")
+        except Exception as err:
+            logger.error(f"订单号 worker id 租用失败，暂停发号并在后台重试: {err!r}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._keep_alive(), name="snowflake-lease")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.worker_id is None:
+            return
+        self._lease_deadline_ms = 0
+        try:
+            await redis_manager.command(
+                "eval", _RELEASE_SCRIPT, 2, LEASE_KEY.format(worker_id=self.worker_id),
+                LAST_MS_KEY.format(worker_id=self.worker_id), self._token, self._last_ms)
+        except Exception as err:
+            logger.warning(f"释放 worker id {self.worker_id} 失败，将在租约到期后自动释放: {err!r}")
+
+
+order_id_generator = SnowflakeGenerator(
+    lease_ttl=public_config.get(key="snowflake.lease_ttl", get_type=float, default=60),
+    max_backward_ms=public_config.get(key="snowflake.max_backward_ms", get_type=int, default=1000),
+    lease_margin_ms=public_config.get(key="snowflake.lease_margin_ms", get_type=int, default=1000),
+)
@@ -1,7 +1,135 @@
 import datetime
-from zoneinfo import ZoneInfo
+import threading
+from bisect import bisect_right
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import time
 
+try:
+    import numpy as np  # pip install numpy（可选，批量换算百万级时间戳时使用）
+except ImportError:
+    np = None
+
+# 扩展时区映射表（别名 -> IANA 时区名）
+TIMEZONE_ALIASES = {
+    # 亚洲
+    "beijing": "Asia/Shanghai",  # 北京时间
+    "china": "Asia/Shanghai",  # 中国时间
+    "shanghai": "Asia/Shanghai",  # 上海时间
+    "hongkong": "Asia/Hong_Kong",  # 香港时间
+    "taipei": "Asia/Taipei",  # 台北时间
+    "tokyo": "Asia/Tokyo",  # 东京时间
+    "seoul": "Asia/Seoul",  # 首尔时间
+    "singapore": "Asia/Singapore",  # 新加坡时间
+    "bangkok": "Asia/Bangkok",  # 曼谷时间
+    "kualalumpur": "Asia/Kuala_Lumpur",  # 吉隆坡时间
+    "jakarta": "Asia/Jakarta",  # 雅加达时间
+    "manila": "Asia/Manila",  # 马尼拉时间
+    "hanoi": "Asia/Ho_Chi_Minh",  # 河内时间
+    "dhaka": "Asia/Dhaka",  # 达卡时间
+    "kolkata": "Asia/Kolkata",  # 加尔各答时间（印度标准时间）
+    "mumbai": "Asia/Kolkata",  # 孟买时间
+    "delhi": "Asia/Kolkata",  # 德里时间
+    "dubai": "Asia/Dubai",  # 迪拜时间
+    "riyadh": "Asia/Riyadh",  # 利雅得时间
+    "tehran": "Asia/Tehran",  # 德黑兰时间
+    "baghdad": "Asia/Baghdad",  # 巴格达时间
+
+    # 欧洲
+    "london": "Europe/London",  # 伦敦时间
+    "paris": "Europe/Paris",  # 巴黎时间
+    "berlin": "Europe/Berlin",  # 柏林时间
+    "rome": "Europe/Rome",  # 罗马时间
+    "madrid": "Europe/Madrid",  # 马德里时间
+    "amsterdam": "Europe/Amsterdam",  # 阿姆斯特丹时间
+    "brussels": "Europe/Brussels",  # 布鲁塞尔时间
+    "vienna": "Europe/Vienna",  # 维也纳时间
+    "zurich": "Europe/Zurich",  # 苏黎世时间
+    "stockholm": "Europe/Stockholm",  # 斯德哥尔摩时间
+    "oslo": "Europe/Oslo",  # 奥斯陆时间
+    "copenhagen": "Europe/Copenhagen",  # 哥本哈根时间
+    "helsinki": "Europe/Helsinki",  # 赫尔辛基时间
+    "warsaw": "Europe/Warsaw",  # 华沙时间
+    "prague": "Europe/Prague",  # 布拉格时间
+    "budapest": "Europe/Budapest",  # 布达佩斯时间
+    "moscow": "Europe/Moscow",  # 莫斯科时间
+    "athens": "Europe/Athens",  # 雅典时间
+    "lisbon": "Europe/Lisbon",  # 里斯本时间
+    "dublin": "Europe/Dublin",  # 都柏林时间
+
+    # 北美
+    "newyork": "America/New_York",  # 纽约时间
+    "losangeles": "America/Los_Angeles",  # 洛杉矶时间
+    "chicago": "America/Chicago",  # 芝加哥时间
+    "toronto": "America/Toronto",  # 多伦多时间
+    "vancouver": "America/Vancouver",  # 温哥华时间
+    "miami": "America/New_York",  # 迈阿密时间（与纽约相同）
+    "washington": "America/New_York",  # 华盛顿时间（与纽约相同）
+    "boston": "America/New_York",  # 波士顿时间（与纽约相同）
+    "detroit": "America/Detroit",  # 底特律时间
+    "houston": "America/Chicago",  # 休斯顿时间（与芝加哥相同）
+    "phoenix": "America/Phoenix",  # 凤凰城时间
+    "denver": "America/Denver",  # 丹佛时间
+    "dallas": "America/Chicago",  # 达拉斯时间（与芝加哥相同）
+    "seattle": "America/Los_Angeles",  # 西雅图时间（与洛杉矶相同）
+    "sanfrancisco": "America/Los_Angeles",  # 旧金山时间（与洛杉矶相同）
+    "lasvegas": "America/Los_Angeles",  # 拉斯维加斯时间（与洛杉矶相同）
+
+    # 南美
+    "saopaulo": "America/Sao_Paulo",  # 圣保罗时间
+    "riodejaneiro": "America/Sao_Paulo",  # 里约热内卢时间
+    "buenosaires": "America/Argentina/Buenos_Aires",  # 布宜诺斯艾利斯时间
+    "lima": "America/Lima",  # 利马时间
+    "bogota": "America/Bogota",  # 波哥大时间
+    "santiago": "America/Santiago",  # 圣地亚哥时间
+    "caracas": "America/Caracas",  # 加拉加斯时间
+
+    # 非洲
+    "cairo": "Africa/Cairo",  # 开罗时间
+    "johannesburg": "Africa/Johannesburg",  # 约翰内斯堡时间
+    "nairobi": "Africa/Nairobi",  # 内罗毕时间
+    "lagos": "Africa/Lagos",  # 拉各斯时间
+    "casablanca": "Africa/Casablanca",  # 卡萨布兰卡时间
+    "tunis": "Africa/Tunis",  # 突尼斯时间
+    "algiers": "Africa/Algiers",  # 阿尔及尔时间
+
+    # 大洋洲
+    "sydney": "Australia/Sydney",  # 悉尼时间
+    "melbourne": "Australia/Melbourne",  # 墨尔本时间
+    "brisbane": "Australia/Brisbane",  # 布里斯班时间
+    "perth": "Australia/Perth",  # 珀斯时间
+    "auckland": "Pacific/Auckland",  # 奥克兰时间
+    "wellington": "Pacific/Auckland",  # 惠灵顿时间（与奥克兰相同）
+    "fiji": "Pacific/Fiji",  # 斐济时间
+    "honolulu": "Pacific/Honolulu",  # 檀香山时间
+
+    # 其他
+    "utc": "UTC",  # UTC时间
+    "gmt": "GMT",  # GMT时间
+}
+
+# 大于该值的时间戳视为毫秒（10 位秒级时间戳最大 9999999999）
+MS_THRESHOLD = 10 ** 11
+
+# 桶大小（秒）：day 为本地自然日，hour 为本地整点小时
+BUCKET_SECONDS = {"day": 86400, "hour": 3600}
+
+EPOCH_DATE = datetime.date(1970, 1, 1)
+
+
+@lru_cache(maxsize=None)
+def get_zone(timezone: str = "UTC") -> ZoneInfo:
+    """
+    按名称或别名（beijing / saopaulo ...）取时区对象，结果缓存；无效时区返回 UTC
+    """
+    tz_str = TIMEZONE_ALIASES.get(timezone.lower(), timezone)
+    try:
+        return ZoneInfo(tz_str)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo("UTC")
+
 
 def is_valid_timestamp(ts):
     """
@@ -31,10 +159,10 @@ def get_ms_int_timestamp() -> int:  # 13位整数时间戳
     return int(time.time() * 1000)
 
 
-def get_local_time_str(stamp=int(time.time())) -> str:  # 时间戳转换为本地时间字符串
+def get_local_time_str(stamp=None) -> str:  # 时间戳转换为本地时间字符串
     """
     将时间戳转换为本地时间字符串（支持秒级和毫秒级时间戳）
-    :param stamp: 时间戳（秒级或毫秒级）
+    :param stamp: 时间戳（秒级或毫秒级），默认当前时间
     :return: 本地时间字符串（格式：YYYY-MM-DD HH:MM:SS）
     """
     # 判断 stamp 是否有效
@@ -49,120 +177,15 @@ def get_local_time_str(stamp=int(time.time())) -> str:  # 时间戳转换为本
     return str(datetime.datetime.fromtimestamp(timestamp_to_use))
 
 
-def get_time_in_timezone(stamp=int(time.time()), timezone="UTC") -> str:
+def get_time_in_timezone(stamp=None, timezone="UTC") -> str:
     """
     将时间戳转换为指定时区的时间字符串
-    :param stamp: 时间戳（秒级或毫秒级）
-    :param timezone: 时区名称，默认为UTC
+    :param stamp: 时间戳（秒级或毫秒级），默认当前时间
+    :param timezone: 时区名称或别名，默认为UTC
     :return: 指定时区的时间字符串（格式：YYYY-MM-DD HH:MM:SS %Z%z）
     """
-    # 扩展时区映射表
-    timezone_map = {
-        # 亚洲
-        "beijing": "Asia/Shanghai",  # 北京时间
-        "china": "Asia/Shanghai",  # 中国时间
-        "shanghai": "Asia/Shanghai",  # 上海时间
-        "hongkong": "Asia/Hong_Kong",  # 香港时间
-        "taipei": "Asia/Taipei",  # 台北时间
-        "tokyo": "Asia/Tokyo",  # 东京时间
-        "seoul": "Asia/Seoul",  # 首尔时间
-        "singapore": "Asia/Singapore",  # 新加坡时间
-        "bangkok": "Asia/Bangkok",  # 曼谷时间
-        "kualalumpur": "Asia/Kuala_Lumpur",  # 吉隆坡时间
-        "jakarta": "Asia/Jakarta",  # 雅加达时间
-        "manila": "Asia/Manila",  # 马尼拉时间
-        "hanoi": "Asia/Ho_Chi_Minh",  # 河内时间
-        "dhaka": "Asia/Dhaka",  # 达卡时间
-        "kolkata": "Asia/Kolkata",  # 加尔各答时间（印度标准时间）
-        "mumbai": "Asia/Kolkata",  # 孟买时间
-        "delhi": "Asia/Kolkata",  # 德里时间
-        "dubai": "Asia/Dubai",  # 迪拜时间
-        "riyadh": "Asia/Riyadh",  # 利雅得时间
-        "tehran": "Asia/Tehran",  # 德黑兰时间
-        "baghdad": "Asia/Baghdad",  # 巴格达时间
-
-        # 欧洲
-        "london": "Europe/London",  # 伦敦时间
-        "paris": "Europe/Paris",  # 巴黎时间
-        "berlin": "Europe/Berlin",  # 柏林时间
-        "rome": "Europe/Rome",  # 罗马时间
-        "madrid": "Europe/Madrid",  # 马德里时间
-        "amsterdam": "Europe/Amsterdam",  # 阿姆斯特丹时间
-        "brussels": "Europe/Brussels",  # 布鲁塞尔时间
-        "vienna": "Europe/Vienna",  # 维也纳时间
-        "zurich": "Europe/Zurich",  # 苏黎世时间
-        "stockholm": "Europe/Stockholm",  # 斯德哥尔摩时间
-        "oslo": "Europe/Oslo",  # 奥斯陆时间
-        "copenhagen": "Europe/Copenhagen",  # 哥本哈根时间
-        "helsinki": "Europe/Helsinki",  # 赫尔辛基时间
-        "warsaw": "Europe/Warsaw",  # 华沙时间
-        "prague": "Europe/Prague",  # 布拉格时间
-        "budapest": "Europe/Budapest",  # 布达佩斯时间
-        "moscow": "Europe/Moscow",  # 莫斯科时间
-        "athens": "Europe/Athens",  # 雅典时间
-        "lisbon": "Europe/Lisbon",  # 里斯本时间
-        "dublin": "Europe/Dublin",  # 都柏林时间
-
-        # 北美
-        "newyork": "America/New_York",  # 纽约时间
-        "losangeles": "America/Los_Angeles",  # 洛杉矶时间
-        "chicago": "America/Chicago",  # 芝加哥时间
-        "toronto": "America/Toronto",  # 多伦多时间
-        "vancouver": "America/Vancouver",  # 温哥华时间
-        "miami": "America/New_York",  # 迈阿密时间（与纽约相同）
-        "washington": "America/New_York",  # 华盛顿时间（与纽约相同）
-        "boston": "America/New_York",  # 波士顿时间（与纽约相同）
-        "detroit": "America/Detroit",  # 底特律时间
-        "houston": "America/Chicago",  # 休斯顿时间（与芝加哥相同）
-        "phoenix": "America/Phoenix",  # 凤凰城时间
-        "denver": "America/Denver",  # 丹佛时间
-        "dallas": "America/Chicago",  # 达拉斯时间（与芝加哥相同）
-        "seattle": "America/Los_Angeles",  # 西雅图时间（与洛杉矶相同）
-        "sanfrancisco": "America/Los_Angeles",  # 旧金山时间（与洛杉矶相同）
-        "lasvegas": "America/Los_Angeles",  # 拉斯维加斯时间（与洛杉矶相同）
-
-        # 南美
-        "saopaulo": "America/Sao_Paulo",  # 圣保罗时间
-        "riodejaneiro": "America/Sao_Paulo",  # 里约热内卢时间
-        "buenosaires": "America/Argentina/Buenos_Aires",  # 布宜诺斯艾利斯时间
-        "lima": "America/Lima",  # 利马时间
-        "bogota": "America/Bogota",  # 波哥大时间
-        "santiago": "America/Santiago",  # 圣地亚哥时间
-        "caracas": "America/Caracas",  # 加拉加斯时间
-
-        # 非洲
-        "cairo": "Africa/Cairo",  # 开罗时间
-        "johannesburg": "Africa/Johannesburg",  # 约翰内斯堡时间
-        "nairobi": "Africa/Nairobi",  # 内罗毕时间
-        "lagos": "Africa/Lagos",  # 拉各斯时间
-        "casablanca": "Africa/Casablanca",  # 卡萨布兰卡时间
-        "tunis": "Africa/Tunis",  # 突尼斯时间
-        "algiers": "Africa/Algiers",  # 阿尔及尔时间
-
-        # 大洋洲
-        "sydney": "Australia/Sydney",  # 悉尼时间
-        "melbourne": "Australia/Melbourne",  # 墨尔本时间
-        "brisbane": "Australia/Brisbane",  # 布里斯班时间
-        "perth": "Australia/Perth",  # 珀斯时间
-        "auckland": "Pacific/Auckland",  # 奥克兰时间
-        "wellington": "Pacific/Auckland",  # 惠灵顿时间（与奥克兰相同）
-        "fiji": "Pacific/Fiji",  # 斐济时间
-        "honolulu": "Pacific/Honolulu",  # 檀香山时间
-
-        # 其他
-        "utc": "UTC",  # UTC时间
-        "gmt": "GMT",  # GMT时间
-    }
-
-    # 获取时区对象
-    tz_key = timezone.lower()
-    tz_str = timezone_map.get(tz_key, timezone)
-
-    try:
-        tz = ZoneInfo(tz_str)
-    except:
-        # 如果时区无效，使用UTC
-        tz = ZoneInfo("UTC")
+    # 获取时区对象（已缓存；无效时区使用UTC）
+    tz = get_zone(timezone)
 
     # 判断 stamp 是否有效
     if not is_valid_timestamp(stamp):
@@ -172,17 +195,186 @@ def get_time_in_timezone(stamp=int(time.time()), timezone="UTC") -> str:
         # 若有效，判断是否为毫秒级（13位），是则转秒级
         timestamp_to_use = int(stamp / 1000) if len(str(stamp)) == 13 else stamp
 
-    # 创建UTC时间
-    utc_time = datetime.datetime.fromtimestamp(timestamp_to_use, tz=ZoneInfo("UTC"))
-
-    # 转换为目标时区时间
-    target_time = utc_time.astimezone(tz)
+    # 直接转换为目标时区时间
+    target_time = datetime.datetime.fromtimestamp(timestamp_to_use, tz=tz)
 
     # 格式化为字符串
     # return target_time.strftime("%Y-%m-%d %H:%M:%S %Z%z")
     return target_time.strftime("%Y-%m-%d %H:%M:%S")
 
 
+
+# ============================================================
+# 报表分桶：批量把时间戳换算为时区下的自然日 / 小时
+# ============================================================
+class OffsetTable:
+    """
+    单个时区的 UTC 偏移跳变表：transitions[i] 起（UTC 秒）偏移为 offsets[i]。
+    按年份懒加载，覆盖范围不足时整体重建；换算一个时间戳只需一次二分查找 + 加法
+    """
+
+    def __init__(self, zone: ZoneInfo):
+        self.zone = zone
+        # (覆盖起点, 覆盖终点, transitions, offsets, numpy 数组或 None)，整体替换保证线程安全
+        self._table = None
+        self._lock = threading.Lock()
+
+    def _offset(self, ts: int) -> int:
+        return int(datetime.datetime.fromtimestamp(ts, tz=self.zone).utcoffset().total_seconds())
+
+    def _build(self, first_year: int, last_year: int):
+        start = int(datetime.datetime(first_year, 1, 1, tzinfo=datetime.timezone.utc).timestamp())
+        end = int(datetime.datetime(last_year + 1, 1, 1, tzinfo=datetime.timezone.utc).timestamp())
+        transitions, offsets = [start], [self._offset(start)]
+        # 按天扫描，偏移变化时二分到具体秒（各地夏令时切换都不会一天两次）
+        day = start
+        while day < end:
+            next_day = min(day + 86400, end)
+            offset = self._offset(next_day)
+            if offset != offsets[-1]:
+                lo, hi = day, next_day
+                while hi - lo > 1:
+                    mid = (lo + hi) // 2
+                    if self._offset(mid) == offset:
+                        hi = mid
+                    else:
+                        lo = mid
+                transitions.append(hi)
+                offsets.append(offset)
+            day = next_day
+        arrays = (np.array(transitions, dtype=np.int64), np.array(offsets, dtype=np.int64)) if np else None
+        self._table = (start, end, transitions, offsets, arrays)
+
+    def ensure(self, lo: int, hi: int):
+        """保证 [lo, hi] 内的时间戳都在覆盖范围内"""
+        table = self._table
+        if table is not None and table[0] <= lo and hi < table[1]:
+            return table
+        with self._lock:
+            table = self._table
+            if table is None or not (table[0] <= lo and hi < table[1]):
+                first_year = datetime.datetime.fromtimestamp(lo, tz=datetime.timezone.utc).year
+                last_year = datetime.datetime.fromtimestamp(hi, tz=datetime.timezone.utc).year
+                if table is not None:
+                    # 连同已覆盖的年份一起重建，避免来回重建
+                    first_year = min(first_year, datetime.datetime.fromtimestamp(
+                        table[0], tz=datetime.timezone.utc).year)
+                    last_year = max(last_year, datetime.datetime.fromtimestamp(
+                        table[1] - 1, tz=datetime.timezone.utc).year)
+                self._build(first_year, last_year)
+            return self._table
+
+
+@lru_cache(maxsize=None)
+def get_offset_table(timezone: str = "UTC") -> OffsetTable:
+    return OffsetTable(get_zone(timezone))
+
+
+def _to_seconds(ts, unit: str) -> int:
+    if unit == "ms" or (unit == "auto" and ts >= MS_THRESHOLD):
+        return int(ts // 1000)
+    return int(ts)
+
+
+def local_buckets(timestamps: Iterable, timezone: str = "UTC", granularity: str = "day", unit: str = "auto"):
+    """
+    批量把时间戳换算为时区下的桶序号：day 为本地日期距 1970-01-01 的天数，hour 为本地小时序号。
+    :param timestamps: 秒级或毫秒级时间戳序列（list / numpy 数组）
+    :param unit: s / ms / auto（auto 按数值大小逐个判断）
+    :return: 安装了 numpy 时返回 int64 数组，否则返回 list；用 bucket_label 转为字符串
+    """
+    size = BUCKET_SECONDS[granularity]
+    table = get_offset_table(timezone)
+
+    if np is not None:
+        values = np.asarray(timestamps)
+        if values.size == 0:
+            return np.empty(0, dtype=np.int64)
+        if unit == "ms":
+            seconds = np.floor_divide(values, 1000).astype(np.int64)
+        elif unit == "auto":
+            seconds = np.where(values >= MS_THRESHOLD, np.floor_divide(values, 1000), values).astype(np.int64)
+        else:
+            seconds = np.floor(values).astype(np.int64)
+        _, _, _, _, (transitions, offsets) = table.ensure(int(seconds.min()), int(seconds.max()))
+        index = np.searchsorted(transitions, seconds, side="right") - 1
+        return np.floor_divide(seconds + offsets[index], size)
+
+    seconds = [_to_seconds(ts, unit) for ts in timestamps]
+    if not seconds:
+        return []
+    _, _, transitions, offsets, _ = table.ensure(min(seconds), max(seconds))
+    buckets = []
+    # 报表数据通常按时间有序，落在上一个偏移区间内时不再二分
+    lo = hi = offset = 0
+    for ts in seconds:
+        if not lo <= ts < hi:
+            index = bisect_right(transitions, ts) - 1
+            lo = transitions[index]
+            hi = transitions[index + 1] if index + 1 < len(transitions) else float("inf")
+            offset = offsets[index]
+        buckets.append((ts + offset) // size)
+    return buckets
+
+
+def bucket_label(bucket: int, granularity: str = "day") -> str:
+    """桶序号转字符串：day -> YYYY-MM-DD，hour -> YYYY-MM-DD HH"""
+    if granularity == "day":
+        return (EPOCH_DATE + datetime.timedelta(days=int(bucket))).isoformat()
+    day, hour = divmod(int(bucket), 24)
+    return f"{(EPOCH_DATE + datetime.timedelta(days=day)).isoformat()} {hour:02d}"
+
+
+def rollup(timestamps: Iterable, timezone: str = "UTC", granularity: str = "day",
+           amounts: Optional[Sequence] = None, unit: str = "auto") -> Dict[str, Tuple[int, Any]]:
+    """
+    按时区下的自然日 / 小时汇总：{"2025-10-20": (笔数, 金额合计)}，按时间升序；不传 amounts 时金额为 0。
+    金额不做取整，与是否安装 numpy 无关：整数（分）精确求和，小数 / Decimal 按输入顺序逐笔累加
+    """
+    buckets = local_buckets(timestamps, timezone, granularity, unit)
+    if np is not None:
+        if buckets.size == 0:
+            return {}
+        base = int(buckets.min())
+        shifted = buckets - base
+        counts = np.bincount(shifted)
+        indexes = np.flatnonzero(counts)
+        totals: Dict[int, Any] = {}
+        if amounts is not None:
+            values = np.asarray(amounts)
+            if values.dtype.kind in "iub":
+                sums = np.zeros(counts.size, dtype=np.int64)
+                np.add.at(sums, shifted, values)
+                totals = {int(index): int(sums[index]) for index in indexes}
+            else:
+                # bincount 的 weights 按 float64 求和，小数金额会有误差，逐笔累加与纯 Python 分支保持一致
+                for index, amount in zip(shifted.tolist(), amounts):
+                    totals[index] = totals.get(index, 0) + amount
+        return {bucket_label(base + int(index), granularity): (int(counts[index]), totals.get(int(index), 0))
+                for index in indexes}
+
+    counts = Counter(buckets)
+    totals: Counter = Counter()
+    if amounts is not None:
+        for bucket, amount in zip(buckets, amounts):
+            totals[bucket] += amount
+    return {bucket_label(bucket, granularity): (counts[bucket], totals[bucket]) for bucket in sorted(counts)}
+
+
+def local_bucket_labels(timestamps: Iterable, timezone: str = "UTC", granularity: str = "day",
+                        unit: str = "auto") -> List[str]:
+    """逐个时间戳返回桶字符串（相同桶只格式化一次）"""
+    labels: Dict[int, str] = {}
+    result = []
+    for bucket in local_buckets(timestamps, timezone, granularity, unit):
+        bucket = int(bucket)
+        label = labels.get(bucket)
+        if label is None:
+            label = labels[bucket] = bucket_label(bucket, granularity)
+        result.append(label)
+    return result
+
+
 # cc = get_sec_int_timestamp()
 # print(cc)
 # print(f"当前时间戳: {cc}")
@@ -0,0 +1,342 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : handle_tracing.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 轻量链路追踪：请求/路由/MySQL/Redis/Telegram 调用的 span，输出 OTLP JSON
+#
+# - 调用链通过 contextvar 传递，兼容 W3C traceparent 请求头（上游带了就沿用其 trace id 与采样标记）
+# - 头部采样：只在根 span 决定是否采样，未采样的请求后续 span() 只做一次 contextvar 读取，开销可忽略
+# - 导出在独立线程中批量进行：写本地文件（每行一个 OTLP JSON，可被 Collector 的 otlpjson 文件接收器读取）
+#   或 POST 到 OTLP/HTTP 接收端（/v1/traces），不占用事件循环
+
+import contextvars
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Optional
+
+import httpx
+from fastapi.routing import APIRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from Config.config_loader import public_config
+from Logger.logger_config import LOGS_DIR, setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+# OTLP SpanKind
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+# OTLP StatusCode
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes",
+                 "status", "status_message")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: int, attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.status = 0
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_error(self, err: BaseException):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(err).__name__}: {err}"[:200]
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status:
+            span["status"] = {"code": self.status, "message": self.status_message}
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+# 当前 span；NOT_SAMPLED 表示处于未采样的请求中，子 span 全部跳过
+NOT_SAMPLED = object()
+current_span: contextvars.ContextVar[Any] = contextvars.ContextVar("trace_span", default=None)
+
+
+class SpanExporter:
+    """后台线程批量导出：exporter = file / otlp / none"""
+
+    def __init__(self, exporter: str, service_name: str, file_dir: str, endpoint: str,
+                 batch_size: int = 512, flush_interval: float = 2, max_queue: int = 10000):
+        self.exporter = exporter
+        self.service_name = service_name
+        self.file_dir = file_dir
+        self.endpoint = endpoint
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: Deque[Span] = deque(maxlen=max_queue)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional[httpx.Client] = None
+
+    def submit(self, span: Span):
+        if len(self._queue) == self._queue.maxlen:
+            # 导出跟不上时丢弃最早的 span，不阻塞业务
+            self.dropped += 1
+        self._queue.append(span)
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def _payload(self, spans) -> Dict[str, Any]:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", self.service_name),
+                                        _otlp_attribute("process.pid", os.getpid())]},
+            "scopeSpans": [{"scope": {"name": "notify"}, "spans": [span.to_otlp() for span in spans]}],
+        }]}
+
+    def _export(self, spans):
+        body = json.dumps(self._payload(spans), ensure_ascii=False, separators=(",", ":"))
+        if self.exporter == "file":
+            path = os.path.join(self.file_dir, f"traces-{time.strftime('%Y%m%d')}-{os.getpid()}.jsonl")
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(body + "\n")
+        elif self.exporter == "otlp":
+            if self._client is None:
+                self._client = httpx.Client(timeout=5)
+            response = self._client.post(self.endpoint, content=body, headers={"Content-Type": "application/json"})
+            response.raise_for_status()
+
+    def _drain(self):
+        while self._queue:
+            batch = []
+            while self._queue and len(batch) < self.batch_size:
+                batch.append(self._queue.popleft())
+            try:
+                self._export(batch)
+            except Exception as err:
+                self.dropped += len(batch)
+                logger.error(f"导出 {len(batch)} 个 span 失败: {err!r}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._drain()
+        self._drain()
+
+    def start(self):
+        if self.exporter not in ("file", "otlp") or self._thread is not None:
+            return
+        if self.exporter == "file":
+            os.makedirs(self.file_dir, exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2):
+        """停止并导出剩余 span（在线程中执行，由调用方放到 to_thread）"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self._thread = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+class Tracer:
+    def __init__(self, enabled: bool, sample_ratio: float, exporter: SpanExporter):
+        self.enabled = enabled and exporter.exporter in ("file", "otlp")
+        self.sample_ratio = sample_ratio
+        self.exporter = exporter
+
+    def start_root(self, name: str, traceparent: Optional[str] = None, **attributes) -> Optional[Span]:
+        """
+        创建根 span 并设为当前 span；未采样时返回 None（当前 span 置为 NOT_SAMPLED）。
+        调用方负责 end() 与还原 contextvar
+        """
+        trace_id = parent_id = None
+        sampled = None
+        if traceparent:
+            # W3C traceparent: 00-<trace_id 32>-<parent_id 16>-<flags 2>
+            parts = traceparent.strip().split("-")
+            if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+                trace_id, parent_id = parts[1], parts[2]
+                sampled = parts[3].endswith(("1", "3", "5", "7", "9", "b", "d", "f"))
+        if sampled is None:
+            sampled = random.random() < self.sample_ratio
+        if not sampled:
+            current_span.set(NOT_SAMPLED)
+            return None
+        span = Span(name, trace_id or f"{random.getrandbits(128):032x}", parent_id, KIND_SERVER, attributes)
+        current_span.set(span)
+        return span
+
+    def end(self, span: Span):
+        span.end_ns = time.time_ns()
+        self.exporter.submit(span)
+
+
+class _SpanScope:
+    """span() 返回的上下文管理器，同步/异步代码中都用 with"""
+
+    __slots__ = ("name", "kind", "attributes", "span", "token")
+
+    def __init__(self, name: str, kind: int, attributes: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.span = None
+        self.token = None
+
+    def __enter__(self) -> Optional[Span]:
+        parent = current_span.get()
+        if parent is None or parent is NOT_SAMPLED:
+            return None
+        self.span = Span(self.name, parent.trace_id, parent.span_id, self.kind, self.attributes)
+        self.token = current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is None:
+            return False
+        current_span.reset(self.token)
+        if exc is not None:
+            self.span.set_error(exc)
+        tracer.end(self.span)
+        return False
+
+
+def span(name: str, kind: int = KIND_INTERNAL, **attributes) -> _SpanScope:
+    """
+    在当前调用链下创建子 span：with span("mysql.fetchone", **{"db.statement": sql}): ...
+    不在请求链路中或请求未采样时什么都不做
+    """
+    return _SpanScope(name, kind, attributes)
+
+
+def traced(name: Optional[str] = None, kind: int = KIND_INTERNAL):
+    """异步函数装饰器：整个函数调用作为一个 span"""
+
+    def decorator(func: Callable):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(span_name, kind):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class TracedRoute(APIRoute):
+    """
+    路由处理函数自动包一层 span（handler.<函数名>）。
+    与根 span 的时间差即请求体解析、pydantic 校验与响应序列化的耗时
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if tracer.enabled and inspect.iscoroutinefunction(endpoint):
+            endpoint = traced(f"handler.{endpoint.__name__}")(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+class TracingMiddleware:
+    """纯 ASGI 中间件：每个 HTTP 请求一个根 span，记录方法、路径与状态码；skip_paths（健康检查等高频探测）不记录"""
+
+    def __init__(self, app: ASGIApp, skip_paths: Iterable[str] = ()):
+        self.app = app
+        self.skip_paths = frozenset(skip_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not tracer.enabled or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        token = current_span.set(None)
+        root = tracer.start_root(f"{scope['method']} {scope['path']}", traceparent,
+                                 **{"http.method": scope["method"], "http.target": scope["path"]})
+        if root is None:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                current_span.reset(token)
+            return
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    root.status = STATUS_ERROR
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as err:
+            root.set_error(err)
+            raise
+        finally:
+            current_span.reset(token)
+            tracer.end(root)
+
+
+tracer = Tracer(
+    enabled=public_config.get(key="tracing.enable", get_type=bool, default=True),
+    sample_ratio=public_config.get(key="tracing.sample_ratio", get_type=float, default=0.01),
+    exporter=SpanExporter(
+        exporter=public_config.get(key="tracing.exporter", get_type=str, default="file"),
+        service_name=public_config.get(key="tracing.service_name", get_type=str, default="receive-notify"),
+        file_dir=public_config.get(key="tracing.file_dir", get_type=str, default=os.path.join(LOGS_DIR, "traces")),
+        endpoint=public_config.get(key="tracing.otlp_endpoint", get_type=str,
+                                   default="http://127.0.0.1:4318/v1/traces"),
+        batch_size=public_config.get(key="tracing.batch_size", get_type=int, default=512),
+        flush_interval=public_config.get(key="tracing.flush_interval", get_type=float, default=2),
+    ),
+)
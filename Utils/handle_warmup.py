@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author    : 贺鉴龙
+# @File      : handle_warmup.py
+# @Time      : 2025/10/20
+# @IDE       : PyCharm
+# @Function  : 启动预热：worker 接收流量之前预建连接、预加载热点缓存，完成后才算就绪
+#
+# 在 lifespan 启动阶段（yield 之前）执行：Uvicorn 在 lifespan 启动完成后才开始接收连接，
+# 滚动重载（Launcher.serve reload / wait）依赖的就绪标记也在此之后写入，所以流量只会进入已预热的 worker。
+# 各步骤并发执行，共用 warmup.timeout 总预算；单步失败或超时只记录日志（冷缓存照常可用，不阻止启动）。
+# /ready 在预热完成且未进入排空状态时返回 200，否则 503。
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from Config.config_loader import public_config
+from Logger.logger_config import setup_logger
+
+log_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+logger = setup_logger(log_name)
+
+
+class Warmup:
+    def __init__(self, timeout: float = 10):
+        self.timeout = timeout
+        self._steps: List[Tuple[str, Callable[[], Awaitable]]] = []
+        # 步骤名 -> {"state": ok/failed/timeout, "ms": 耗时, "error": 说明}
+        self.results: Dict[str, Dict] = {}
+        self.finished_at: Optional[float] = None
+        self.elapsed: float = 0
+
+    def register(self, name: str, func: Callable[[], Awaitable]):
+        """登记一个预热步骤（无参协程函数）"""
+        self._steps.append((name, func))
+
+    @property
+    def ready(self) -> bool:
+        return self.finished_at is not None
+
+    async def _run_step(self, name: str, func: Callable[[], Awaitable], deadline: float):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(func(), max(0.0, deadline - time.monotonic()))
+            result = {"state": "ok"}
+        except asyncio.TimeoutError:
+            result = {"state": "timeout", "error": f"超过预热总预算 {self.timeout} 秒"}
+        except Exception as err:
+            result = {"state": "failed", "error": repr(err)}
+        result["ms"] = round((time.perf_counter() - started) * 1000, 1)
+        self.results[name] = result
+        if result["state"] == "ok":
+            logger.info(f"预热步骤完成: {name}（{result['ms']:.0f} ms）")
+        else:
+            logger.warning(f"预热步骤未完成: {name}（{result['state']}: {result['error']}），按冷缓存继续启动")
+
+    async def run(self):
+        """并发执行全部步骤，返回时 worker 即视为就绪"""
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        await asyncio.gather(*[self._run_step(name, func, deadline) for name, func in self._steps])
+        self.elapsed = time.perf_counter() - started
+        self.finished_at = time.time()
+        failed = [name for name, result in self.results.items() if result["state"] != "ok"]
+        logger.info(f"启动预热完成，耗时 {self.elapsed * 1000:.0f} ms，共 {len(self._steps)} 步"
+                    + (f"，未完成: {', '.join(failed)}" if failed else ""))
+
+    def skip(self):
+        """关闭预热（warmup.enable=false）时直接标记就绪"""
+        self.finished_at = time.time()
+
+    def snapshot(self) -> Dict:
+        return {"ready": self.ready, "elapsed_ms": round(self.elapsed * 1000, 1), "steps": dict(self.results)}
+
+
+warmup = Warmup(
+    timeout=public_config.get(key="warmup.timeout", get_type=float, default=10),
+)
@@ -5,51 +5,26 @@
 # @Time      : 2025/9/16 14:33
 # @IDE       : PyCharm
 # @Function  :
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import Optional
-from jose import JWTError, jwt
 
-# 假设你已经定义了 SECRET_KEY 和 ALGORITHM
-SECRET_KEY = "your-secret-key"
-ALGORITHM = "HS256"
+from Utils.handle_auth import jwt_auth
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """
     生成 JWT Token
     :param data: 载荷数据，通常包含用户ID
-    :param expires_delta: Token 有效期
+    :param expires_delta: Token 有效期，默认 30 分钟
     :return: JWT 字符串
     """
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=30)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return jwt_auth.issue(data, expires_delta)
+
 
 def decode_access_token(token: str):
     """
-    解码 JWT Token
+    解码 JWT Token（验签结果缓存到过期，已吊销的 token 视为无效）
     :param token: JWT 字符串
     :return: 解码后的载荷或 None（如果 Token 无效）
     """
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
-        return None
-
-
-exa = timedelta(minutes=60)
-print(exa,type(exa))
-
-cc = create_access_token(data={"sub": "user123"}, expires_delta=exa)
-
-print(cc)
-
-
-
-
-print(decode_access_token(cc))
+    return jwt_auth.verify(token)